@@ -3,8 +3,12 @@ Composition of test fixture components offering extended APIs.
 
 """
 
+import atexit
+import functools
+import os
 import sys
 import unittest
+import weakref
 
 import kt.testing.cleanup
 
@@ -28,21 +32,26 @@ class FixtureComponent(object):
 
 class TestCase(unittest.TestCase):
 
+    # (id, args, kwargs) for a single case of a parameterized test.
+    _case = None
+
+    # Pooled components returned once the test has run, by marker.
+    _fixtures_released = None
+
     def __new__(cls, *args, **kwargs):
         new = super(TestCase, cls).__new__
         if new == object.__new__:
             self = new(cls)
         else:
             self = new(cls, *args, **kwargs)
-        self._fixtures_by_marker = {}
+        built = self._fixtures_by_marker = {}
         as_built = []
-        for bcls in reversed(list(cls.mro())):
-            if not issubclass(bcls, TestCase):
-                continue
-            fixtures = getattr(bcls, '__fixtures__', ())
-            for marker, factory, args, kwargs in fixtures:
-                fixture = factory(self, *args, **kwargs)
-                self._fixtures_by_marker[marker] = fixture
+        for marker, factory, args, kwargs, pooled in _build_plan(cls):
+            if pooled:
+                # Pooled components are acquired when the test is set up.
+                as_built.append(marker)
+            else:
+                fixture = built[marker] = factory(self, *args, **kwargs)
                 as_built.append(fixture)
         self._fixtures_as_built = tuple(as_built)
         return self
@@ -50,6 +59,12 @@ class TestCase(unittest.TestCase):
     def setUp(self):
         kt.testing.cleanup.cleanup()
         for fixture in self._fixtures_as_built:
+            if fixture.__class__ is _Marker:
+                marker = fixture
+                fixture = self._fixtures_by_marker.get(marker)
+                if fixture is None:
+                    fixture = self._acquire_fixture(marker)
+                self.addCleanup(self._release_fixture, marker)
             fixture.setup()
             teardown = getattr(fixture, 'teardown', None)
             if teardown is not None:
@@ -60,6 +75,227 @@ class TestCase(unittest.TestCase):
         super(TestCase, self).tearDown()
         kt.testing.cleanup.cleanup()
 
+    def run(self, result=None):
+        parameters = self._parameters()
+        if parameters is None:
+            return super(TestCase, self).run(result)
+        # Each case is run as a separate test, created only when it's
+        # about to run.
+        if result is None:
+            result = self.defaultTestResult()
+        for case in parameters:
+            if getattr(result, 'shouldStop', False):
+                break
+            test = self.__class__(self._testMethodName)
+            test._set_case(case)
+            test.run(result)
+        return result
+
+    def countTestCases(self):
+        parameters = self._parameters()
+        if parameters is None:
+            return 1
+        return parameters.count()
+
+    def id(self):
+        test_id = super(TestCase, self).id()
+        if self._case is not None:
+            test_id = '%s[%s]' % (test_id, self._case[0])
+        return test_id
+
+    def __str__(self):
+        text = super(TestCase, self).__str__()
+        if self._case is not None:
+            text = text.replace(
+                self._testMethodName,
+                '%s[%s]' % (self._testMethodName, self._case[0]), 1)
+        return text
+
+    def _acquire_fixture(self, marker):
+        # Take a pooled component, or create one if none are available.
+        pool = _pools.get(marker)
+        if pool:
+            fixture = pool.pop()
+            fixture.reset(self)
+        else:
+            for entry in _fixture_plan(self.__class__):
+                if entry[0] is marker:
+                    marker, factory, args, kwargs = entry
+                    fixture = factory(self, *args, **kwargs)
+                    break
+            else:
+                raise KeyError(marker)
+        self._fixtures_by_marker[marker] = fixture
+        return fixture
+
+    def _release_fixture(self, marker):
+        fixture = self._fixtures_by_marker.pop(marker, None)
+        if fixture is not None:
+            # Keep the component available to the test until the pool
+            # hands it to another test.
+            if self._fixtures_released is None:
+                self._fixtures_released = {}
+            self._fixtures_released[marker] = fixture
+            _pools.setdefault(marker, []).append(fixture)
+
+    def _released_fixture(self, marker):
+        released = self._fixtures_released or {}
+        fixture = released.get(marker)
+        if fixture is None or getattr(fixture, 'test', self) is not self:
+            raise AttributeError(
+                'pooled fixture component is only available to %s from'
+                ' setUp until another test takes it' % self.id())
+        return fixture
+
+    def _parameters(self):
+        if self._case is not None:
+            return None
+        method = getattr(self.__class__, self._testMethodName, None)
+        return getattr(method, '__kt_parameters__', None)
+
+    def _set_case(self, case):
+        self._case = case
+        case_id, args, kwargs = case
+        bound = getattr(self, self._testMethodName)
+
+        def method():
+            return bound(*args, **kwargs)
+
+        functools.update_wrapper(method, getattr(bound, '__func__', bound))
+        setattr(self, self._testMethodName, method)
+
+
+def parameters(cases=None, file=None, ids=None):
+    """Run the decorated test method once for each of `cases`.
+
+    `cases` is an iterable, or a callable returning an iterable, which
+    is used each time the test is run; iterators, which can only be
+    used once, are read into a list immediately.  Alternatively, the cases are
+    read from `file`, relative to the module defining the test; files
+    ending in ``.json`` contain a list of cases, those ending in
+    ``.jsonl`` contain one JSON case per line, and those ending in
+    ``.csv`` contain a header and one case per row.
+
+    Dictionaries provide keyword arguments for the test method, lists
+    and tuples provide positional arguments, and any other value is
+    passed as the only argument.  Each case is reported as a separate
+    test, identified by its index, or by the result of calling `ids`
+    with the case.
+
+    """
+    if (cases is None) == (file is None):
+        raise TypeError('exactly one of cases or file is required')
+    if cases is not None and not callable(cases) and iter(cases) is cases:
+        cases = list(cases)
+
+    def decorator(func):
+        func.__kt_parameters__ = _Parameters(cases, file, ids, func)
+        return func
+
+    return decorator
+
+
+class _Parameters(object):
+
+    def __init__(self, cases, file, ids, func):
+        self.cases = cases
+        self.file = file
+        self.ids = ids
+        self.module = func.__module__
+
+    def __iter__(self):
+        for index, case in enumerate(self._source()):
+            if isinstance(case, dict):
+                args, kwargs = (), case
+            elif isinstance(case, (list, tuple)):
+                args, kwargs = tuple(case), {}
+            else:
+                args, kwargs = (case,), {}
+            case_id = index if self.ids is None else self.ids(case)
+            yield case_id, args, kwargs
+
+    def count(self):
+        if self.file is None and not callable(self.cases):
+            try:
+                return len(self.cases)
+            except TypeError:
+                pass
+        return sum(1 for case in self._source())
+
+    def _source(self):
+        if self.file is not None:
+            return _read_cases(self._path())
+        if callable(self.cases):
+            return self.cases()
+        return self.cases
+
+    def _path(self):
+        if os.path.isabs(self.file):
+            return self.file
+        module = sys.modules[self.module]
+        return os.path.join(os.path.dirname(os.path.abspath(module.__file__)),
+                            self.file)
+
+
+def _read_cases(path):
+    if path.endswith('.json'):
+        import json
+        with open(path) as f:
+            cases = json.load(f)
+        for case in cases:
+            yield case
+    elif path.endswith('.jsonl'):
+        import json
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    elif path.endswith('.csv'):
+        import csv
+        with open(path) as f:
+            for row in csv.DictReader(f):
+                yield row
+    else:
+        raise ValueError('unsupported file for test cases: %s' % path)
+
+
+# Fixture plans, computed once for each class.
+_plans = weakref.WeakKeyDictionary()
+_build_plans = weakref.WeakKeyDictionary()
+
+# Released instances of pooled components, by marker.
+_pools = {}
+
+
+def _fixture_plan(cls):
+    """Return the fixture components composed for `cls`, in build order.
+
+    Each entry is a tuple of marker, factory, positional arguments, and
+    keyword arguments.
+
+    """
+    plan = _plans.get(cls)
+    if plan is None:
+        plan = []
+        for bcls in reversed(list(cls.mro())):
+            if not issubclass(bcls, TestCase):
+                continue
+            plan.extend(bcls.__dict__.get('__fixtures__', ()))
+        plan = _plans[cls] = tuple(plan)
+    return plan
+
+
+def _build_plan(cls):
+    # The fixture plan, with a flag for components that are pooled:
+    # those which can be reset for use by another test.
+    plan = _build_plans.get(cls)
+    if plan is None:
+        plan = _build_plans[cls] = tuple(
+            (marker, factory, args, kwargs,
+             getattr(factory, 'reset', None) is not None)
+            for marker, factory, args, kwargs in _fixture_plan(cls))
+    return plan
+
 
 def compose(factory, *args, **kwargs):
     depth = kwargs.pop('depth', 1)
@@ -67,11 +303,49 @@ def compose(factory, *args, **kwargs):
     if '__fixtures__' not in locals:
         locals['__fixtures__'] = ()
 
-    marker = object()
+    marker = _Marker()
     locals['__fixtures__'] += (marker, factory, args, kwargs),
     return _MarkerReference(marker, '_fixtures_by_marker')
 
 
+def _component(testcase, value):
+    """Return the fixture component `value` refers to for `testcase`.
+
+    References returned by :func:`compose` may be passed to other
+    components, which resolve them once the test has been created.
+
+    """
+    if isinstance(value, _MarkerReference):
+        return value.__get__(testcase, testcase.__class__)
+    return value
+
+
+def _class_resource(cls, resources, key, create, release):
+    """Return the resource for test class `cls` held in `resources`.
+
+    If there's no resource for `key`, one is made by calling `create`,
+    and `release` is called with `key` using a class cleanup for `cls`,
+    or when the process exits if class cleanups aren't available.
+
+    """
+    resource = resources.get(key)
+    if resource is None:
+        resource = resources[key] = create()
+        add_class_cleanup = getattr(cls, 'addClassCleanup', None)
+        if add_class_cleanup is None:
+            # Class cleanups are new in Python 3.8.
+            atexit.register(release, key)
+        else:
+            add_class_cleanup(release, key)
+    return resource
+
+
+class _Marker(object):
+    """Identifies a composed fixture component."""
+
+    __slots__ = ()
+
+
 class _MarkerReference(object):
 
     def __init__(self, marker, attribute):
@@ -83,4 +357,8 @@ class _MarkerReference(object):
             return self
         # Get data by marker
         data = getattr(obj, self.attribute)
-        return data[self.marker]
+        try:
+            return data[self.marker]
+        except KeyError:
+            # Pooled component not acquired for this test.
+            return obj._released_fixture(self.marker)
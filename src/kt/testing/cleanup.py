@@ -8,18 +8,400 @@ registered with ``zope.testing.cleanup`` are used, and libraries
 registering using ``kt.testing.cleanup`` will be cleaned up when a test
 running uses ``zope.testing.cleanup`` instead.
 
+Registrations can be removed, ordered using priorities, tied to the
+lifetime of an owning object, or collected in a :class:`Registry`
+created using :func:`scope` that can be closed as a group.  Every
+cleanup is run even if some fail; failures are reported together using
+:class:`CleanupError`.
+
 """
 
+import atexit
+import inspect
+import sys
+import traceback
+import weakref
+
 try:
     from zope.testing.cleanup import _cleanups
 except ImportError:
     _cleanups = []
 
 
+class CleanupError(Exception):
+    """One or more cleanup functions raised exceptions.
+
+    `errors` is a list of ``(registration, exception)`` pairs, in the
+    order the cleanups were run.
+
+    """
+
+    def __init__(self, errors, tracebacks):
+        super(CleanupError, self).__init__(errors)
+        self.errors = errors
+        self.tracebacks = tracebacks
+
+    def __str__(self):
+        parts = ['%d cleanup function%s failed'
+                 % (len(self.errors), '' if len(self.errors) == 1 else 's')]
+        for (registration, exception), tb in zip(self.errors,
+                                                 self.tracebacks):
+            parts.append('%r:\n%s' % (registration.func, tb.rstrip()))
+        return '\n\n'.join(parts)
+
+
+class Registration(object):
+    """Handle for a registered cleanup."""
+
+    __slots__ = 'registry', 'entry', 'priority', 'owner', 'concurrent'
+
+    def __init__(self, registry, entry, priority, concurrent=False):
+        self.owner = None
+        self.concurrent = concurrent
+        self.registry = registry
+        # The (func, args, kwargs) tuple in the registry.  These stay
+        # plain tuples: zope.testing.cleanup unpacks them, and exact
+        # tuples are unpacked fastest when running the cleanups.
+        self.entry = entry
+        self.priority = priority
+
+    @property
+    def func(self):
+        return self.entry[0]
+
+    def unregister(self):
+        """Remove the registration; calling this again has no effect."""
+        self.registry._remove(self)
+
+    @property
+    def registered(self):
+        return any(entry is self.entry for entry in self.registry._cleanups)
+
+    def __repr__(self):
+        return '<%s.%s for %r>' % (self.__class__.__module__,
+                                   self.__class__.__name__, self.func)
+
+
+class Registry(object):
+    """Collection of cleanup functions.
+
+    The module-level functions use a registry that shares its entries
+    with ``zope.testing.cleanup``, when available.  Entries added using
+    that API have priority 0, but are always appended.  Additional
+    registries are created using :meth:`scope`.
+
+    """
+
+    _parent_registration = None
+
+    def __init__(self, cleanups=None):
+        self._cleanups = [] if cleanups is None else cleanups
+        # Registration handles, by id() of the corresponding entry.
+        self._handles = {}
+        # Number of handles for concurrent cleanups.
+        self._concurrent = 0
+
+    def __len__(self):
+        return len(self._cleanups)
+
+    def register(self, func, *args, **kwargs):
+        """Register `func` to be called with `args` and `kwargs`."""
+        return self.add(func, args, kwargs)
+
+    def add(self, func, args=(), kwargs=None, priority=0, owner=None,
+            concurrent=None):
+        """Register `func` to be called with `args` and `kwargs`.
+
+        Cleanups with lower `priority` values are run first; those with
+        the same priority are run in the order registered.
+
+        If `owner` is provided, the registration is removed when
+        `owner` is garbage collected.  If `func` is a method of `owner`,
+        only a weak reference to `owner` is kept.
+
+        If `concurrent` is true, the cleanup may be run at the same time
+        as adjacent concurrent cleanups, using a pool of threads.  This
+        is useful for cleanups that mostly wait on I/O.  `func` may be a
+        coroutine function, in which case it's run using an event loop;
+        coroutine functions are concurrent unless `concurrent` is false.
+
+        """
+        coroutine = _iscoroutinefunction(func)
+        if concurrent is None:
+            concurrent = coroutine
+        if (owner is not None and getattr(func, '__self__', None) is owner
+                and hasattr(func, '__func__')):
+            func = _WeakMethod(func)
+        if coroutine:
+            func = _Coroutine(func)
+        entry = func, tuple(args), {} if kwargs is None else kwargs
+        registration = Registration(self, entry, priority, bool(concurrent))
+        if owner is not None:
+            registration.owner = weakref.ref(
+                owner, lambda ref: registration.unregister())
+        cleanups = self._cleanups
+        if len(self._handles) > len(cleanups):
+            self._prune()
+        index = len(cleanups)
+        while index and self._priority(cleanups[index - 1]) > priority:
+            index -= 1
+        cleanups.insert(index, entry)
+        self._handles[id(entry)] = registration
+        if registration.concurrent:
+            self._concurrent += 1
+        return registration
+
+    def cleanup(self):
+        """Invoke all registered cleanups.
+
+        Every cleanup is invoked, even if others raise exceptions.  If
+        any do, :class:`CleanupError` is raised once all have run.
+
+        Adjacent concurrent cleanups are run together; all of them are
+        finished before the next cleanup that isn't concurrent is run.
+
+        """
+        # Cleanups may unregister themselves (or others).
+        entries = tuple(self._cleanups)
+        if self._concurrent:
+            failures = _Failures(self)
+            self._cleanup_concurrently(entries, failures)
+        else:
+            failures = None
+            for entry in entries:
+                func, args, kwargs = entry
+                try:
+                    func(*args, **kwargs)
+                except Exception:
+                    if failures is None:
+                        failures = _Failures(self)
+                    failures.add(entry, sys.exc_info())
+        if failures is not None:
+            failures.check()
+
+    def _cleanup_concurrently(self, entries, failures):
+        handles = self._handles
+        batch = []
+        for entry in entries:
+            registration = handles.get(id(entry))
+            if registration is not None and registration.concurrent:
+                batch.append(entry)
+                continue
+            if batch:
+                _run_concurrently(batch, failures)
+                batch = []
+            func, args, kwargs = entry
+            try:
+                func(*args, **kwargs)
+            except Exception:
+                failures.add(entry, sys.exc_info())
+        if batch:
+            _run_concurrently(batch, failures)
+
+    def scope(self, priority=0):
+        """Return a new registry whose cleanups are run with these.
+
+        The new registry is registered with this one using `priority`.
+        When the new registry is closed (or used as a context manager),
+        its cleanups are run one last time, and it's unregistered.
+
+        """
+        child = Registry()
+        child._parent_registration = self.add(child.cleanup,
+                                              priority=priority)
+        return child
+
+    def close(self):
+        """Run cleanups for a scope, and remove it from its parent."""
+        try:
+            self.cleanup()
+        finally:
+            del self._cleanups[:]
+            self._handles.clear()
+            self._concurrent = 0
+            if self._parent_registration is not None:
+                self._parent_registration.unregister()
+                self._parent_registration = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _priority(self, entry):
+        registration = self._handles.get(id(entry))
+        return 0 if registration is None else registration.priority
+
+    def _prune(self):
+        # Forget handles for entries removed from the list directly.
+        # Handles keep their entries alive, so ids aren't reused.
+        current = set(id(entry) for entry in self._cleanups)
+        for key in list(self._handles):
+            if key not in current:
+                del self._handles[key]
+        self._concurrent = sum(1 for registration in self._handles.values()
+                               if registration.concurrent)
+
+    def _remove(self, registration):
+        entry = registration.entry
+        if self._handles.get(id(entry)) is registration:
+            del self._handles[id(entry)]
+            if registration.concurrent:
+                self._concurrent -= 1
+        cleanups = self._cleanups
+        for index, candidate in enumerate(cleanups):
+            if candidate is entry:
+                del cleanups[index]
+                break
+
+
+class _WeakMethod(object):
+    """Call a method without keeping the object it's bound to alive."""
+
+    def __init__(self, method):
+        self.ref = weakref.ref(method.__self__)
+        self.func = method.__func__
+
+    def __call__(self, *args, **kwargs):
+        obj = self.ref()
+        if obj is not None:
+            return self.func(obj, *args, **kwargs)
+
+    def __repr__(self):
+        return '<weak method %s of %r>' % (self.func.__name__, self.ref())
+
+
+class _Failures(object):
+    """Exceptions raised by cleanups, collected for a CleanupError."""
+
+    def __init__(self, registry):
+        self.registry = registry
+        self.errors = []
+        self.tracebacks = []
+
+    def add(self, entry, exc_info):
+        registration = self.registry._handles.get(id(entry))
+        if registration is None:
+            # Added using zope.testing.cleanup.
+            registration = Registration(self.registry, entry, 0)
+        self.errors.append((registration, exc_info[1]))
+        self.tracebacks.append(''.join(traceback.format_exception(*exc_info)))
+
+    def check(self):
+        if self.errors:
+            raise CleanupError(self.errors, self.tracebacks)
+
+
+class _Coroutine(object):
+    """Cleanup implemented as a coroutine function.
+
+    Calling this runs the coroutine to completion, so the entry can be
+    invoked by ``zope.testing.cleanup`` like any other.
+
+    """
+
+    def __init__(self, func):
+        self.func = func
+
+    def __call__(self, *args, **kwargs):
+        coro = self.func(*args, **kwargs)
+        if coro is not None:
+            _event_loop().run_until_complete(coro)
+
+    def __repr__(self):
+        return '<coroutine cleanup %r>' % (self.func,)
+
+
+def _iscoroutinefunction(func):
+    # Not available on Python 2, which has no coroutine functions.
+    check = getattr(inspect, 'iscoroutinefunction', None)
+    return check is not None and check(func)
+
+
+# Maximum number of threads used to run concurrent cleanups.
+MAX_WORKERS = 8
+
+_executor = None
+_loop = None
+
+
+def _thread_pool():
+    global _executor
+    if _executor is None:
+        try:
+            import concurrent.futures
+        except ImportError:
+            # Python 2 without the "futures" backport.
+            return None
+        _executor = concurrent.futures.ThreadPoolExecutor(MAX_WORKERS)
+    return _executor
+
+
+def _event_loop():
+    global _loop
+    if _loop is None or _loop.is_closed():
+        import asyncio
+        # The loop is kept for the process, so it mustn't come from
+        # whatever policy is installed now (such as the virtual time
+        # policy installed by kt.testing.clock.Clock).
+        _loop = asyncio.DefaultEventLoopPolicy().new_event_loop()
+        atexit.register(_loop.close)
+    return _loop
+
+
+def _run_concurrently(batch, failures):
+    pool = _thread_pool()
+    coroutines = []
+    futures = []
+    for entry in batch:
+        func, args, kwargs = entry
+        try:
+            if isinstance(func, _Coroutine):
+                coro = func.func(*args, **kwargs)
+                if coro is not None:
+                    coroutines.append((entry, coro))
+            elif pool is None:
+                func(*args, **kwargs)
+            else:
+                futures.append((entry, pool.submit(func, *args, **kwargs)))
+        except Exception:
+            failures.add(entry, sys.exc_info())
+    if coroutines:
+        import asyncio
+        loop = _event_loop()
+        tasks = [(entry, loop.create_task(coro)) for entry, coro in coroutines]
+        loop.run_until_complete(asyncio.wait([task for entry, task in tasks]))
+        for entry, task in tasks:
+            exception = task.exception()
+            if isinstance(exception, Exception):
+                failures.add(entry, (type(exception), exception,
+                                     exception.__traceback__))
+            elif exception is not None:
+                raise exception
+    for entry, future in futures:
+        exception = future.exception()
+        if exception is not None:
+            failures.add(entry, (type(exception), exception,
+                                 getattr(exception, '__traceback__', None)))
+
+
+_registry = Registry(_cleanups)
+
+
 def register(func, *args, **kwargs):
-    _cleanups.append((func, args, kwargs))
+    return _registry.add(func, args, kwargs)
+
+
+def add(func, args=(), kwargs=None, priority=0, owner=None,
+        concurrent=None):
+    return _registry.add(func, args, kwargs, priority=priority, owner=owner,
+                         concurrent=concurrent)
+
+
+def scope(priority=0):
+    return _registry.scope(priority=priority)
 
 
 def cleanup():
-    for func, args, kwargs in _cleanups:
-        func(*args, **kwargs)
+    _registry.cleanup()
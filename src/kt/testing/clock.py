@@ -0,0 +1,229 @@
+"""\
+Virtual clock for testing time-dependent code.
+
+Code implementing cache expiration, rate limiting, or retries with
+backoff usually calls ``time.sleep`` or compares times reported by the
+system clock.  Tests for such code either wait for real time to pass,
+which is slow, or allow for scheduling delays, which is flaky.  The
+:class:`Clock` fixture component replaces the clock functions with ones
+reporting time that only advances when the test (or code under test)
+sleeps or explicitly advances the clock, without waiting.
+
+"""
+
+from __future__ import absolute_import
+
+import datetime as _datetime
+import threading
+import time as _time
+
+try:
+    import asyncio
+except ImportError:  # pragma: no cover
+    asyncio = None
+
+import kt.testing
+import kt.testing.patching
+
+
+_EPOCH = _datetime.datetime(1970, 1, 1)
+
+
+class Clock(kt.testing.FixtureComponent):
+    """Virtual clock replacing the standard clock functions for each test.
+
+    While the test runs, ``time.time``, ``time.monotonic``,
+    ``time.sleep``, and ``datetime.datetime`` (used for ``now`` and
+    ``utcnow``) are replaced.  The virtual clock starts at `start`
+    (seconds since the epoch), or at the real time when the test is set
+    up, and advances only when :meth:`sleep` or :meth:`advance` is
+    called.
+
+    Code that imported the clock functions using ``from time import
+    time`` (and similar) keeps the original functions; the dotted names
+    for those references can be passed as `targets`, and are replaced
+    with the corresponding virtual functions::
+
+      class TestCache(kt.testing.TestCase):
+
+          clock = kt.testing.compose(
+              kt.testing.clock.Clock, targets=['myapp.cache.monotonic'])
+
+          def test_expiration(self):
+              cache = myapp.cache.Cache(ttl=60)
+              cache['key'] = 'value'
+              self.clock.advance(61)
+              self.assertNotIn('key', cache)
+
+    Unless `asyncio` is false, event loops created using the ``asyncio``
+    event loop policy (including those created by ``asyncio.run``) are
+    :class:`VirtualTimeEventLoop` instances using this clock, so
+    ``asyncio.sleep`` and timeouts advance the clock instead of waiting.
+
+    Other fixture components can be passed the clock (or the reference
+    returned by :func:`kt.testing.compose`) to simulate delays using
+    :meth:`sleep`.
+
+    """
+
+    def __init__(self, testcase, start=None, targets=(), asyncio=True):
+        super(Clock, self).__init__(testcase)
+        self.start = start
+        self.targets = targets
+        self.asyncio = asyncio
+        self.elapsed = 0.0
+        self._lock = threading.Lock()
+
+    def setup(self):
+        self.elapsed = 0.0
+        self._wall = _time.time() if self.start is None else self.start
+        self._monotonic = _monotonic()
+        self.datetime = _datetime_class(self)
+
+        replacements = {
+            _time.time: self.time,
+            _time.sleep: self.sleep,
+            _datetime.datetime: self.datetime,
+        }
+        targets = {
+            'time.time': self.time,
+            'time.sleep': self.sleep,
+            'datetime.datetime': self.datetime,
+        }
+        if _monotonic is not _time.time:
+            replacements[_monotonic] = self.monotonic
+            targets['time.monotonic'] = self.monotonic
+        for target in self.targets:
+            path, name = kt.testing.patching._parse(target)
+            original = getattr(kt.testing.patching._owner(path), name)
+            try:
+                targets[target] = replacements[original]
+            except (KeyError, TypeError):
+                raise TypeError('%s is not a clock function: %r'
+                                % (target, original))
+        kt.testing.patching.patch(self.test, targets)
+
+        if self.asyncio and asyncio is not None:
+            policy = asyncio.get_event_loop_policy()
+            asyncio.set_event_loop_policy(_EventLoopPolicy(self))
+            self.test.addCleanup(asyncio.set_event_loop_policy, policy)
+
+    def time(self):
+        """Return the virtual time in seconds since the epoch."""
+        return self._wall + self.elapsed
+
+    def monotonic(self):
+        """Return the virtual value of the monotonic clock."""
+        return self._monotonic + self.elapsed
+
+    def sleep(self, seconds):
+        """Advance the clock by `seconds` without waiting."""
+        self.advance(seconds)
+
+    def advance(self, seconds):
+        """Advance the clock by `seconds`."""
+        if seconds < 0:
+            raise ValueError('sleep length must be non-negative')
+        with self._lock:
+            self.elapsed += seconds
+
+    def now(self, tz=None):
+        """Return the virtual time as a ``datetime.datetime``."""
+        return self.datetime.now(tz)
+
+
+# Python 2 has no monotonic clock.
+_monotonic = getattr(_time, 'monotonic', _time.time)
+
+
+class _DatetimeMeta(type):
+
+    def __instancecheck__(cls, instance):
+        # Instances created before the clock was replaced still count.
+        return isinstance(instance, _datetime.datetime)
+
+    def __subclasscheck__(cls, subclass):
+        return issubclass(subclass, _datetime.datetime)
+
+
+def _datetime_class(clock):
+
+    def now(cls, tz=None):
+        return cls.fromtimestamp(clock.time(), tz)
+
+    def utcnow(cls):
+        moment = _EPOCH + _datetime.timedelta(seconds=clock.time())
+        return cls.combine(moment.date(), moment.time())
+
+    return _DatetimeMeta('datetime', (_datetime.datetime,), {
+        '__module__': 'datetime',
+        '__slots__': (),
+        'now': classmethod(now),
+        'utcnow': classmethod(utcnow),
+    })
+
+
+class _LoopClock(object):
+    """Virtual clock used by a loop that hasn't been given another."""
+
+    def __init__(self):
+        self.elapsed = 0.0
+
+    def monotonic(self):
+        return self.elapsed
+
+    def advance(self, seconds):
+        self.elapsed += seconds
+
+
+if asyncio is not None:
+
+    class VirtualTimeEventLoop(asyncio.SelectorEventLoop):
+        """Event loop that advances a virtual clock instead of waiting.
+
+        When the loop would otherwise block until the next scheduled
+        callback, the clock advances to the time of that callback.  I/O
+        that's ready is still handled normally.
+
+        The loop uses `clock` (usually a :class:`Clock`) if provided, or
+        a clock of its own starting at zero.
+
+        """
+
+        def __init__(self, selector=None, clock=None):
+            self.clock = _LoopClock() if clock is None else clock
+            super(VirtualTimeEventLoop, self).__init__(selector)
+            self._selector = _VirtualTimeSelector(self._selector, self)
+
+        def time(self):
+            return self.clock.monotonic()
+
+        def advance(self, seconds):
+            self.clock.advance(seconds)
+
+    class _EventLoopPolicy(asyncio.DefaultEventLoopPolicy):
+
+        def __init__(self, clock):
+            super(_EventLoopPolicy, self).__init__()
+            self.clock = clock
+
+        def new_event_loop(self):
+            return VirtualTimeEventLoop(clock=self.clock)
+
+
+class _VirtualTimeSelector(object):
+
+    def __init__(self, selector, loop):
+        self._selector = selector
+        self._loop = loop
+
+    def select(self, timeout=None):
+        if timeout is None:
+            return self._selector.select(None)
+        events = self._selector.select(0)
+        if not events and timeout > 0:
+            self._loop.advance(timeout)
+        return events
+
+    def __getattr__(self, name):
+        return getattr(self._selector, name)
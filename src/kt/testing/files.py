@@ -0,0 +1,195 @@
+"""\
+Temporary directory trees restored for each test.
+
+Tests for code processing files often populate a directory with many
+sample files for each test.  The :class:`TemporaryTree` fixture
+component builds the tree once for each test class, and after each test
+copies back only the files the test changed, added, or removed.  Finding
+those still requires an ``lstat`` of every entry in the tree.
+
+Files are copied rather than hardlinked or reflinked, since a test
+writing to a linked file in place would change the template as well.
+
+"""
+
+from __future__ import absolute_import
+
+import os
+import shutil
+import stat
+import tempfile
+
+import six
+
+import kt.testing
+
+
+# Trees are shared by all tests in a class; keyed by test class, files,
+# and build function.
+_trees = {}
+
+
+class TemporaryTree(kt.testing.FixtureComponent):
+    """Directory tree restored to its initial content after each test.
+
+    The first time a test from a class is set up, a template tree is
+    created from `files`, a mapping from relative paths to content (text
+    or bytes), and by calling `build` with the path of the template
+    directory, if either is provided.  The template is copied once to
+    create the directory used by the tests, available as ``path``.
+
+    When each test is cleaned up, the directory is compared with the
+    state it had when copied, and only entries that were changed, added,
+    or removed are restored from the template.  Comparing walks the
+    whole tree and calls ``lstat`` for every entry, so it takes time
+    proportional to the number of entries; the content of unchanged
+    files is never read or copied.
+
+    The trees are created in `dir`, defaulting to ``/dev/shm`` where
+    that's available (so the files are kept in memory), and otherwise
+    to the default location for temporary files.
+
+    """
+
+    scope = 'class'
+
+    def __init__(self, testcase, files=None, build=None, dir=None):
+        super(TemporaryTree, self).__init__(testcase)
+        self.files = {} if files is None else files
+        self.build = build
+        self.dir = dir
+        self.path = None
+
+    def setup(self):
+        cls = self.test.__class__
+        key = cls, id(self.files), self.build
+        tree = kt.testing._class_resource(
+            cls, _trees, key,
+            lambda: _Tree(self.files, self.build,
+                          self.dir or _default_dir()),
+            _close)
+        self._tree = tree
+        self.path = tree.path
+        self.test.addCleanup(tree.reset)
+
+    def join(self, *parts):
+        """Return the path for `parts` relative to the tree."""
+        return os.path.join(self.path, *parts)
+
+    def changes(self):
+        """Return relative paths that were changed, added, or removed."""
+        return sorted(self._tree.changes())
+
+
+class _Tree(object):
+
+    def __init__(self, files, build, dir):
+        self.root = tempfile.mkdtemp(prefix='kt-testing-', dir=dir)
+        self.template = os.path.join(self.root, 'template')
+        self.path = os.path.join(self.root, 'tree')
+        try:
+            os.mkdir(self.template)
+            for name, content in files.items():
+                _write(os.path.join(self.template, name), content)
+            if build is not None:
+                build(self.template)
+            shutil.copytree(self.template, self.path, symlinks=True)
+            self.baseline = _scan(self.path)
+        except Exception:
+            self.close()
+            raise
+
+    def changes(self):
+        current = _scan(self.path)
+        changed = set(name for name, key in self.baseline.items()
+                      if current.get(name) != key)
+        changed.update(name for name in current if name not in self.baseline)
+        return changed
+
+    def reset(self):
+        changed = self.changes()
+        if not changed:
+            return
+        # Children sort after their parents: remove from the bottom up,
+        # and restore from the top down.
+        for name in sorted(changed, reverse=True):
+            target = os.path.join(self.path, name)
+            mode = self.baseline.get(name, (0,))[0]
+            if not (stat.S_ISDIR(mode) and _isdir(target)):
+                _remove(target)
+        for name in sorted(changed):
+            if name not in self.baseline:
+                continue
+            source = os.path.join(self.template, name)
+            target = os.path.join(self.path, name)
+            if os.path.islink(source):
+                os.symlink(os.readlink(source), target)
+            elif os.path.isdir(source):
+                if not _isdir(target):
+                    os.mkdir(target)
+                shutil.copymode(source, target)
+            else:
+                shutil.copy2(source, target)
+            self.baseline[name] = _key(os.lstat(target))
+
+    def close(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+def _default_dir():
+    if os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK):
+        return '/dev/shm'
+    return None
+
+
+def _write(path, content):
+    parent = os.path.dirname(path)
+    if not os.path.isdir(parent):
+        os.makedirs(parent)
+    if isinstance(content, six.text_type):
+        content = content.encode('utf-8')
+    with open(path, 'wb') as f:
+        f.write(content)
+
+
+def _key(st):
+    if stat.S_ISDIR(st.st_mode):
+        # Directory times change with their entries, which are compared
+        # separately.
+        return st.st_mode,
+    # The change time can't be set by the tests, so it catches changes
+    # that preserve the size and modification time.
+    return (st.st_mode, st.st_ino, st.st_size,
+            getattr(st, 'st_mtime_ns', st.st_mtime),
+            getattr(st, 'st_ctime_ns', st.st_ctime))
+
+
+def _scan(top):
+    entries = {}
+    prefix = len(top) + 1
+    for dirpath, dirnames, filenames in os.walk(top):
+        for name in dirnames + filenames:
+            path = os.path.join(dirpath, name)
+            entries[path[prefix:]] = _key(os.lstat(path))
+    return entries
+
+
+def _isdir(path):
+    return os.path.isdir(path) and not os.path.islink(path)
+
+
+def _remove(path):
+    try:
+        st = os.lstat(path)
+    except OSError:
+        return
+    if stat.S_ISDIR(st.st_mode):
+        shutil.rmtree(path)
+    else:
+        os.unlink(path)
+
+
+def _close(key):
+    tree = _trees.pop(key, None)
+    if tree is not None:
+        tree.close()
@@ -0,0 +1,140 @@
+"""\
+Support for faking out ``httpx`` asynchronous clients for tests.
+
+Requests made using ``httpx.AsyncClient`` with the default transport
+are answered using prepared responses, configured the same way as for
+:class:`kt.testing.requests.Requests`.
+
+Response latency is simulated using an event loop with a virtual
+clock, so many concurrent requests with long latencies complete
+immediately.
+
+"""
+
+from __future__ import absolute_import
+
+import collections
+
+try:
+    import asyncio
+except ImportError:  # pragma: no cover
+    asyncio = None
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover
+    httpx = None
+
+import kt.testing.clock
+import kt.testing.patching
+import kt.testing.requests
+
+
+# The request handler is a coroutine function, defined this way so the
+# module remains valid Python 2 syntax; test discovery imports it even
+# where httpx isn't available.
+_coroutines = {}
+if asyncio is not None:
+    exec('''if True:
+    async def handle_async_request(self, request):
+        url = str(request.url)
+        host = request.url.host
+        data = await request.aread()
+        kwargs = {'headers': dict(request.headers), 'data': data or None}
+        timeout = request.extensions.get('timeout', {}).get('read')
+        if timeout is not None:
+            kwargs['timeout'] = timeout
+
+        self.in_flight[host] += 1
+        self.peak_in_flight[host] = max(self.peak_in_flight[host],
+                                        self.in_flight[host])
+        try:
+            # Nothing is awaited between handling the request and taking
+            # the pending delay, so concurrent requests don't mix them.
+            self._pending = 0.0
+            try:
+                response = self.request(request.method, url, **kwargs)
+            finally:
+                delay, self._pending = self._pending, 0.0
+                if delay:
+                    await asyncio.sleep(delay)
+        finally:
+            self.in_flight[host] -= 1
+
+        return httpx.Response(
+            response.status_code,
+            headers=list(response.headers.items()),
+            content=response.content,
+            request=request,
+        )
+    ''', globals(), _coroutines)
+
+
+class HTTPX(kt.testing.requests.Requests):
+
+    def setup(self):
+        self._reset_state()
+        self._pending = 0.0
+        self.in_flight = collections.Counter()
+        self.peak_in_flight = collections.Counter()
+
+        kt.testing.patching.patch(self.test, {
+            'httpx.AsyncHTTPTransport.handle_async_request':
+                self.handle_async_request,
+        })
+
+    def _connect_timeout(self, url):
+        return connect_timeout(url)
+
+    def _read_timeout(self, url):
+        return read_timeout(url)
+
+    def _unreachable_host(self, url):
+        return unreachable_host(url)
+
+    def _wait(self, seconds):
+        # Latency (or the timeout, for responses exceeding it) is
+        # waited for using the event loop once the request is handled.
+        self._pending += seconds
+
+    def _now(self):
+        # Without a clock, the virtual time of the running loop is used.
+        if self._clock is None:
+            try:
+                return asyncio.get_running_loop().time()
+            except RuntimeError:
+                pass
+        return super(HTTPX, self)._now()
+
+    def new_event_loop(self):
+        """Return an event loop using a virtual clock.
+
+        If the fixture was given a clock, the loop uses that clock.
+
+        """
+        return kt.testing.clock.VirtualTimeEventLoop(clock=self._clock)
+
+    def run(self, coro):
+        """Run a coroutine to completion using a virtual clock."""
+        loop = self.new_event_loop()
+        try:
+            return loop.run_until_complete(coro)
+        finally:
+            loop.close()
+
+    handle_async_request = _coroutines.get('handle_async_request')
+
+
+def connect_timeout(url):
+    """Return the exception raised when `url` doesn't accept a connection."""
+    return httpx.ConnectTimeout('timed out connecting to %s' % url)
+
+
+def read_timeout(url):
+    """Return the exception raised when `url` doesn't respond in time."""
+    return httpx.ReadTimeout('timed out reading from %s' % url)
+
+
+def unreachable_host(url):
+    """Return the exception raised when the host for `url` is unreachable."""
+    return httpx.ConnectError('[Errno 113] No route to host')
@@ -0,0 +1,191 @@
+"""\
+Capture of log records for each test.
+
+Capturing logging by formatting every record into a buffer costs a lot
+for code that logs heavily, even though the output is only looked at
+when a test fails.  The :class:`LogCapture` fixture component keeps a
+bounded number of records, indexed by level and logger name, and only
+formats them when asked, or when the test fails.
+
+"""
+
+from __future__ import absolute_import
+
+import collections
+import heapq
+import itertools
+import logging
+
+import six
+
+import kt.testing
+
+
+class LogCapture(kt.testing.FixtureComponent):
+    """Capture records logged using logger `name` during each test.
+
+    The most recent `capacity` records are kept (all records if
+    `capacity` is None); the number of older records discarded is
+    available as ``dropped``.  If `level` is provided, records below
+    that level are ignored, and the logger's level is lowered for the
+    duration of the test if needed.
+
+    Records are formatted using `format` only when :meth:`output` is
+    called.  If the test fails and `attach` is true, the output is
+    added to the failure report recorded by ``unittest``.
+
+    """
+
+    def __init__(self, testcase, name=None, level=logging.NOTSET,
+                 capacity=1000, format=logging.BASIC_FORMAT, attach=True):
+        super(LogCapture, self).__init__(testcase)
+        self.name = name
+        self.level = _level(level)
+        self.capacity = capacity
+        self.format = format
+        self.attach = attach
+        self.formatter = logging.Formatter(format)
+        self._handler = None
+
+    def setup(self):
+        self._handler = handler = _Handler(self.level, self.capacity)
+        logger = logging.getLogger(self.name)
+        if self.level and logger.getEffectiveLevel() > self.level:
+            self.test.addCleanup(logger.setLevel, logger.level)
+            logger.setLevel(self.level)
+        logger.addHandler(handler)
+        self.test.addCleanup(logger.removeHandler, handler)
+
+    def teardown(self):
+        if self.attach and self._handler.records:
+            _attach(self.test, self._attachment)
+
+    def _attachment(self):
+        return '\nCaptured logging:\n%s' % self.output()
+
+    @property
+    def records(self):
+        """Captured records, oldest first."""
+        return [record for seq, record in self._handler.records]
+
+    @property
+    def dropped(self):
+        """Number of records discarded to stay within the capacity."""
+        return self._handler.dropped
+
+    def records_for(self, level=None, name=None):
+        """Return captured records at or above `level`, oldest first.
+
+        If `name` is provided, only records from that logger and its
+        descendants are returned.
+
+        """
+        handler = self._handler
+        if name is not None:
+            prefix = name + '.'
+            entries = heapq.merge(*[
+                entries for logger, entries in handler.by_name.items()
+                if logger == name or logger.startswith(prefix)])
+            if level is not None:
+                level = _level(level)
+                return [record for seq, record in entries
+                        if record.levelno >= level]
+        elif level is not None:
+            level = _level(level)
+            entries = heapq.merge(*[
+                entries for levelno, entries in handler.by_level.items()
+                if levelno >= level])
+        else:
+            entries = handler.records
+        return [record for seq, record in entries]
+
+    def messages(self, level=None, name=None):
+        """Return the messages for captured records, oldest first."""
+        return [record.getMessage()
+                for record in self.records_for(level, name)]
+
+    def output(self, level=None, name=None):
+        """Return the formatted text for captured records."""
+        return ''.join(self.formatter.format(record) + '\n'
+                       for record in self.records_for(level, name))
+
+    def clear(self):
+        """Discard all captured records."""
+        self._handler.clear()
+
+
+class _Handler(logging.Handler):
+    """Handler storing records without formatting them."""
+
+    def __init__(self, level, capacity):
+        super(_Handler, self).__init__(level)
+        self.capacity = capacity
+        self.clear()
+
+    def clear(self):
+        # Entries are (sequence, record) pairs, so the indexes can be
+        # merged in the order the records were captured.
+        self.records = collections.deque()
+        self.by_level = collections.defaultdict(collections.deque)
+        self.by_name = collections.defaultdict(collections.deque)
+        self.dropped = 0
+        self._sequence = itertools.count()
+
+    def emit(self, record):
+        records = self.records
+        if self.capacity is not None and len(records) >= self.capacity:
+            if not self.capacity:
+                self.dropped += 1
+                return
+            # The oldest record is also the oldest in its indexes.
+            seq, old = records.popleft()
+            self.by_level[old.levelno].popleft()
+            self.by_name[old.name].popleft()
+            self.dropped += 1
+        entry = next(self._sequence), record
+        records.append(entry)
+        self.by_level[record.levelno].append(entry)
+        self.by_name[record.name].append(entry)
+
+
+def _level(level):
+    if isinstance(level, six.string_types):
+        return logging.getLevelName(level.upper())
+    return level
+
+
+def _attach(test, text):
+    # Add the result of calling `text` to failure reports for `test`
+    # recorded so far.  It's only called if there's a report to add to,
+    # so nothing gets formatted for tests that pass.  How the reports
+    # are recorded depends on the version of unittest.
+    outcome = getattr(test, '_outcome', None)
+    if outcome is None:
+        # Python 2: the outcome isn't available.
+        return
+    cache = []
+
+    def render():
+        if not cache:
+            cache.append(text())
+        return cache[0]
+
+    errors = getattr(outcome, 'errors', None)
+    if errors is not None:
+        # Before Python 3.11, exceptions are held until the cleanups
+        # have run.
+        for errored, exc_info in errors:
+            if errored is test and exc_info is not None:
+                exception = exc_info[1]
+                if exception.args and isinstance(exception.args[0],
+                                                 six.string_types):
+                    exception.args = ((exception.args[0] + render(),)
+                                      + exception.args[1:])
+        return
+    for attribute in ('failures', 'errors'):
+        reports = getattr(outcome.result, attribute, None)
+        if not isinstance(reports, list):
+            continue
+        for index, (failed, report) in enumerate(reports):
+            if failed is test:
+                reports[index] = failed, report + render()
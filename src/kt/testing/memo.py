@@ -0,0 +1,251 @@
+"""\
+Memoized data for fixture components.
+
+Fixture components often load the same reference data (parsed schemas,
+large JSON documents) based on the arguments passed to
+:func:`kt.testing.compose`.  A :class:`Memo` computes such data once for
+each distinct set of arguments, and shares it with every test in the
+process; it can also save the data on disk, so new processes (such as
+test runner workers) can load it instead of computing it again.
+
+Memoized values are shared, so they must not be modified.
+
+"""
+
+from __future__ import absolute_import
+
+import collections
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+
+from six.moves import collections_abc
+
+
+_MISSING = object()
+
+
+class Memo(object):
+    """Cache the values returned by `factory`, keyed by its arguments.
+
+    Calling the memo with arguments returns the value `factory` returns
+    for those arguments, computing it only if it isn't cached.  At most
+    `maxsize` values are kept in memory (any number if None), discarding
+    the least recently used.  If `maxbytes` is provided, values are also
+    discarded to keep the total size within that limit; the size of
+    each value is computed using `sizeof`, or is the length of its
+    pickle if `sizeof` isn't provided.
+
+    If `directory` is provided, values are also saved there as pickles,
+    and loaded from there when not in memory.  `sources` is a function
+    called with the same arguments as `factory`, returning the paths of
+    files the value is derived from; saved values are used only if those
+    files haven't changed since the value was computed.  Changing
+    `version` invalidates all saved values.  Values are only kept in
+    memory if the arguments or the value can't be pickled.
+
+    """
+
+    def __init__(self, factory, maxsize=128, maxbytes=None, sizeof=None,
+                 directory=None, sources=None, version=None):
+        self.factory = factory
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.sizeof = sizeof
+        self.directory = directory
+        self.sources = sources
+        self.version = version
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self._cache = collections.OrderedDict()
+        self._sizes = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, *args, **kwargs):
+        key = _make_key(args, kwargs)
+        if key is None:
+            # Neither hashable nor picklable, so there's no key.
+            with self._lock:
+                self.misses += 1
+            return self.factory(*args, **kwargs)
+        with self._lock:
+            value = self._cache.pop(key, _MISSING)
+            if value is not _MISSING:
+                # Most recently used entries are at the end.
+                self._cache[key] = value
+                self.hits += 1
+                return value
+            self.misses += 1
+        value = _MISSING
+        path = None
+        if self.directory is not None:
+            path = self._path(key)
+        if path is not None:
+            value = self._load(path, args, kwargs)
+        if value is _MISSING:
+            value = self.factory(*args, **kwargs)
+            if path is not None:
+                self._save(path, args, kwargs, value)
+        self._store(key, value)
+        return value
+
+    def __len__(self):
+        return len(self._cache)
+
+    def clear(self):
+        """Discard the values held in memory."""
+        with self._lock:
+            self._cache.clear()
+            self._sizes.clear()
+            self._bytes = 0
+
+    def _store(self, key, value):
+        size = 0
+        if self.maxbytes is not None:
+            size = (self.sizeof(value) if self.sizeof is not None
+                    else len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL)))
+            if size > self.maxbytes:
+                # Never cached; keeping it would evict everything else.
+                return
+        with self._lock:
+            if key in self._cache:
+                return
+            self._cache[key] = value
+            self._sizes[key] = size
+            self._bytes += size
+            while self._cache and (
+                    (self.maxsize is not None
+                     and len(self._cache) > self.maxsize)
+                    or (self.maxbytes is not None
+                        and self._bytes > self.maxbytes)):
+                old, ignored = self._cache.popitem(last=False)
+                self._bytes -= self._sizes.pop(old)
+
+    def _path(self, key):
+        name = '%s.%s' % (getattr(self.factory, '__module__', ''),
+                          getattr(self.factory, '__name__', ''))
+        try:
+            data = pickle.dumps((name, self.version, key), 2)
+        except Exception:
+            # Not saved; see _make_key.
+            return None
+        return os.path.join(self.directory,
+                            hashlib.sha1(data).hexdigest() + '.pickle')
+
+    def _stamps(self, args, kwargs):
+        if self.sources is None:
+            return ()
+        stamps = []
+        for path in self.sources(*args, **kwargs):
+            try:
+                st = os.stat(path)
+            except OSError:
+                stamps.append((path, None, None))
+            else:
+                stamps.append((path, getattr(st, 'st_mtime_ns', st.st_mtime),
+                               st.st_size))
+        return tuple(stamps)
+
+    def _load(self, path, args, kwargs):
+        try:
+            with open(path, 'rb') as f:
+                stamps, value = pickle.load(f)
+        except Exception:
+            # Missing, unreadable, or written by incompatible code.
+            return _MISSING
+        if stamps != self._stamps(args, kwargs):
+            return _MISSING
+        self.loads += 1
+        return value
+
+    def _save(self, path, args, kwargs, value):
+        try:
+            data = pickle.dumps((self._stamps(args, kwargs), value),
+                                pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            # The value is only kept in memory.
+            return
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            # Replace atomically, so concurrent workers never see a
+            # partially written file.
+            getattr(os, 'replace', os.rename)(tmp, path)
+        except Exception:
+            os.unlink(tmp)
+            raise
+
+
+def memoized(**options):
+    """Decorator creating a :class:`Memo` for a function.
+
+    `options` are passed to :class:`Memo`::
+
+      @kt.testing.memo.memoized(maxsize=4, directory='.kt-cache',
+                                sources=lambda path: [path])
+      def load_schema(path):
+          ...
+
+    """
+    def decorator(factory):
+        return Memo(factory, **options)
+    return decorator
+
+
+def _make_key(args, kwargs):
+    # Equal arguments make equal keys, which also pickle the same way
+    # (and so are saved using the same file) in every process.
+    key = _canonical(args)
+    if kwargs:
+        key += (_KWARGS,) + tuple(sorted(
+            (name, _canonical(value)) for name, value in kwargs.items()))
+    try:
+        hash(key)
+    except TypeError:
+        # Arguments of other unhashable types; use their pickle.
+        try:
+            key = pickle.dumps(key, 2)
+        except Exception:
+            return None
+    return key
+
+
+def _canonical(value):
+    # Lists, mappings, and sets become tuples, with the items of mappings
+    # and sets sorted so the order they were added in doesn't matter.
+    if isinstance(value, tuple):
+        return tuple(_canonical(item) for item in value)
+    if isinstance(value, list):
+        return (_LIST,) + tuple(_canonical(item) for item in value)
+    if isinstance(value, collections_abc.Mapping):
+        return (_MAPPING,) + _sorted(
+            (_canonical(name), _canonical(item))
+            for name, item in value.items())
+    if isinstance(value, collections_abc.Set):
+        return (_SET,) + _sorted(_canonical(item) for item in value)
+    return value
+
+
+def _sorted(items):
+    items = list(items)
+    try:
+        return tuple(sorted(items))
+    except TypeError:
+        # Values of different types can't be compared on Python 3.
+        return tuple(sorted(items, key=lambda item: (
+            type(item).__name__, repr(item))))
+
+
+# Mark positional and keyword arguments, and canonical forms of
+# containers, in keys.
+_KWARGS = '<kwargs>'
+_LIST = '<list>'
+_MAPPING = '<mapping>'
+_SET = '<set>'
@@ -0,0 +1,155 @@
+"""\
+Detection of memory growth during individual tests.
+
+Leaks in code under test usually show up only as the memory used by a
+long test run growing over time, which doesn't say what's leaking.
+Checking the memory allocated by each test, and reporting the source
+lines responsible for any growth, narrows the search considerably.
+
+Memory allocations are traced using :mod:`tracemalloc`, which is only
+available on Python 3; on Python 2 no checks are performed.
+
+"""
+
+from __future__ import absolute_import
+
+import collections
+import gc
+import linecache
+import warnings
+import zlib
+
+try:
+    import tracemalloc
+except ImportError:  # pragma: no cover
+    tracemalloc = None
+
+import kt.testing
+
+
+class MemoryGrowthWarning(UserWarning):
+    """Warning issued for memory growth when failures aren't wanted."""
+
+
+class MemoryGrowth(kt.testing.FixtureComponent):
+    """Compare memory allocated before and after each test.
+
+    If allocations not released by the end of a test exceed `threshold`
+    bytes, the test fails, reporting the `top` source lines allocating
+    the most memory.  When `fail` is false, a
+    :class:`MemoryGrowthWarning` is issued instead.
+
+    Tracing allocations slows everything down, so `sample` can be used
+    to check only a fraction of the tests; the selection depends only on
+    the test id, so the same tests are checked on every run.  Tracing is
+    started for checked tests only (unless it's already been started),
+    using `frames` frames for each traceback.
+
+    If `types` is true, the number of objects tracked by the garbage
+    collector is also compared, by type.  This is relatively expensive.
+
+    Compose this before other fixture components to include their
+    setup and teardown in the check.
+
+    """
+
+    def __init__(self, testcase, threshold=1024 * 1024, fail=True,
+                 sample=1.0, frames=1, top=10, types=False):
+        super(MemoryGrowth, self).__init__(testcase)
+        self.threshold = threshold
+        self.fail = fail
+        self.sample = sample
+        self.frames = frames
+        self.top = top
+        self.types = types
+
+    def setup(self):
+        self.active = tracemalloc is not None and self._sampled()
+        self.growth = None
+        self.stats = []
+        self.objects = collections.Counter()
+        if not self.active:
+            return
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self.test.addCleanup(tracemalloc.stop)
+        gc.collect()
+        if self.types:
+            self._types_before = _count_objects()
+        self._before = tracemalloc.take_snapshot()
+
+    def teardown(self):
+        """The test failed if memory grew by more than the threshold."""
+        if not self.active:
+            return
+        gc.collect()
+        after = tracemalloc.take_snapshot()
+        self.stats = [stat for stat in after.compare_to(self._before, 'lineno')
+                      if stat.traceback[0].filename not in _IGNORED]
+        self._before = None
+        self.growth = sum(stat.size_diff for stat in self.stats)
+        if self.types:
+            self.objects = _count_objects()
+            self.objects.subtract(self._types_before)
+            self._types_before = None
+        if self.growth > self.threshold:
+            message = self.report()
+            if self.fail:
+                raise AssertionError(message)
+            warnings.warn(message, MemoryGrowthWarning)
+
+    def report(self):
+        """Return a description of the growth measured for the test."""
+        lines = ['memory grew by %s (threshold %s) in %s'
+                 % (_format_size(self.growth),
+                    _format_size(self.threshold), self.test.id())]
+        growing = [stat for stat in self.stats if stat.size_diff > 0]
+        for stat in growing[:self.top]:
+            frame = stat.traceback[0]
+            lines.append('  %s:%s: +%s (%+d blocks)'
+                         % (frame.filename, frame.lineno,
+                            _format_size(stat.size_diff), stat.count_diff))
+            line = linecache.getline(frame.filename, frame.lineno).strip()
+            if line:
+                lines.append('    ' + line)
+        objects = [(name, count) for name, count in self.objects.items()
+                   if count > 0]
+        objects.sort(key=lambda item: (-item[1], item[0]))
+        for name, count in objects[:self.top]:
+            lines.append('  %+d %s objects' % (count, name))
+        return '\n'.join(lines)
+
+    def _sampled(self):
+        if self.sample >= 1:
+            return True
+        key = self.test.id().encode('utf-8')
+        return (zlib.crc32(key) & 0xffffffff) < self.sample * 2 ** 32
+
+
+# Allocations made by the measurements themselves aren't interesting.
+# Filtering the per-line statistics is much cheaper than filtering the
+# snapshots, which contain every allocation.
+_IGNORED = frozenset([
+    __file__,
+    linecache.__file__,
+    getattr(tracemalloc, '__file__', None),
+    '<frozen importlib._bootstrap>',
+    '<frozen importlib._bootstrap_external>',
+    '<unknown>',
+])
+
+
+def _count_objects():
+    counts = collections.Counter()
+    for obj in gc.get_objects():
+        cls = type(obj)
+        counts['%s.%s' % (cls.__module__,
+                          getattr(cls, '__qualname__', cls.__name__))] += 1
+    return counts
+
+
+def _format_size(size):
+    for unit, scale in (('MiB', 2 ** 20), ('KiB', 2 ** 10)):
+        if abs(size) >= scale:
+            return '%.1f %s' % (size / float(scale), unit)
+    return '%d B' % size
@@ -0,0 +1,148 @@
+"""\
+Patching many targets for each test, with little overhead.
+
+Fixture components commonly use ``mock.patch`` for each attribute they
+replace, starting the patch during setup and stopping it in a cleanup.
+Each of those patches imports its target again when started.  The
+:class:`Patches` component (and the :func:`patch` function used to
+implement it) parses each dotted target once for each test class, finds
+the objects owning the attributes without importing anything already
+imported, and replaces and restores all the attributes in a single pass.
+
+"""
+
+from __future__ import absolute_import
+
+import importlib
+import sys
+import weakref
+
+import kt.testing
+
+
+# Replacement value requesting a new MagicMock for each test.
+MOCK = object()
+
+_MISSING = object()
+
+# Parsed targets for each test class: {cls: {target: (path, name)}}.
+_parsed = weakref.WeakKeyDictionary()
+
+
+class Patches(kt.testing.FixtureComponent):
+    """Replace attributes named by dotted `targets` for each test.
+
+    `targets` maps dotted names (as used with ``mock.patch``) to the
+    replacement values.  If the replacement is :data:`MOCK`, a new
+    ``MagicMock`` is created for each test.  The replacement in effect
+    for a target is available using the target as a key::
+
+      class TestSomething(kt.testing.TestCase):
+
+          patches = kt.testing.compose(kt.testing.patching.Patches, {
+              'myapp.clock.now': lambda: 42,
+              'myapp.db.connect': kt.testing.patching.MOCK,
+          })
+
+          def test_connection(self):
+              ...
+              self.patches['myapp.db.connect'].assert_called_once_with()
+
+    If `create` is true, attributes that don't exist are created, and
+    removed again during cleanup.
+
+    """
+
+    def __init__(self, testcase, targets, create=False):
+        super(Patches, self).__init__(testcase)
+        self.targets = targets
+        self.create = create
+        self.patched = {}
+
+    def setup(self):
+        self.patched = patch(self.test, self.targets, create=self.create)
+
+    def __getitem__(self, target):
+        return self.patched[target]
+
+
+def patch(test, targets, create=False):
+    """Replace attributes named by `targets` until `test` is cleaned up.
+
+    Targets are parsed once for each class of `test`, and the objects
+    owning the attributes are looked up each time, so objects replaced
+    in the meantime aren't patched instead.  All the attributes are
+    replaced at once, and restored in a single cleanup.
+    Returns a dictionary mapping each target to its replacement.
+
+    """
+    cls = test.__class__
+    parsed = _parsed.get(cls)
+    if parsed is None:
+        parsed = _parsed[cls] = {}
+    patched = {}
+    saved = []
+    try:
+        for target, replacement in targets.items():
+            location = parsed.get(target)
+            if location is None:
+                location = parsed[target] = _parse(target)
+            path, name = location
+            owner = _owner(path)
+            try:
+                original = vars(owner).get(name, _MISSING)
+            except TypeError:
+                # No __dict__ (using __slots__, for example).
+                original = getattr(owner, name, _MISSING)
+            if original is _MISSING and not create and not hasattr(
+                    owner, name):
+                raise AttributeError('%r does not have the attribute %r'
+                                     % (owner, name))
+            if replacement is MOCK:
+                replacement = _magic_mock(target)
+            setattr(owner, name, replacement)
+            saved.append((owner, name, original))
+            patched[target] = replacement
+    except Exception:
+        _restore(saved)
+        raise
+    test.addCleanup(_restore, saved)
+    return patched
+
+
+def _restore(saved):
+    for owner, name, original in reversed(saved):
+        if original is _MISSING:
+            delattr(owner, name)
+        else:
+            setattr(owner, name, original)
+
+
+def _parse(target):
+    try:
+        path, name = target.rsplit('.', 1)
+    except ValueError:
+        raise TypeError('need a valid target to patch; got %r' % (target,))
+    return tuple(path.split('.')), name
+
+
+def _owner(path):
+    owner = sys.modules.get(path[0])
+    if owner is None:
+        owner = importlib.import_module(path[0])
+    imported = path[0]
+    for part in path[1:]:
+        imported += '.' + part
+        try:
+            owner = getattr(owner, part)
+        except AttributeError:
+            owner = importlib.import_module(imported)
+    return owner
+
+
+def _magic_mock(target):
+    try:
+        from unittest import mock
+    except ImportError:
+        import mock
+    return mock.MagicMock(name=target)
@@ -0,0 +1,157 @@
+"""\
+pytest plugin supporting tests derived from :class:`kt.testing.TestCase`.
+
+The plugin is registered using the ``pytest11`` entry point, so it's
+active whenever ``kt.testing`` is installed.  It:
+
+- calls :func:`kt.testing.cleanup.cleanup` when each test session
+  (including each ``pytest-xdist`` worker session) starts and finishes,
+
+- collects each case of a test method decorated using
+  :func:`kt.testing.parameters` as a separate test, with the case id
+  appended to the name (``test_evaluate[1]``),
+
+- adds the names of composed fixture component factories as keywords,
+  so tests using a component can be selected using ``-k``, and
+
+- marks tests using class- or module-scoped fixture components so
+  ``pytest-xdist`` can keep them together when distributing tests across
+  workers, so those components are only set up once per worker.  This
+  requires the ``loadgroup`` distribution mode; the
+  ``kt_testing_xdist_grouping`` ini setting switches the default
+  ``load`` mode to ``loadgroup``.
+
+Fixture component factories declare their scope using a ``scope``
+attribute, with a value of ``'class'`` or ``'module'``.
+
+"""
+
+from __future__ import absolute_import
+
+import inspect
+
+import _pytest.unittest
+import pytest
+
+import kt.testing
+import kt.testing.cleanup
+
+
+SCOPES = 'module', 'class'
+
+
+def pytest_addoption(parser):
+    parser.addini(
+        'kt_testing_xdist_grouping',
+        'use the "loadgroup" pytest-xdist distribution instead of "load",'
+        ' keeping tests using class- or module-scoped kt.testing fixture'
+        ' components on one worker (default: false)',
+        type='bool', default=False)
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_configure(config):
+    if not config.pluginmanager.hasplugin('xdist'):
+        config.addinivalue_line(
+            'markers', 'xdist_group(name): used by kt.testing for grouping')
+    # Grouping relies on the "loadgroup" distribution mode, which is
+    # otherwise the same as the default "load" mode.  Changing the mode
+    # affects every test, so it's only done if requested.
+    if (config.getini('kt_testing_xdist_grouping')
+            and getattr(config.option, 'dist', 'no') == 'load'):
+        config.option.dist = 'loadgroup'
+    # Workers parse the original command line, so they have to be told
+    # to apply the xdist_group markers.
+    workerinput = getattr(config, 'workerinput', None)
+    if workerinput and workerinput.get('kt_testing_loadgroup'):
+        config.option.loadgroup = True
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_configure_node(node):
+    if node.config.option.dist == 'loadgroup':
+        node.workerinput['kt_testing_loadgroup'] = True
+
+
+def pytest_report_header(config):
+    if getattr(config.option, 'dist', 'no') == 'loadgroup':
+        return 'kt.testing: grouping tests by fixture component scope'
+
+
+@pytest.fixture(scope='session', autouse=True)
+def kt_testing_cleanup():
+    """Invoke global cleanups at the start and end of each session."""
+    kt.testing.cleanup.cleanup()
+    yield
+    kt.testing.cleanup.cleanup()
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_pycollect_makeitem(collector, name, obj):
+    # Takes over from the unittest plugin for kt.testing test classes.
+    if (inspect.isclass(obj) and issubclass(obj, kt.testing.TestCase)
+            and not inspect.isabstract(obj)):
+        return UnitTestCase.from_parent(collector, name=name, obj=obj)
+    return None
+
+
+class UnitTestCase(_pytest.unittest.UnitTestCase):
+    """Collector for a :class:`kt.testing.TestCase` class.
+
+    Parameterized test methods are collected as one item for each case.
+
+    """
+
+    def collect(self):
+        for item in super(UnitTestCase, self).collect():
+            method = getattr(self.obj, item.name, None)
+            parameters = getattr(method, '__kt_parameters__', None)
+            if parameters is None:
+                yield item
+                continue
+            for case in parameters:
+                yield CaseFunction.from_parent(
+                    self, name='%s[%s]' % (item.name, case[0]),
+                    originalname=item.name, case=case)
+
+
+class CaseFunction(_pytest.unittest.TestCaseFunction):
+    """Item running a single case of a parameterized test method."""
+
+    def __init__(self, *args, **kwargs):
+        # The test is created while the base class is initialized.
+        self.case = kwargs.pop('case')
+        super(CaseFunction, self).__init__(*args, **kwargs)
+
+    def _getinstance(self):
+        test = self.parent.obj(self.originalname)
+        test._set_case(self.case)
+        return test
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_collection_modifyitems(session, config, items):
+    for item in items:
+        cls = getattr(item, 'cls', None)
+        if cls is None or not issubclass(cls, kt.testing.TestCase):
+            continue
+        factories = [factory for marker, factory, args, kwargs
+                     in kt.testing._fixture_plan(cls)]
+        item.extra_keyword_matches.update(
+            getattr(factory, '__name__', None) or repr(factory)
+            for factory in factories)
+        scope = component_scope(factories)
+        if scope == 'module':
+            item.add_marker(pytest.mark.xdist_group(item.module.__name__))
+        elif scope == 'class':
+            item.add_marker(pytest.mark.xdist_group(
+                '%s.%s' % (item.module.__name__, cls.__name__)))
+
+
+def component_scope(factories):
+    """Return the broadest scope declared by `factories`, if any."""
+    scopes = set(getattr(factory, 'scope', None) for factory in factories)
+    for scope in SCOPES:
+        if scope in scopes:
+            return scope
+    return None
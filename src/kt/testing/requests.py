@@ -12,33 +12,39 @@ by URL from Python (httplib, urllib, urllib2, etc.).
 from __future__ import absolute_import
 
 import collections
+import datetime
 import errno
-import json
-import socket
+import math
+import numbers
+import random
+import time
+import weakref
 
-try:
-    from unittest import mock
-except ImportError:
-    import mock
+from six.moves import collections_abc
 
-from six.moves import urllib
-import requests.structures
-import urllib3
+import kt.testing.cleanup
+import kt.testing.patching
 
 
 RESPONSE_ENTITY_NOT_ALLOWED = 204, 205, 301, 302, 303, 304, 307, 308
 
+monotonic = getattr(time, 'monotonic', time.time)
+
 
 class Requests(object):
 
-    def __init__(self, test, body='', content_type='text/plain'):
+    def __init__(self, test, body='', content_type='text/plain', seed=0,
+                 templates=None, clock=None, baseline=None):
         self.test = test
         self.body = body
         self.content_type = content_type
+        self.seed = seed
+        self.templates = {} if templates is None else templates
+        self.clock = clock
+        self.baseline = baseline
 
     def setup(self):
-        self.requests = []
-        self.responses = {}
+        self._reset_state()
 
         # We really want to intercept Session.get_adapter and provide
         # our own adapter.  That would allow us to get the prepared
@@ -46,13 +52,59 @@ class Requests(object):
         # method, and rely less on the raw kwargs passed to the requests
         # API.
         #
-        p = mock.patch('requests.sessions.Session.request', self.request)
-        self.test.addCleanup(p.stop)
-        p.start()
+        if _original_request is not None:
+            # Intercepted for the whole process; just make this fixture
+            # the one handling requests until the test is cleaned up.
+            self.test.addCleanup(_activate, _active)
+            _activate(self)
+            return
+        kt.testing.patching.patch(
+            self.test, {'requests.sessions.Session.request': self.request})
+
+    def _reset_state(self):
+        self.requests = []
+        if self.baseline is None:
+            self.responses = {}
+        else:
+            self.responses = _Responses(self._baseline_responses())
+        self.faults = []
+        self.rate_limits = []
+        # Re-seeded for each test so fault injection is reproducible
+        # regardless of which tests ran before.
+        self.random = random.Random(self.seed)
+        self._clock = kt.testing._component(self.test, self.clock)
+
+    def _baseline_responses(self):
+        # Baseline responses are prepared once for each test class.
+        compiled = _baselines.setdefault(self.test.__class__, {})
+        key = (self.baseline, self.body, self.content_type,
+               id(self.templates) if self.templates else None)
+        responses = compiled.get(key)
+        if responses is None:
+            builder = self.__class__(None, body=self.body,
+                                     content_type=self.content_type,
+                                     templates=self.templates)
+            builder.responses = {}
+            builder.faults = []
+            self.baseline(builder)
+            if builder.faults:
+                raise ValueError('baseline cannot add faults')
+            responses = compiled[key] = dict(
+                (k, tuple(entries))
+                for k, entries in builder.responses.items())
+        return responses
 
     def teardown(self):
-        """The test failed if there were too many or too few requests."""
-        if self.responses:
+        """The test failed if there were too many or too few requests.
+
+        Baseline responses don't need to be consumed.
+
+        """
+        if self.baseline is None:
+            unconsumed = bool(self.responses)
+        else:
+            unconsumed = self.responses.added()
+        if unconsumed:
             raise AssertionError('configured responses not consumed')
 
     def add_error(self, method, url, exception, filter=None):
@@ -60,27 +112,95 @@ class Requests(object):
         self._add(method, url, filter, exception)
 
     def add_connect_timeout(self, method, url, filter=None):
-        host = urllib.parse.urlsplit(url).hostname
-        exception = requests.exceptions.Timeout(
-            urllib3.exceptions.ConnectTimeoutError(
-                None, 'Connection to %s out. (connect timeout=57.9)' % host))
-        self._add(method, url, filter, exception)
+        self._add(method, url, filter, self._connect_timeout(url))
 
     def add_read_timeout(self, method, url, filter=None):
-        exception = requests.exceptions.Timeout(
-            urllib3.exceptions.ReadTimeoutError(
-                None, url, 'Read timed out. (read timeout=57.9)'))
-        self._add(method, url, filter, exception)
+        self._add(method, url, filter, self._read_timeout(url))
 
     def add_unreachable_host(self, method, url, filter=None):
-        reason = socket.error(errno.EHOSTUNREACH, 'No route to host')
-        exception = requests.exceptions.ConnectionError(
-            urllib3.exceptions.MaxRetryError(None, url, reason))
-        self._add(method, url, filter, exception)
+        self._add(method, url, filter, self._unreachable_host(url))
+
+    # Exceptions provided for timeouts and unreachable hosts; these
+    # are overridden by fakes for other HTTP client libraries.
+
+    def _connect_timeout(self, url):
+        return connect_timeout(url)
+
+    def _read_timeout(self, url):
+        return read_timeout(url)
+
+    def _unreachable_host(self, url):
+        return unreachable_host(url)
+
+    def add_fault(self, method, url, probability, exception=None,
+                  status=None, body='', headers={}, latency=None,
+                  filter=None):
+        """Inject a fault into a random fraction of matching requests.
+
+        Exactly one of `exception`, `status`, or `latency` must be
+        provided.  The returned :class:`FaultRule` counts how many
+        requests were considered and how many were affected.
+
+        """
+        if not 0.0 <= probability <= 1.0:
+            raise ValueError('probability must be between 0 and 1')
+        given = [x for x in (exception, status, latency) if x is not None]
+        if len(given) != 1:
+            raise ValueError(
+                'exactly one of exception, status, or latency is required')
+        if status in RESPONSE_ENTITY_NOT_ALLOWED and body:
+            raise ValueError(
+                'cannot provide non-empty body for status == %s' % status)
+        if filter is None:
+            filter = always_allowed
+        rule = FaultRule(method, url, probability, filter, exception,
+                         status, body, headers, latency)
+        self.faults.append(rule)
+        return rule
+
+    def add_rate_limit(self, method, url, rate, burst=None, status=429,
+                       body='', headers={}, filter=None):
+        """Throttle matching requests using a token bucket.
+
+        Up to `burst` requests (`rate`, rounded up, by default) are
+        allowed at once, refilled at `rate` requests per second.
+        Requests made when the bucket is empty receive a response with
+        `status` and a ``Retry-After`` header, without consuming
+        configured responses.  The returned :class:`RateLimitRule`
+        counts how many requests were considered and how many were
+        throttled.
+
+        """
+        if rate <= 0:
+            raise ValueError('rate must be positive')
+        if burst is None:
+            burst = max(1, int(math.ceil(rate)))
+        if burst < 1:
+            raise ValueError('burst must be at least 1')
+        if filter is None:
+            filter = always_allowed
+        rule = RateLimitRule(method, url, rate, burst, filter, status,
+                             body, headers)
+        self.rate_limits.append(rule)
+        return rule
+
+    def _now(self):
+        # Time used to refill rate limit buckets.
+        if self._clock is not None:
+            return self._clock.monotonic()
+        return monotonic()
 
     def add_response(self, method, url, status=200, body=None, headers={},
-                     filter=None):
-        headers = requests.structures.CaseInsensitiveDict(headers)
+                     filter=None, template=None, latency=0.0):
+        if template is not None:
+            if status != 200 or body is not None or headers:
+                raise ValueError(
+                    'cannot provide status, body, or headers with template')
+            if not isinstance(template, ResponseTemplate):
+                template = self.templates[template]
+            self._add(method, url, filter, template, latency)
+            return
+        content_type = None
         if status in RESPONSE_ENTITY_NOT_ALLOWED:
             if body:
                 raise ValueError(
@@ -88,27 +208,102 @@ class Requests(object):
             body = ''
         elif body is None:
             body = self.body
-            headers['Content-Type'] = self.content_type
-        self._add(method, url, filter, Response(status, body, headers))
-
-    def _add(self, method, url, filter, response):
+            content_type = self.content_type
+        # The response object is only built if the response is used;
+        # the headers are copied now, so later changes by the caller
+        # don't affect it.
+        self._add(method, url, filter,
+                  _DeferredResponse(status, body, dict(headers),
+                                    content_type),
+                  latency)
+
+    def _add(self, method, url, filter, response, latency=0.0):
         key = method.upper(), url
         if filter is None:
             filter = always_allowed
         responses = self.responses.setdefault(key, [])
-        responses.append((filter, response))
+        responses.append((filter, response, latency))
 
     def request(self, method, url, *args, **kwargs):
+        latency = 0.0
+        # Throttled requests don't reach faults or configured responses.
+        response = self._throttle(method, url, *args, **kwargs)
+        if response is None:
+            for rule in self.faults:
+                if not rule.matches(method, url, *args, **kwargs):
+                    continue
+                rule.calls += 1
+                if self.random.random() >= rule.probability:
+                    continue
+                rule.injected += 1
+                if rule.latency is not None:
+                    # Latency accumulates; the request is still answered.
+                    latency += rule.latency
+                    continue
+                response = rule.make_response(url)
+                break
+            else:
+                response = self._response_for(method, url, *args, **kwargs)
+        response = self._delay(response, url, latency, kwargs)
+
+        self.requests.append(RequestInfo(
+            # `method` is uppercase when using the Session interface directly.
+            method.lower(), url, response, args, kwargs))
+        if isinstance(response, Exception):
+            if getattr(response, '__traceback__', None) is not None:
+                # Shared exception instances would otherwise accumulate
+                # traceback entries each time they're raised.
+                response.__traceback__ = None
+            raise response
+        else:
+            return response
+
+    def _throttle(self, method, url, *args, **kwargs):
+        if not self.rate_limits:
+            return None
+        now = self._now()
+        for rule in self.rate_limits:
+            if rule.matches(method, url, *args, **kwargs):
+                response = rule.take(now)
+                if response is not None:
+                    return response
+        return None
+
+    def _delay(self, response, url, latency, kwargs):
+        if isinstance(response, Response):
+            if latency:
+                response.elapsed += datetime.timedelta(seconds=latency)
+            latency = response.elapsed.total_seconds()
+        if not latency:
+            return response
+        timeout = _read_timeout_seconds(kwargs.get('timeout'))
+        if timeout is not None and latency > timeout:
+            self._wait(timeout)
+            return self._read_timeout(url)
+        self._wait(latency)
+        return response
+
+    def _wait(self, seconds):
+        if seconds and self._clock is not None:
+            self._clock.sleep(seconds)
+
+    def _response_for(self, method, url, *args, **kwargs):
         key = method.upper(), url
         response = AssertionError('unexpected request: %s %s' % key)
 
         skipped_over = 0
-        for i, (filter, resp) in enumerate(self.responses.get(key, ())):
+        for i, (filter, resp, latency) in enumerate(
+                self.responses.get(key, ())):
             if filter(method, url, *args, **kwargs):
                 del self.responses[key][i]
                 if not self.responses[key]:
                     # All available responses have been consumed:
                     del self.responses[key]
+                if isinstance(resp, (_DeferredResponse, ResponseTemplate)):
+                    resp = resp.build(RequestInfo(
+                        method.lower(), url, None, args, kwargs))
+                if latency:
+                    resp.elapsed += datetime.timedelta(seconds=latency)
                 response = resp
                 break
             skipped_over += 1
@@ -122,6 +317,8 @@ class Requests(object):
             # improved in the future.
             #
             if method.upper() in ('PATCH', 'POST', 'PUT'):
+                import json
+
                 headers = {k.lower(): v
                            for k, v in kwargs.get('headers', {}).items()}
                 ctype = headers.get('content-type', '???')
@@ -159,20 +356,289 @@ class Requests(object):
                 if hasattr(response, 'message'):
                     # This is really only for Python 2:
                     response.message = message
-
-        self.requests.append(RequestInfo(
-            # `method` is uppercase when using the Session interface directly.
-            method.lower(), url, response, args, kwargs))
-        if isinstance(response, Exception):
-            raise response
-        else:
-            return response
+        return response
 
 
 def always_allowed(*args, **kwargs):
     return True
 
 
+# Baseline responses for each test class, keyed by the baseline
+# function and the fixture's defaults.
+_baselines = weakref.WeakKeyDictionary()
+
+
+class _Responses(collections_abc.MutableMapping):
+    """Prepared responses for a test, layered over baseline responses.
+
+    The baseline is shared by the tests of a class, and never modified;
+    the list of responses for a method and URL is copied from the
+    baseline only when it's first retrieved.
+
+    """
+
+    def __init__(self, baseline):
+        self.baseline = baseline
+        self._own = {}
+        self._removed = set()
+
+    def __getitem__(self, key):
+        try:
+            return self._own[key]
+        except KeyError:
+            if key in self._removed:
+                raise
+        entries = self._own[key] = list(self.baseline[key])
+        return entries
+
+    def __setitem__(self, key, value):
+        self._own[key] = value
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        self._own.pop(key, None)
+        if key in self.baseline:
+            self._removed.add(key)
+
+    def __contains__(self, key):
+        return key in self._own or (key in self.baseline
+                                    and key not in self._removed)
+
+    def __iter__(self):
+        for key in self._own:
+            yield key
+        for key in self.baseline:
+            if key not in self._own and key not in self._removed:
+                yield key
+
+    def __len__(self):
+        return len(self._own) + sum(
+            1 for key in self.baseline
+            if key not in self._own and key not in self._removed)
+
+    def clear(self):
+        self._own.clear()
+        self._removed.update(self.baseline)
+
+    def added(self):
+        """Return True if responses not from the baseline remain."""
+        for key, entries in self._own.items():
+            shared = self.baseline.get(key, ())
+            for entry in entries:
+                if not any(entry is s for s in shared):
+                    return True
+        return False
+
+
+# When install() has been called, Session.request is replaced once for
+# the process, and requests are passed to the active fixture.
+_original_request = None
+_active = None
+_deactivation = None
+
+
+def install():
+    """Intercept ``requests`` once for the rest of the process.
+
+    :class:`Requests` fixtures set up after this don't patch ``requests``
+    for each test; they become the active fixture until the test is
+    cleaned up, or until :func:`kt.testing.cleanup.cleanup` is called.
+    Requests made when no fixture is active cause an ``AssertionError``.
+
+    """
+    global _original_request, _deactivation
+    if _original_request is None:
+        import requests.sessions
+        Session = requests.sessions.Session
+        _original_request = Session.__dict__['request']
+        Session.request = _session_request
+        _deactivation = kt.testing.cleanup.add(_activate, (None,))
+
+
+def uninstall():
+    """Restore the interception of ``requests`` to one patch per test."""
+    global _original_request, _deactivation
+    if _original_request is not None:
+        import requests.sessions
+        requests.sessions.Session.request = _original_request
+        _original_request = None
+        _deactivation.unregister()
+        _deactivation = None
+        _activate(None)
+
+
+def _activate(fixture):
+    global _active
+    _active = fixture
+
+
+def _session_request(session, method, url, *args, **kwargs):
+    fixture = _active
+    if fixture is None:
+        raise AssertionError(
+            'request without an active fixture: %s %s'
+            % (method.upper(), url))
+    return fixture.request(method, url, *args, **kwargs)
+
+
+# The ``requests`` package (and everything it depends on) is imported
+# only when needed, so merely importing this module stays cheap.  This
+# matters when many short-lived processes are used to run tests.
+
+def _headers_dict(headers):
+    import requests.structures
+    return requests.structures.CaseInsensitiveDict(headers)
+
+
+def connect_timeout(url):
+    """Return the exception raised when `url` doesn't accept a connection."""
+    from six.moves import urllib
+    import requests.exceptions
+    import urllib3.exceptions
+
+    host = urllib.parse.urlsplit(url).hostname
+    return requests.exceptions.Timeout(
+        urllib3.exceptions.ConnectTimeoutError(
+            None, 'Connection to %s out. (connect timeout=57.9)' % host))
+
+
+def read_timeout(url):
+    """Return the exception raised when `url` doesn't respond in time."""
+    import requests.exceptions
+    import urllib3.exceptions
+
+    return requests.exceptions.Timeout(
+        urllib3.exceptions.ReadTimeoutError(
+            None, url, 'Read timed out. (read timeout=57.9)'))
+
+
+def unreachable_host(url):
+    """Return the exception raised when the host for `url` is unreachable."""
+    import socket
+
+    import requests.exceptions
+    import urllib3.exceptions
+
+    reason = socket.error(errno.EHOSTUNREACH, 'No route to host')
+    return requests.exceptions.ConnectionError(
+        urllib3.exceptions.MaxRetryError(None, url, reason))
+
+
+class _Rule(object):
+    """Rule applied to requests matching a method & URL.
+
+    `method` may be ``None`` to match any method.  `url` matches
+    requests for that exact URL, or for any URL below it, so a rule for
+    ``http://example.com`` applies to every request for that host.
+
+    """
+
+    calls = 0
+    """Number of matching requests considered by the rule."""
+
+    def __init__(self, method, url, filter):
+        self.method = None if method is None else method.upper()
+        self.url = url
+        self.filter = filter
+
+    def matches(self, method, url, *args, **kwargs):
+        if self.method is not None and self.method != method.upper():
+            return False
+        if url != self.url and not url.startswith(self.url.rstrip('/') + '/'):
+            return False
+        return self.filter(method, url, *args, **kwargs)
+
+
+class FaultRule(_Rule):
+    """Probabilistic fault applied to requests matching a method & URL."""
+
+    injected = 0
+    """Number of matching requests the fault was applied to."""
+
+    def __init__(self, method, url, probability, filter, exception=None,
+                 status=None, body='', headers={}, latency=None):
+        super(FaultRule, self).__init__(method, url, filter)
+        self.probability = probability
+        self.exception = exception
+        self.status = status
+        self.body = body
+        self.headers = headers
+        self.latency = latency
+
+    def make_response(self, url):
+        if self.exception is None:
+            return Response(self.status, self.body, self.headers)
+        elif isinstance(self.exception, Exception):
+            return self.exception
+        else:
+            return self.exception(url)
+
+    def __repr__(self):
+        return ('<%s %s %s p=%s calls=%d injected=%d>'
+                % (self.__class__.__name__, self.method or '*', self.url,
+                   self.probability, self.calls, self.injected))
+
+
+class RateLimitRule(_Rule):
+    """Token bucket throttling requests matching a method & URL.
+
+    The bucket starts full, holding `burst` tokens, and is refilled at
+    `rate` tokens per second.  Each request allowed takes a token.
+
+    """
+
+    throttled = 0
+    """Number of matching requests refused because the bucket was empty."""
+
+    def __init__(self, method, url, rate, burst, filter, status=429,
+                 body='', headers={}):
+        super(RateLimitRule, self).__init__(method, url, filter)
+        self.rate = rate
+        self.burst = burst
+        self.status = status
+        self.body = body
+        self.headers = headers
+        self.tokens = float(burst)
+        self._updated = None
+
+    def take(self, now):
+        """Take a token at time `now`.
+
+        Returns None if the request is allowed, or the response for a
+        throttled request.
+
+        """
+        self.calls += 1
+        if self._updated is not None:
+            self.tokens = min(self.burst, self.tokens
+                              + (now - self._updated) * self.rate)
+        self._updated = now
+        # Allow for rounding errors in the elapsed time, so clients
+        # pacing requests at exactly `rate` aren't throttled.
+        if self.tokens >= 1.0 - 1e-9:
+            self.tokens = max(0.0, self.tokens - 1.0)
+            return None
+        self.throttled += 1
+        headers = dict(self.headers)
+        headers['Retry-After'] = str(self.retry_after())
+        return Response(self.status, self.body, headers)
+
+    def retry_after(self):
+        """Return the whole seconds until a request would be allowed."""
+        return max(1, int(math.ceil((1.0 - self.tokens) / self.rate)))
+
+    @property
+    def allowed(self):
+        """Number of matching requests allowed."""
+        return self.calls - self.throttled
+
+    def __repr__(self):
+        return ('<%s %s %s rate=%s calls=%d throttled=%d>'
+                % (self.__class__.__name__, self.method or '*', self.url,
+                   self.rate, self.calls, self.throttled))
+
+
 _ReqInfo = collections.namedtuple(
     '_ReqInfo', ('method', 'url', 'response', 'args', 'kwargs'))
 
@@ -192,10 +658,130 @@ class RequestInfo(_ReqInfo):
                 % ((self.__class__.__name__,) + self))
 
 
+class MemoizedBody(object):
+    """Body factory that caches rendered bodies.
+
+    Instances can be created at module scope and shared by many tests,
+    so expensive bodies are only rendered once.  If `key` is provided,
+    it is called with the request information and the result is used as
+    the cache key; otherwise a single body is cached.
+
+    """
+
+    def __init__(self, factory, key=None):
+        self.factory = factory
+        self.key = key
+        self.cache = {}
+
+    def __call__(self, request):
+        key = None if self.key is None else self.key(request)
+        try:
+            return self.cache[key]
+        except KeyError:
+            body = self.cache[key] = self.factory(request)
+            return body
+
+    def clear(self):
+        self.cache.clear()
+
+
+def _read_timeout_seconds(timeout):
+    # The read timeout given by a number, a (connect, read) tuple, or a
+    # urllib3.Timeout object, or None if there isn't one.
+    if isinstance(timeout, tuple):
+        timeout = timeout[1]
+    elif hasattr(timeout, 'start_connect'):
+        # The read timeout can depend on the total timeout and the time
+        # taken to connect, which is none at all here.
+        timeout = timeout.clone()
+        timeout.start_connect()
+        timeout = timeout.read_timeout
+    if isinstance(timeout, numbers.Real):
+        return timeout
+    return None
+
+
+class _DeferredResponse(object):
+
+    __slots__ = 'status', 'body', 'headers', 'content_type'
+
+    def __init__(self, status, body, headers, content_type):
+        self.status = status
+        self.body = body
+        self.headers = headers
+        self.content_type = content_type
+
+    def build(self, request):
+        body = self.body
+        if callable(body):
+            body = body(request)
+        headers = _headers_dict(self.headers)
+        if self.content_type is not None:
+            headers['Content-Type'] = self.content_type
+        return Response(self.status, body, headers)
+
+
+class ResponseTemplate(object):
+    """Immutable response definition that can be shared by many tests.
+
+    Headers (including Content-Length and the optional Content-Type) and
+    the encoded body are computed once, when the template is created.
+    Each use of the template produces a lightweight response object that
+    shares the template's data.
+
+    """
+
+    __slots__ = 'status', 'text', 'content', '_headers', '_key'
+
+    def __init__(self, status=200, body='', headers={}, content_type=None):
+        if status in RESPONSE_ENTITY_NOT_ALLOWED and body:
+            raise ValueError(
+                'cannot provide non-empty body for status == %s' % status)
+        headers = _headers_dict(headers)
+        if content_type is not None:
+            headers['Content-Type'] = content_type
+        if (status not in RESPONSE_ENTITY_NOT_ALLOWED
+                and 'Content-Length' not in headers):
+            headers['Content-Length'] = str(len(body))
+        init = super(ResponseTemplate, self).__setattr__
+        init('status', status)
+        init('text', body)
+        init('content', body.encode('utf-8'))
+        init('_headers', headers)
+        init('_key', (status, body, tuple(sorted(headers.lower_items()))))
+
+    @property
+    def headers(self):
+        return self._headers.copy()
+
+    def build(self, request):
+        """Return a response object for a matched request."""
+        return _TemplateResponse(self)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('%s is immutable' % self.__class__.__name__)
+
+    def __eq__(self, other):
+        if not isinstance(other, ResponseTemplate):
+            return NotImplemented
+        return self._key == other._key
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self._key)
+
+    def __repr__(self):
+        return '<%s.%s %s>' % (self.__class__.__module__,
+                               self.__class__.__name__,
+                               self.status)
+
+
 class Response(object):
 
     def __init__(self, status, text='', headers={}):
-        headers = requests.structures.CaseInsensitiveDict(headers)
+        headers = _headers_dict(headers)
         if status in RESPONSE_ENTITY_NOT_ALLOWED:
             assert not text
         elif 'Content-Length' not in headers:
@@ -203,6 +789,11 @@ class Response(object):
         self.status_code = status
         self.text = text
         self.headers = headers
+        self.elapsed = datetime.timedelta(0)
+
+    @property
+    def content(self):
+        return self.text.encode('utf-8')
 
     def iter_content(self, chunk_size=1, decode_unicode=False):
         # This doesn't support decode_unicode (yet).
@@ -216,9 +807,37 @@ class Response(object):
             data = data[chunk_size:]
 
     def json(self):
+        import json
         return json.loads(self.text)
 
     def __repr__(self):
         return '<%s.%s %s>' % (self.__class__.__module__,
                                self.__class__.__name__,
                                self.status_code)
+
+
+class _TemplateResponse(Response):
+    """Response sharing the data of a :class:`ResponseTemplate`.
+
+    Headers are copied from the template only if they're accessed, so
+    code under test can't modify the template.
+
+    """
+
+    _headers = None
+
+    def __init__(self, template):
+        self.template = template
+        self.status_code = template.status
+        self.text = template.text
+        self.elapsed = datetime.timedelta(0)
+
+    @property
+    def content(self):
+        return self.template.content
+
+    @property
+    def headers(self):
+        if self._headers is None:
+            self._headers = self.template.headers
+        return self._headers
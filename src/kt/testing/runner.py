@@ -0,0 +1,928 @@
+"""\
+Test runner distributing tests across a pool of processes.
+
+Tests are grouped by class, and each worker runs its share of the
+classes as a single suite, ordered by module, so class and module
+fixtures are set up once per worker.  Global cleanups registered with
+:mod:`kt.testing.cleanup` are invoked when each worker starts and
+finishes.  Results from the workers are merged into a single
+``unittest`` result.
+
+Run tests found using ``unittest``-style discovery using::
+
+  python -m kt.testing.runner -j 4 -s src
+
+Durations of tests and classes can be recorded in a local file, and
+used to balance the work across workers, or across several machines
+running separate shards of the suite::
+
+  python -m kt.testing.runner --timings .kt-timings.json \\
+      --shard-count 3 --shard-index 0 --save-timings shard-0.json
+
+Shards don't update the timings file they share; durations saved by
+each shard are merged into it afterwards::
+
+  python -m kt.testing.runner --timings .kt-timings.json \\
+      --merge-timings shard-0.json shard-1.json shard-2.json
+
+The source files used by each test class can also be recorded, so later
+runs can select only the classes affected by files changed since::
+
+  python -m kt.testing.runner --dependencies .kt-dependencies.json \\
+      --changed-only
+
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import argparse
+import ast
+import hashlib
+import importlib
+import inspect
+import json
+import multiprocessing
+import os
+import signal
+import sys
+import time
+import types
+import unittest
+
+from six.moves import builtins
+from six.moves import queue
+
+import kt.testing
+import kt.testing.cleanup
+
+
+timer = getattr(time, 'perf_counter', time.time)
+
+
+class RemoteError(Exception):
+    """Error reported by a test run in a worker process."""
+
+
+class RemoteFailure(AssertionError):
+    """Failure reported by a test run in a worker process."""
+
+
+class ParallelSuite(object):
+    """Test suite that runs the tests it contains using worker processes.
+
+    This can be passed to the ``run`` method of a ``unittest`` runner in
+    place of a normal suite.
+
+    """
+
+    def __init__(self, tests=(), jobs=None, history=None, shard=None,
+                 dependencies=None, changed_only=False):
+        self.jobs = jobs or multiprocessing.cpu_count()
+        self.history = history
+        self.dependencies = dependencies
+        self.batches, self.local = group_by_class(iter_tests(tests))
+        self.unchanged = []
+        if changed_only:
+            if dependencies is None:
+                raise ValueError('changed_only requires dependencies')
+            selected = []
+            for batch in self.batches:
+                if dependencies.affected(batch):
+                    selected.append(batch)
+                else:
+                    self.unchanged.append(batch)
+            self.batches = selected
+        if shard is not None:
+            count, index = shard
+            if not 0 <= index < count:
+                raise ValueError('shard index must be in range(%d)' % count)
+            self.batches = partition(self.batches, count, self.weight)[index]
+            if index:
+                # Tests that must run in this process go with shard 0.
+                self.local = []
+
+    def countTestCases(self):
+        return (sum(len(methods) for module, name, methods in self.batches)
+                + len(self.local))
+
+    def __call__(self, result):
+        return self.run(result)
+
+    def run(self, result):
+        partitions = [p for p in self.partition(self.batches) if p]
+        root = self._root()
+        if self.jobs == 1 or len(partitions) <= 1:
+            for index, partition in enumerate(partitions):
+                replay(_run_partition(index, partition, root), result,
+                       self.history, self.dependencies)
+        else:
+            self._run_workers(partitions, result)
+        if self.local and not result.shouldStop:
+            unittest.TestSuite(self.local).run(result)
+        return result
+
+    def _root(self):
+        # Directory containing the files that dependencies are recorded
+        # for, or None if they aren't.
+        if self.dependencies is None:
+            return None
+        return self.dependencies.root
+
+    def _run_workers(self, partitions, result):
+        # Workers are started directly rather than using a pool, since
+        # pool workers are daemonic and can't start processes of their
+        # own (as tests of process-based code might need to).
+        results = multiprocessing.Queue()
+        root = self._root()
+        workers = {}
+        for index, partition in enumerate(partitions):
+            worker = multiprocessing.Process(
+                target=_worker,
+                args=(results, sys.path, index, partition, root))
+            worker.start()
+            workers[index] = worker
+        try:
+            while workers and not result.shouldStop:
+                try:
+                    index, events = results.get(timeout=0.5)
+                except queue.Empty:
+                    for index, worker in sorted(workers.items()):
+                        if not worker.is_alive() and results.empty():
+                            del workers[index]
+                            holder = _RemoteTest('worker %d' % index)
+                            result.addError(holder, _exc_info(
+                                RemoteError, 'worker exited with code %s'
+                                % worker.exitcode))
+                    continue
+                workers.pop(index).join()
+                replay(events, result, self.history, self.dependencies)
+        finally:
+            for worker in workers.values():
+                worker.terminate()
+                worker.join()
+
+    def partition(self, batches):
+        """Split batches of tests into one list for each worker."""
+        return partition(batches, self.jobs, self.weight)
+
+    def weight(self, batch):
+        if self.history is None:
+            return len(batch[2])
+        return self.history.estimate(batch)
+
+
+class TimingHistory(object):
+    """Durations of tests and classes from previous runs.
+
+    Class durations include class and fixture setup, so they're used
+    when available.  For classes without history, durations of known
+    tests are used, with the mean duration of all known tests used for
+    the rest.  Without any history, each test counts for one second.
+
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.tests = {}
+        self.classes = {}
+        self._recorded = None
+        if path is not None and os.path.exists(path):
+            with open(path) as f:
+                data = json.load(f)
+            self.tests.update(data.get('tests', {}))
+            self.classes.update(data.get('classes', {}))
+
+    def save(self, path=None):
+        path = self.path if path is None else path
+        data = {'tests': self.tests, 'classes': self.classes}
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(data, f, indent=1, sort_keys=True)
+        getattr(os, 'replace', os.rename)(tmp, path)
+
+    def record_test(self, id, seconds):
+        self.tests[id] = seconds
+        self.recorded().tests[id] = seconds
+
+    def record_class(self, name, seconds):
+        self.classes[name] = seconds
+        self.recorded().classes[name] = seconds
+
+    def recorded(self):
+        """Return a history holding only durations recorded since loading.
+
+        Shards of a suite save these separately, so the history they
+        all use to compute the shards isn't changed by any of them.
+
+        """
+        if self._recorded is None:
+            self._recorded = TimingHistory()
+        return self._recorded
+
+    def update(self, other):
+        """Replace durations with those from another history."""
+        self.tests.update(other.tests)
+        self.classes.update(other.classes)
+
+    def estimate(self, batch):
+        module, name, methods = batch
+        seconds = self.classes.get('%s.%s' % (module, name))
+        if seconds is not None:
+            return seconds
+        if self.tests:
+            default = sum(self.tests.values()) / len(self.tests)
+        else:
+            default = 1.0
+        return sum(self.tests.get('%s.%s.%s' % (module, name, method),
+                                  default)
+                   for method in methods)
+
+
+class DependencyMap(object):
+    """Source files used by test classes in previous runs.
+
+    For each class that passed, the files it used are recorded with a
+    digest of their contents, along with the names of the tests that
+    ran.  Files are those of the modules defining the class and its
+    bases, modules it imports, the factories of its fixture components,
+    modules loaded while it ran, and code found running when sampled
+    while it ran.  Paths are relative to `root` (the current directory
+    by default); files outside `root` are ignored.
+
+    """
+
+    def __init__(self, path=None, root=None):
+        self.path = path
+        self.root = os.path.abspath(os.getcwd() if root is None else root)
+        self.classes = {}
+        self._digests = {}
+        if path is not None and os.path.exists(path):
+            with open(path) as f:
+                data = json.load(f)
+            self.classes.update(data.get('classes', {}))
+
+    def save(self, path=None):
+        path = self.path if path is None else path
+        data = {'classes': self.classes}
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(data, f, indent=1, sort_keys=True)
+        getattr(os, 'replace', os.rename)(tmp, path)
+
+    def record_class(self, name, files, tests, passed=True):
+        """Record the `files` used by `tests` of class `name`.
+
+        Classes that didn't pass are forgotten, so they're always
+        selected until they pass.
+
+        """
+        if not passed:
+            self.classes.pop(name, None)
+            return
+        digests = {}
+        for path in files:
+            path = self.relative(path)
+            if path is not None and path not in digests:
+                digest = self.digest(path)
+                if digest is not None:
+                    digests[path] = digest
+        self.classes[name] = {'files': digests, 'tests': sorted(tests)}
+
+    def relative(self, path):
+        """Return `path` relative to the root, or None if it's outside."""
+        path = os.path.abspath(path)
+        if not path.startswith(os.path.join(self.root, '')):
+            return None
+        return os.path.relpath(path, self.root)
+
+    def digest(self, path):
+        """Return a digest of the contents of `path`, or None if missing.
+
+        Digests are computed once for each file.
+
+        """
+        try:
+            return self._digests[path]
+        except KeyError:
+            pass
+        try:
+            with open(os.path.join(self.root, path), 'rb') as f:
+                digest = hashlib.sha1(f.read()).hexdigest()
+        except (IOError, OSError):
+            digest = None
+        self._digests[path] = digest
+        return digest
+
+    def affected(self, batch):
+        """Determine whether a batch of tests must be run.
+
+        Tests must be run unless they all passed when their class was
+        recorded, and none of the files recorded for it, nor those
+        defining its fixture component factories, have changed.
+
+        """
+        module, name, methods = batch
+        recorded = self.classes.get('%s.%s' % (module, name))
+        if recorded is None or not set(methods) <= set(recorded['tests']):
+            return True
+        files = recorded['files']
+        for path, digest in files.items():
+            if self.digest(path) != digest:
+                return True
+        for path in _fixture_files(_resolve(module, name)):
+            path = self.relative(path)
+            if path is not None and path not in files:
+                return True
+        return False
+
+
+def iter_tests(suite):
+    """Generate individual tests from a possibly nested suite."""
+    if isinstance(suite, unittest.TestCase):
+        yield suite
+        return
+    for test in suite:
+        if isinstance(test, unittest.TestCase):
+            yield test
+        else:
+            for t in iter_tests(test):
+                yield t
+
+
+def group_by_class(tests):
+    """Return batches of test names grouped by class, and other tests.
+
+    Each batch is a tuple of module name, class name, and a list of
+    method names.  Tests that can't be located by name in another
+    process, or created there from the method name alone, are returned
+    separately, for running in this process.  These include tests for
+    modules that couldn't be imported by the test loader.
+
+    """
+    batches = {}
+    local = []
+    for test in tests:
+        cls = test.__class__
+        name = getattr(cls, '__qualname__', cls.__name__)
+        method = getattr(test, '_testMethodName', None)
+        if (method is None or not _default_init(cls)
+                or _resolve(cls.__module__, name) is not cls):
+            local.append(test)
+            continue
+        key = cls.__module__, name
+        batches.setdefault(key, (key[0], key[1], []))[2].append(method)
+    return sorted(batches.values()), local
+
+
+def _default_init(cls):
+    # Tests are created in other processes as cls(method); classes
+    # that replace the constructor (such as FunctionTestCase, and the
+    # loader's placeholders for modules that failed to import) can't
+    # be created that way.
+    init = getattr(cls.__init__, '__func__', cls.__init__)
+    return init is _testcase_init
+
+
+_testcase_init = getattr(unittest.TestCase.__init__, '__func__',
+                         unittest.TestCase.__init__)
+
+
+def partition(batches, count, weight):
+    """Distribute `batches` into `count` lists of similar total weight.
+
+    Batches are assigned heaviest-first to the lightest list; ties are
+    broken by name, so the result is deterministic.  Each list is
+    sorted so classes from the same module are run together.
+
+    """
+    partitions = [[] for i in range(count)]
+    totals = [0] * count
+    ordered = sorted(batches, key=lambda b: (-weight(b), b[0], b[1]))
+    for batch in ordered:
+        index = totals.index(min(totals))
+        partitions[index].append(batch)
+        totals[index] += weight(batch)
+    for p in partitions:
+        p.sort()
+    return partitions
+
+
+def _resolve(module, name):
+    try:
+        obj = sys.modules[module]
+    except KeyError:
+        try:
+            obj = importlib.import_module(module)
+        except Exception:
+            return None
+    for part in name.split('.'):
+        obj = getattr(obj, part, None)
+    return obj
+
+
+def _worker(results, path, index, batches, root=None):
+    sys.path[:] = path
+    results.put((index, _run_partition(index, batches, root)))
+
+
+def _run_partition(index, batches, root=None):
+    files = None if root is None else _UsedFiles(root)
+    result = _RecordingResult(files)
+    suite = unittest.TestSuite()
+    for module, name, methods in batches:
+        cls = _resolve(module, name)
+        suite.addTests(cls(method) for method in methods)
+    _worker_cleanup(result, index)
+    if files is None:
+        suite.run(result)
+    else:
+        files.start()
+        try:
+            suite.run(result)
+        finally:
+            files.stop()
+    _worker_cleanup(result, index)
+    result.events.append(('classTimes', result.class_times))
+    if files is not None:
+        classes = {}
+        for module, name, methods in batches:
+            key = '%s.%s' % (module, name)
+            used = result.class_files.get(key)
+            if used is None:
+                # Nothing ran; the class was skipped or failed to set up.
+                continue
+            used.update(_class_files(_resolve(module, name)))
+            passed = (key not in result.failed_classes
+                      and None not in result.failed_classes)
+            classes[key] = sorted(used), methods, passed
+        result.events.append(('classFiles', classes))
+    return result.events
+
+
+class _UsedFiles(object):
+    """Collect source files within `root` used while tests run.
+
+    These are the files of modules loaded or named by import statements,
+    and of code found running when sampled by a :class:`_Sampler`.
+
+    """
+
+    def __init__(self, root):
+        self.root = os.path.join(os.path.abspath(root), '')
+        self._sampler = _Sampler() if hasattr(signal, 'setitimer') else None
+        self._modules = set()
+        self._imported = set()
+        self._import = None
+
+    def start(self):
+        self._modules = set(sys.modules)
+        self._import = builtins.__import__
+        builtins.__import__ = self._record_import
+        if self._sampler is not None:
+            try:
+                self._sampler.start()
+            except ValueError:
+                # Signals are only handled in the main thread.
+                self._sampler = None
+
+    def stop(self):
+        if self._sampler is not None:
+            self._sampler.stop()
+        builtins.__import__ = self._import
+
+    def take(self):
+        """Return the files used since the last call."""
+        files = set() if self._sampler is None else self._sampler.take()
+        modules, self._imported = self._imported, set()
+        # Modules are rarely removed, so there are new modules only if
+        # there are more than before.
+        if len(sys.modules) != len(self._modules):
+            names = set(sys.modules)
+            modules.update(sys.modules[name] for name in names - self._modules)
+            self._modules = names
+        for module in modules:
+            path = getattr(module, '__file__', None)
+            if path:
+                files.add(path)
+        return set(path for path in map(_source_file, files)
+                   if path.startswith(self.root))
+
+    def _record_import(self, name, globals=None, locals=None, fromlist=(),
+                       level=0):
+        # Modules imported earlier are found in sys.modules without
+        # being loaded again, so imports are recorded as well.
+        module = self._import(name, globals, locals, fromlist, level)
+        self._imported.add(module)
+        if fromlist:
+            for attr in fromlist:
+                value = getattr(module, attr, None)
+                if isinstance(value, types.ModuleType):
+                    self._imported.add(value)
+        elif level == 0 and '.' in name:
+            # The top-level package is returned.
+            self._imported.add(sys.modules.get(name))
+        return module
+
+
+class _Sampler(object):
+    """Collect the source files of code running, sampled periodically.
+
+    Every `interval` seconds of processor time used, the stacks of all
+    threads are examined.  Unlike tracing or profiling hooks, nothing
+    is done when functions are called, so the overhead is low, but code
+    that runs only briefly may not be seen.  Sampling uses the
+    ``SIGPROF`` signal, so it's only available in the main thread on
+    platforms providing ``setitimer``.
+
+    """
+
+    def __init__(self, interval=0.001):
+        self.interval = interval
+        self.files = set()
+        self._previous = None
+
+    def start(self):
+        self._previous = signal.signal(signal.SIGPROF, self._sample)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+
+    def stop(self):
+        signal.setitimer(signal.ITIMER_PROF, 0)
+        signal.signal(signal.SIGPROF, self._previous or signal.SIG_DFL)
+
+    def take(self):
+        """Return the files collected since the last call."""
+        files, self.files = self.files, set()
+        return files
+
+    def _sample(self, signum, frame):
+        for frame in sys._current_frames().values():
+            while frame is not None:
+                self.files.add(frame.f_code.co_filename)
+                frame = frame.f_back
+
+
+def _class_files(cls):
+    # Files a test class depends on without necessarily running code
+    # they define while it runs: modules defining the class and its
+    # bases, modules imported by the module defining it, and fixture
+    # component factories.
+    if not isinstance(cls, type):
+        return set()
+    modules = set(sys.modules.get(base.__module__) for base in cls.__mro__)
+    module = sys.modules.get(cls.__module__)
+    if module is not None:
+        modules.update(_imported_modules(module))
+        for value in vars(module).values():
+            if isinstance(value, (type, types.FunctionType)):
+                modules.add(sys.modules.get(value.__module__))
+    files = set(_fixture_files(cls))
+    for module in modules:
+        path = getattr(module, '__file__', None)
+        if path:
+            files.add(_source_file(path))
+    return files
+
+
+def _imported_modules(module):
+    # Modules named by import statements in `module`, outside functions
+    # (imports in functions are recorded when they run).  Modules
+    # imported as "import a.b" aren't all found in its namespace.
+    path = getattr(module, '__file__', None)
+    try:
+        with open(_source_file(path), 'rb') as f:
+            tree = ast.parse(f.read())
+    except (TypeError, IOError, OSError, SyntaxError, ValueError):
+        return []
+    package = getattr(module, '__package__', None) or ''
+    names = set()
+    nodes = list(tree.body)
+    while nodes:
+        node = nodes.pop()
+        if isinstance(node, _FUNCTIONS):
+            continue
+        nodes.extend(ast.iter_child_nodes(node))
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                parts = alias.name.split('.')
+                names.update('.'.join(parts[:i])
+                             for i in range(1, len(parts) + 1))
+        elif isinstance(node, ast.ImportFrom):
+            base = node.module or ''
+            if node.level:
+                parent = package.rsplit('.', node.level - 1)[0]
+                base = '%s.%s' % (parent, base) if base else parent
+            names.add(base)
+            names.update('%s.%s' % (base, alias.name) for alias in node.names)
+    return [sys.modules[name] for name in names if name in sys.modules]
+
+
+_FUNCTIONS = tuple(getattr(ast, name) for name in
+                   ('FunctionDef', 'AsyncFunctionDef', 'Lambda')
+                   if hasattr(ast, name))
+
+
+def _source_file(path):
+    if path.endswith(('.pyc', '.pyo')):
+        path = path[:-1]
+    return os.path.abspath(path)
+
+
+def _fixture_files(cls):
+    if not (isinstance(cls, type) and issubclass(cls, kt.testing.TestCase)):
+        return []
+    files = []
+    for marker, factory, args, kwargs in kt.testing._fixture_plan(cls):
+        try:
+            path = inspect.getsourcefile(factory)
+        except TypeError:
+            # Built in, or not a class or function.
+            continue
+        if path:
+            files.append(path)
+    return files
+
+
+def _worker_cleanup(result, index):
+    try:
+        kt.testing.cleanup.cleanup()
+    except Exception:
+        holder = _RemoteTest('kt.testing.cleanup (worker %d)' % index)
+        result.addError(holder, sys.exc_info())
+
+
+class _RecordingResult(unittest.TestResult):
+    """Result recording events to be replayed in the parent process."""
+
+    def __init__(self, files=None):
+        super(_RecordingResult, self).__init__()
+        self.events = []
+        self.class_times = {}
+        self.class_files = {}
+        self.failed_classes = set()
+        self._files = files
+        self._started = {}
+        self._mark = timer()
+
+    def describe(self, test):
+        return test.id(), str(test), test.shortDescription()
+
+    def format(self, err, test):
+        return self._exc_info_to_string(err, test)
+
+    def startTest(self, test):
+        super(_RecordingResult, self).startTest(test)
+        self._started[test.id()] = timer()
+        self.events.append(('startTest', self.describe(test)))
+
+    def stopTest(self, test):
+        super(_RecordingResult, self).stopTest(test)
+        now = timer()
+        started = self._started.pop(test.id(), None)
+        elapsed = None if started is None else now - started
+        self.events.append(('stopTest', self.describe(test), elapsed))
+        # Time since the previous test finished is charged to the class,
+        # so class and module fixture setup is included; so are the
+        # files used since then.
+        name = _class_name(test)
+        self.class_times[name] = (self.class_times.get(name, 0.0)
+                                  + now - self._mark)
+        self._mark = now
+        if self._files is not None:
+            self.class_files.setdefault(name, set()).update(
+                self._files.take())
+
+    def failed(self, test):
+        # Errors not attributed to a test (such as from tearDownClass)
+        # are recorded as None.
+        self.failed_classes.add(_class_name(test)
+                                if isinstance(test, unittest.TestCase)
+                                else None)
+
+    def addSuccess(self, test):
+        self.events.append(('addSuccess', self.describe(test)))
+
+    def addError(self, test, err):
+        self.failed(test)
+        self.events.append(
+            ('addError', self.describe(test), self.format(err, test)))
+
+    def addFailure(self, test, err):
+        self.failed(test)
+        self.events.append(
+            ('addFailure', self.describe(test), self.format(err, test)))
+
+    def addSkip(self, test, reason):
+        self.events.append(('addSkip', self.describe(test), reason))
+
+    def addExpectedFailure(self, test, err):
+        self.events.append(('addExpectedFailure', self.describe(test),
+                            self.format(err, test)))
+
+    def addUnexpectedSuccess(self, test):
+        self.failed(test)
+        self.events.append(('addUnexpectedSuccess', self.describe(test)))
+
+    def addSubTest(self, test, subtest, err):
+        outcome = None
+        if err is not None:
+            self.failed(test)
+            failed = issubclass(err[0], test.failureException)
+            outcome = failed, self.format(err, test)
+        self.events.append(('addSubTest', self.describe(test),
+                            self.describe(subtest), outcome))
+
+
+def _class_name(test):
+    cls = test.__class__
+    return '%s.%s' % (cls.__module__,
+                      getattr(cls, '__qualname__', cls.__name__))
+
+
+class _RemoteTest(object):
+    """Stand-in for a test that was run in another process."""
+
+    failureException = AssertionError
+
+    def __init__(self, id, description=None, short_description=None):
+        self._id = id
+        self._description = id if description is None else description
+        self._short_description = short_description
+
+    def id(self):
+        return self._id
+
+    def shortDescription(self):
+        return self._short_description
+
+    def countTestCases(self):
+        return 1
+
+    def __str__(self):
+        return self._description
+
+    def __repr__(self):
+        return '<%s %s>' % (self.__class__.__name__, self._id)
+
+
+def _exc_info(cls, text):
+    return cls, cls('raised in worker process:\n' + text.rstrip()), None
+
+
+def replay(events, result, history=None, dependencies=None):
+    """Report events recorded in a worker to `result`.
+
+    If `history` is provided, durations are recorded there.  If
+    `dependencies` is provided, files used by each class are recorded
+    there.
+
+    """
+    tests = {}
+
+    def get(desc):
+        test = tests.get(desc[0])
+        if test is None:
+            test = tests[desc[0]] = _RemoteTest(*desc)
+        return test
+
+    for event in events:
+        if event[0] == 'classTimes':
+            if history is not None:
+                for name, seconds in event[1].items():
+                    history.record_class(name, seconds)
+            continue
+        if event[0] == 'classFiles':
+            if dependencies is not None:
+                for name, (files, methods, passed) in event[1].items():
+                    dependencies.record_class(name, files, methods, passed)
+            continue
+        kind, test = event[0], get(event[1])
+        if kind in ('startTest', 'addSuccess', 'addUnexpectedSuccess'):
+            getattr(result, kind)(test)
+        elif kind == 'stopTest':
+            elapsed = event[2]
+            if history is not None and elapsed is not None:
+                history.record_test(test.id(), elapsed)
+            add_duration = getattr(result, 'addDuration', None)
+            if add_duration is not None and elapsed is not None:
+                add_duration(test, elapsed)
+            result.stopTest(test)
+        elif kind in ('addError', 'addExpectedFailure'):
+            getattr(result, kind)(test, _exc_info(RemoteError, event[2]))
+        elif kind == 'addFailure':
+            result.addFailure(test, _exc_info(RemoteFailure, event[2]))
+        elif kind == 'addSkip':
+            result.addSkip(test, event[2])
+        elif kind == 'addSubTest':
+            subtest, outcome = get(event[2]), event[3]
+            err = None
+            if outcome is not None:
+                failed, text = outcome
+                err = _exc_info(RemoteFailure if failed else RemoteError,
+                                text)
+            result.addSubTest(test, subtest, err)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m kt.testing.runner',
+        description='Run tests using a pool of worker processes.')
+    parser.add_argument(
+        'tests', nargs='*', metavar='NAME',
+        help='tests to run, as for "python -m unittest";'
+             ' discovered if not specified')
+    parser.add_argument(
+        '-j', '--jobs', type=int, default=None,
+        help='number of worker processes (default: number of CPUs)')
+    parser.add_argument(
+        '-s', '--start-directory', default='.',
+        help='directory to start discovery')
+    parser.add_argument(
+        '-p', '--pattern', default='test*.py',
+        help='pattern to match test files')
+    parser.add_argument(
+        '-t', '--top-level-directory', default=None,
+        help='top level directory of project')
+    parser.add_argument(
+        '-v', '--verbose', dest='verbosity', action='store_const',
+        const=2, default=1, help='verbose output')
+    parser.add_argument(
+        '-f', '--failfast', action='store_true',
+        help='stop after the first worker reporting a failure')
+    parser.add_argument(
+        '--timings', metavar='FILE',
+        help='use and update durations recorded in FILE')
+    parser.add_argument(
+        '--save-timings', metavar='FILE',
+        help='save durations recorded by this run in FILE instead of'
+             ' updating the --timings file')
+    parser.add_argument(
+        '--merge-timings', nargs='+', metavar='FILE',
+        help='merge durations saved using --save-timings into the'
+             ' --timings file, without running tests')
+    parser.add_argument(
+        '--shard-count', type=int, default=None, metavar='N',
+        help='split the tests into N shards')
+    parser.add_argument(
+        '--shard-index', type=int, default=None, metavar='I',
+        help='run shard I, counting from 0')
+    parser.add_argument(
+        '--dependencies', metavar='FILE',
+        help='record the source files used by each test class in FILE')
+    parser.add_argument(
+        '--changed-only', action='store_true',
+        help='run only test classes affected by files changed since they'
+             ' were recorded using --dependencies')
+    options = parser.parse_args(args)
+    if (options.shard_count is None) != (options.shard_index is None):
+        parser.error('--shard-count and --shard-index must be used together')
+    if options.changed_only and not options.dependencies:
+        parser.error('--changed-only requires --dependencies')
+    if options.merge_timings:
+        if not options.timings:
+            parser.error('--merge-timings requires --timings')
+        history = TimingHistory(options.timings)
+        for path in options.merge_timings:
+            history.update(TimingHistory(path))
+        history.save()
+        return 0
+
+    if os.getcwd() not in sys.path and '' not in sys.path:
+        sys.path.insert(0, os.getcwd())
+    loader = unittest.TestLoader()
+    if options.tests:
+        suite = loader.loadTestsFromNames(options.tests)
+    else:
+        suite = loader.discover(options.start_directory, options.pattern,
+                                options.top_level_directory)
+    history = None
+    if options.timings or options.save_timings:
+        history = TimingHistory(options.timings)
+    dependencies = None
+    if options.dependencies:
+        dependencies = DependencyMap(options.dependencies)
+    shard = None
+    if options.shard_count is not None:
+        shard = options.shard_count, options.shard_index
+    suite = ParallelSuite(suite, jobs=options.jobs, history=history,
+                          shard=shard, dependencies=dependencies,
+                          changed_only=options.changed_only)
+    if options.changed_only:
+        print('Skipping %d unchanged test classes'
+              % len(suite.unchanged), file=sys.stderr)
+    runner = unittest.TextTestRunner(verbosity=options.verbosity,
+                                     failfast=options.failfast)
+    result = runner.run(suite)
+    if options.save_timings:
+        history.recorded().save(options.save_timings)
+    elif history is not None and shard is None:
+        # Shards never update the shared history; each would compute
+        # different shards from it on the next run.
+        history.save()
+    if dependencies is not None:
+        dependencies.save()
+    return 0 if result.wasSuccessful() else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,166 @@
+"""\
+Local HTTP server providing prepared responses over real sockets.
+
+This supports code that doesn't use ``requests`` (``urllib``,
+``http.client``, or other libraries that open their own connections),
+and tests that need to measure connection reuse or real socket
+timeouts.
+
+Responses are configured using the same API provided by
+:class:`kt.testing.requests.Requests`, and requests received are
+recorded the same way.
+
+"""
+
+from __future__ import absolute_import
+
+import threading
+import time
+
+from six.moves import BaseHTTPServer
+from six.moves import socketserver
+
+import kt.testing
+import kt.testing.requests
+
+
+# Servers are shared by all tests in a class; keyed by test class.
+_servers = {}
+
+
+class LocalServer(kt.testing.requests.Requests):
+    """HTTP/1.1 server on the loopback interface.
+
+    The server is started when the first test in a test class is set up,
+    and stopped after the last test in the class has run.  Persistent
+    connections are supported, so clients can reuse connections across
+    requests (and tests in the same class).
+
+    """
+
+    scope = 'class'
+
+    def __init__(self, test, body='', content_type='text/plain', seed=0,
+                 templates=None, host='127.0.0.1'):
+        super(LocalServer, self).__init__(
+            test, body=body, content_type=content_type, seed=seed,
+            templates=templates)
+        self.host = host
+
+    def setup(self):
+        self._reset_state()
+        self.failures = []
+        self.lock = threading.Lock()
+
+        cls = self.test.__class__
+        key = cls, self.host
+        server = kt.testing._class_resource(
+            cls, _servers, key, lambda: _start(self.host), _stop)
+        self.server = server
+        self.port = server.server_address[1]
+        self.base_url = 'http://%s:%d' % (self.host, self.port)
+        self._initial_connections = server.connections
+        server.fixture = self
+        self.test.addCleanup(setattr, server, 'fixture', None)
+
+    def teardown(self):
+        """The test failed if requests were received unexpectedly."""
+        if self.failures:
+            raise AssertionError('\n'.join(self.failures))
+        super(LocalServer, self).teardown()
+
+    @property
+    def connections(self):
+        """Number of connections accepted during the current test."""
+        return self.server.connections - self._initial_connections
+
+    def url(self, path='/'):
+        """Return the URL for `path` on the server."""
+        return self.base_url + path
+
+    def serve(self, method, url, **kwargs):
+        with self.lock:
+            try:
+                return self.request(method, url, **kwargs)
+            except AssertionError as e:
+                self.failures.append(str(e))
+                raise
+
+
+class _Server(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+
+    daemon_threads = True
+    fixture = None
+    connections = 0
+
+
+class _Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        BaseHTTPServer.BaseHTTPRequestHandler.setup(self)
+        self.server.connections += 1
+
+    def handle_request(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        data = self.rfile.read(length) if length else None
+        fixture = self.server.fixture
+        if fixture is None:
+            self.send_text(500, 'no active fixture for %s %s'
+                           % (self.command, self.path))
+            return
+        try:
+            response = fixture.serve(
+                self.command, fixture.url(self.path),
+                headers=dict(self.headers.items()), data=data)
+        except AssertionError as e:
+            self.send_text(500, str(e))
+            return
+        except Exception:
+            # Errors configured for the request (timeouts, unreachable
+            # hosts) are reported to the client as a dropped connection.
+            self.close_connection = True
+            return
+        latency = response.elapsed.total_seconds()
+        if latency:
+            time.sleep(latency)
+        content = response.content
+        self.send_response(response.status_code)
+        for name, value in response.headers.items():
+            if name.lower() != 'content-length':
+                self.send_header(name, value)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(content)
+
+    do_DELETE = do_GET = do_HEAD = do_OPTIONS = do_PATCH = do_POST = \
+        do_PUT = handle_request
+
+    def send_text(self, status, text):
+        content = text.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/plain; charset=utf-8')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _start(host):
+    server = _Server((host, 0), _Handler)
+    thread = threading.Thread(target=server.serve_forever,
+                              kwargs={'poll_interval': 0.05})
+    thread.daemon = True
+    thread.start()
+    return server
+
+
+def _stop(key):
+    server = _servers.pop(key, None)
+    if server is not None:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,90 @@
+"""\
+In-memory SQLite databases restored from a snapshot for each test.
+
+Tests for a data layer commonly create the schema and load seed data
+for every test, which can take much longer than the tests themselves.
+The :class:`SQLite` fixture component builds the database once for each
+test class, and gives each test a fresh copy made using the SQLite
+backup API, which copies the database pages directly.
+
+"""
+
+from __future__ import absolute_import
+
+import sqlite3
+
+import kt.testing
+
+
+# Template databases are shared by all tests in a class; keyed by test
+# class, script, and build function.
+_templates = {}
+
+
+class SQLite(kt.testing.FixtureComponent):
+    """In-memory SQLite database, built once for each test class.
+
+    The first time a test from a class is set up, a template database is
+    created by executing `script` (SQL statements, as accepted by
+    ``executescript``) and then calling `build` with the connection, if
+    either is provided.  Each test gets a new in-memory database
+    containing a copy of the template, available as the ``connection``
+    attribute; it's closed when the test is cleaned up.
+
+    `connect` provides additional keyword arguments for
+    ``sqlite3.connect`` when creating the connection for each test.
+
+    """
+
+    scope = 'class'
+
+    def __init__(self, testcase, script=None, build=None, connect=None):
+        super(SQLite, self).__init__(testcase)
+        self.script = script
+        self.build = build
+        self.connect = {} if connect is None else connect
+        self.connection = None
+
+    def setup(self):
+        cls = self.test.__class__
+        key = cls, self.script, self.build
+        template = kt.testing._class_resource(
+            cls, _templates, key,
+            lambda: _build(self.script, self.build), _close)
+        self.template = template
+        self.connection = sqlite3.connect(':memory:', **self.connect)
+        self.test.addCleanup(self.connection.close)
+        _copy(template, self.connection)
+
+    def execute(self, sql, parameters=()):
+        """Execute `sql` using the test's connection; return the cursor."""
+        return self.connection.execute(sql, parameters)
+
+
+def _build(script, build):
+    connection = sqlite3.connect(':memory:')
+    try:
+        if script:
+            connection.executescript(script)
+        if build is not None:
+            build(connection)
+        connection.commit()
+    except Exception:
+        connection.close()
+        raise
+    return connection
+
+
+def _copy(source, target):
+    backup = getattr(source, 'backup', None)
+    if backup is None:
+        # The backup API isn't available before Python 3.7.
+        target.executescript('\n'.join(source.iterdump()))
+    else:
+        backup(target)
+
+
+def _close(key):
+    template = _templates.pop(key, None)
+    if template is not None:
+        template.close()
@@ -19,3 +19,20 @@ class Core(unittest.TestCase):
         tc.run(result=self.result)
         assert self.result.testsRun == 1
         return self.result
+
+
+def release_class_resources(cls, resources, release):
+    """Release resources held in `resources` for test class `cls`.
+
+    Resources are keyed by tuples starting with the class, and released
+    by calling `release` with the key.  Class cleanups are new in Python
+    3.8; before that, the resources would otherwise be released only
+    when the process exits.
+
+    """
+    do_class_cleanups = getattr(cls, 'doClassCleanups', None)
+    if do_class_cleanups is not None:
+        do_class_cleanups()
+    for key in list(resources):
+        if key[0] is cls:
+            release(key)
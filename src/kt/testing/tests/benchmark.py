@@ -0,0 +1,577 @@
+"""\
+Benchmarks for the hot paths of kt.testing itself.
+
+Run the benchmarks using::
+
+  python -m kt.testing.tests.benchmark --output results.json
+
+and compare against earlier results using::
+
+  python -m kt.testing.tests.benchmark --compare results.json
+
+Only the standard library is used, so the benchmarks can be run offline.
+Timings are reported per loop, using the median of several runs.
+
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import argparse
+import collections
+import fnmatch
+import json
+import platform
+import sqlite3
+import sys
+import time
+import unittest
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+import kt.testing
+import kt.testing.cleanup
+import kt.testing.patching
+import kt.testing.requests
+import kt.testing.sqlite
+
+
+timer = getattr(time, 'perf_counter', time.time)
+
+BENCHMARKS = collections.OrderedDict()
+
+
+def benchmark(name):
+    """Register a benchmark function.
+
+    The function is called with a number of loops, and returns the time
+    in seconds taken to perform that many loops.
+
+    """
+    def decorator(func):
+        BENCHMARKS[name] = func
+        return func
+    return decorator
+
+
+class Component(kt.testing.FixtureComponent):
+    pass
+
+
+def make_testcase_class(depth, fixtures, base=kt.testing.TestCase):
+    """Create a test class `depth` levels below `base`.
+
+    The fixture components are spread across the levels.
+
+    """
+    per_level = [fixtures // depth] * depth
+    per_level[-1] += fixtures % depth
+    cls = base
+    for count in per_level:
+        cls = make_composed_class(cls, count)
+    return cls
+
+
+def make_composed_class(base, count):
+
+    class TC(base):
+        for _n in range(count):
+            locals()['component%d' % _n] = kt.testing.compose(Component)
+
+        def test_it(self):
+            pass
+
+    return TC
+
+
+def _testcase_new(depth, fixtures):
+    cls = make_testcase_class(depth, fixtures)
+
+    def run(loops):
+        started = timer()
+        for i in range(loops):
+            cls('test_it')
+        return timer() - started
+
+    return run
+
+
+def _compose(fixtures):
+
+    def run(loops):
+        started = timer()
+        for i in range(loops):
+            make_composed_class(kt.testing.TestCase, fixtures)
+        return timer() - started
+
+    return run
+
+
+def _setup_teardown(fixtures):
+    cls = make_testcase_class(1, fixtures)
+
+    def run(loops):
+        tests = [cls('test_it') for i in range(loops)]
+        started = timer()
+        for tc in tests:
+            tc.setUp()
+            tc.tearDown()
+            tc.doCleanups()
+        return timer() - started
+
+    return run
+
+
+class HeavyComponent(kt.testing.FixtureComponent):
+    """Component allocating a large structure when created."""
+
+    def __init__(self, testcase):
+        super(HeavyComponent, self).__init__(testcase)
+        self.index = dict((i, [i]) for i in range(10000))
+
+
+class PooledComponent(HeavyComponent):
+
+    def reset(self, testcase):
+        self.test = testcase
+
+
+def _heavy_component(pooled):
+
+    class TC(kt.testing.TestCase):
+        heavy = kt.testing.compose(
+            PooledComponent if pooled else HeavyComponent)
+
+        def test_it(self):
+            pass
+
+    def run(loops):
+        started = timer()
+        for i in range(loops):
+            tc = TC('test_it')
+            tc.setUp()
+            tc.tearDown()
+            tc.doCleanups()
+        return timer() - started
+
+    return run
+
+
+def _cleanup(registrations):
+
+    def nothing():
+        pass
+
+    def run(loops):
+        saved = list(kt.testing.cleanup._cleanups)
+        del kt.testing.cleanup._cleanups[:]
+        try:
+            for i in range(registrations):
+                kt.testing.cleanup.register(nothing)
+            started = timer()
+            for i in range(loops):
+                kt.testing.cleanup.cleanup()
+            return timer() - started
+        finally:
+            kt.testing.cleanup._cleanups[:] = saved
+
+    return run
+
+
+def _requests_dispatch(keys, queued, filtered):
+
+    class TC(kt.testing.TestCase):
+        fixture = kt.testing.compose(kt.testing.requests.Requests)
+
+        def test_it(self):
+            pass
+
+    def reject(*args, **kwargs):
+        return False
+
+    def run(loops):
+        tc = TC('test_it')
+        tc.setUp()
+        try:
+            fixture = tc.fixture
+            for k in range(keys):
+                url = 'http://example.com/%d' % k
+                for f in range(filtered):
+                    fixture.add_response('get', url, filter=reject)
+                for q in range(queued):
+                    fixture.add_response('get', url)
+            urls = ['http://example.com/%d' % (i % keys)
+                    for i in range(loops)]
+            # Make sure every request has a queued response.
+            for url in urls[keys * queued:]:
+                fixture.add_response('get', url)
+            request = fixture.request
+            started = timer()
+            for url in urls:
+                request('GET', url)
+            elapsed = timer() - started
+            fixture.responses.clear()
+        finally:
+            tc.tearDown()
+            tc.doCleanups()
+        return elapsed
+
+    return run
+
+
+def _requests_setup(installed):
+
+    class TC(kt.testing.TestCase):
+        fixture = kt.testing.compose(kt.testing.requests.Requests)
+
+        def test_it(self):
+            pass
+
+    def run(loops):
+        tests = [TC('test_it') for i in range(loops)]
+        if installed:
+            kt.testing.requests.install()
+        try:
+            started = timer()
+            for tc in tests:
+                tc.setUp()
+                tc.tearDown()
+                tc.doCleanups()
+            return timer() - started
+        finally:
+            kt.testing.requests.uninstall()
+
+    return run
+
+
+def _requests_baseline(count, baseline):
+
+    def add_baseline(fixture):
+        for i in range(count):
+            fixture.add_response('get', 'http://example.com/%d' % i)
+
+    class TC(kt.testing.TestCase):
+
+        if baseline:
+            fixture = kt.testing.compose(kt.testing.requests.Requests,
+                                         baseline=add_baseline)
+        else:
+            fixture = kt.testing.compose(kt.testing.requests.Requests)
+
+            def setUp(self):
+                super(TC, self).setUp()
+                add_baseline(self.fixture)
+
+        def test_it(self):
+            self.fixture.request('GET', 'http://example.com/0')
+
+    def run(loops):
+        tests = [TC('test_it') for i in range(loops)]
+        started = timer()
+        for tc in tests:
+            tc.setUp()
+            tc.test_it()
+            if not baseline:
+                tc.fixture.responses.clear()
+            tc.tearDown()
+            tc.doCleanups()
+        return timer() - started
+
+    return run
+
+
+class Targets(object):
+    """Attributes replaced by the patching benchmarks."""
+
+
+def _patching(count, batched):
+    targets = {}
+    for i in range(count):
+        setattr(Targets, 'attr%d' % i, i)
+        targets['%s.Targets.attr%d' % (__name__, i)] = -i
+
+    class TC(kt.testing.TestCase):
+
+        if batched:
+            patches = kt.testing.compose(
+                kt.testing.patching.Patches, targets)
+        else:
+            def setUp(self):
+                super(TC, self).setUp()
+                for target, replacement in targets.items():
+                    p = mock.patch(target, replacement)
+                    self.addCleanup(p.stop)
+                    p.start()
+
+        def test_it(self):
+            pass
+
+    def run(loops):
+        tests = [TC('test_it') for i in range(loops)]
+        started = timer()
+        for tc in tests:
+            tc.setUp()
+            tc.tearDown()
+            tc.doCleanups()
+        return timer() - started
+
+    return run
+
+
+_SCHEMA = '''
+    CREATE TABLE customer (id INTEGER PRIMARY KEY, name TEXT NOT NULL);
+    CREATE TABLE orders (
+        id INTEGER PRIMARY KEY,
+        customer INTEGER NOT NULL REFERENCES customer (id),
+        total INTEGER NOT NULL
+    );
+    CREATE INDEX orders_customer ON orders (customer);
+'''
+
+
+def _sqlite_seed(rows):
+
+    def build(connection):
+        connection.executescript(_SCHEMA)
+        connection.executemany(
+            'INSERT INTO customer (id, name) VALUES (?, ?)',
+            [(i, 'customer %d' % i) for i in range(rows)])
+        connection.executemany(
+            'INSERT INTO orders (customer, total) VALUES (?, ?)',
+            [(i % rows, i) for i in range(rows * 10)])
+        connection.commit()
+
+    return build
+
+
+def _sqlite(rows, snapshot):
+    build = _sqlite_seed(rows)
+
+    class TC(kt.testing.TestCase):
+
+        if snapshot:
+            db = kt.testing.compose(kt.testing.sqlite.SQLite, build=build)
+        else:
+            def setUp(self):
+                super(TC, self).setUp()
+                self.connection = sqlite3.connect(':memory:')
+                self.addCleanup(self.connection.close)
+                build(self.connection)
+
+        def test_it(self):
+            pass
+
+    def run(loops):
+        tests = [TC('test_it') for i in range(loops)]
+        try:
+            started = timer()
+            for tc in tests:
+                tc.setUp()
+                tc.tearDown()
+                tc.doCleanups()
+            return timer() - started
+        finally:
+            for key in list(kt.testing.sqlite._templates):
+                if key[0] is TC:
+                    kt.testing.sqlite._close(key)
+
+    return run
+
+
+def _iter_content(size, chunk_size):
+    response = kt.testing.requests.Response(200, 'x' * size)
+
+    def run(loops):
+        started = timer()
+        for i in range(loops):
+            for chunk in response.iter_content(chunk_size):
+                pass
+        return timer() - started
+
+    return run
+
+
+for _depth in (1, 5, 20):
+    for _fixtures in (1, 10, 50):
+        if _fixtures >= _depth:
+            benchmark('testcase_new[depth=%d,fixtures=%d]'
+                      % (_depth, _fixtures))(_testcase_new(_depth, _fixtures))
+
+for _fixtures in (1, 10, 50):
+    benchmark('compose[fixtures=%d]' % _fixtures)(_compose(_fixtures))
+
+for _fixtures in (0, 10, 50):
+    benchmark('setup_teardown[fixtures=%d]'
+              % _fixtures)(_setup_teardown(_fixtures))
+
+benchmark('heavy_component[pooled=False]')(_heavy_component(False))
+benchmark('heavy_component[pooled=True]')(_heavy_component(True))
+
+for _registrations in (10, 1000):
+    benchmark('cleanup[registrations=%d]'
+              % _registrations)(_cleanup(_registrations))
+
+benchmark('requests_dispatch[keys=1,queued=1,filtered=0]')(
+    _requests_dispatch(1, 1, 0))
+benchmark('requests_dispatch[keys=1000,queued=10,filtered=0]')(
+    _requests_dispatch(1000, 10, 0))
+benchmark('requests_dispatch[keys=10,queued=10,filtered=20]')(
+    _requests_dispatch(10, 10, 20))
+
+benchmark('requests_setup[installed=False]')(_requests_setup(False))
+benchmark('requests_setup[installed=True]')(_requests_setup(True))
+
+for _baseline in (False, True):
+    benchmark('requests_baseline[responses=50,baseline=%s]' % _baseline)(
+        _requests_baseline(50, _baseline))
+
+for _count in (1, 10):
+    benchmark('mock_patch[targets=%d]' % _count)(_patching(_count, False))
+    benchmark('patching[targets=%d]' % _count)(_patching(_count, True))
+
+for _rows in (10, 1000):
+    benchmark('sqlite_rebuild[rows=%d]' % _rows)(_sqlite(_rows, False))
+    benchmark('sqlite_snapshot[rows=%d]' % _rows)(_sqlite(_rows, True))
+
+benchmark('iter_content[size=1048576,chunk_size=8192]')(
+    _iter_content(1024 * 1024, 8192))
+benchmark('iter_content[size=16384,chunk_size=1]')(
+    _iter_content(16 * 1024, 1))
+
+
+def measure(func, repeat=5, min_time=0.1):
+    """Return per-loop timings for `func` from `repeat` runs.
+
+    The number of loops is calibrated so each run takes at least
+    `min_time` seconds.
+
+    """
+    loops = 1
+    while True:
+        elapsed = func(loops)
+        if elapsed >= min_time or loops >= 10 ** 6:
+            break
+        loops *= 2 if elapsed <= 0 else max(
+            2, min(10, int(min_time / elapsed) + 1))
+    runs = [elapsed / loops]
+    for i in range(repeat - 1):
+        runs.append(func(loops) / loops)
+    return {'loops': loops, 'runs': runs, 'median': _median(runs)}
+
+
+def _median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    if len(values) % 2:
+        return values[middle]
+    return (values[middle - 1] + values[middle]) / 2.0
+
+
+def _format(seconds):
+    for unit, scale in (('s', 1), ('ms', 1e3), ('us', 1e6)):
+        if seconds * scale >= 1:
+            return '%.2f %s' % (seconds * scale, unit)
+    return '%.0f ns' % (seconds * 1e9)
+
+
+def run(patterns=('*',), repeat=5, min_time=0.1, out=sys.stdout):
+    results = collections.OrderedDict()
+    for name, func in BENCHMARKS.items():
+        if not any(fnmatch.fnmatchcase(name, p) for p in patterns):
+            continue
+        results[name] = measure(func, repeat=repeat, min_time=min_time)
+        print('%-55s %12s' % (name, _format(results[name]['median'])),
+              file=out)
+    return {
+        'python': platform.python_implementation(),
+        'python_version': platform.python_version(),
+        'benchmarks': results,
+    }
+
+
+def compare(baseline, current, threshold=0.1, out=sys.stdout):
+    """Print a comparison of results; return names that got slower."""
+    slower = []
+    for name, result in current['benchmarks'].items():
+        before = baseline['benchmarks'].get(name)
+        if before is None:
+            continue
+        ratio = result['median'] / before['median']
+        flag = ''
+        if ratio > 1 + threshold:
+            flag = ' (slower)'
+            slower.append(name)
+        elif ratio < 1 - threshold:
+            flag = ' (faster)'
+        print('%-55s %12s -> %12s %6.2fx%s'
+              % (name, _format(before['median']), _format(result['median']),
+                 ratio, flag), file=out)
+    return slower
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m kt.testing.tests.benchmark',
+        description='Run benchmarks for kt.testing.')
+    parser.add_argument(
+        '-k', dest='patterns', action='append', metavar='PATTERN',
+        help='only run benchmarks matching the glob-style PATTERN')
+    parser.add_argument(
+        '--output', metavar='FILE', help='store results in FILE')
+    parser.add_argument(
+        '--compare', metavar='FILE',
+        help='compare results with those stored in FILE')
+    parser.add_argument(
+        '--repeat', type=int, default=5, help='runs per benchmark')
+    parser.add_argument(
+        '--min-time', type=float, default=0.1,
+        help='minimum duration of each run, in seconds')
+    options = parser.parse_args(args)
+
+    results = run(options.patterns or ('*',), repeat=options.repeat,
+                  min_time=options.min_time)
+    if options.output:
+        with open(options.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    if options.compare:
+        with open(options.compare) as f:
+            baseline = json.load(f)
+        print()
+        if compare(baseline, results):
+            return 1
+    return 0
+
+
+class TestBenchmarks(unittest.TestCase):
+    """Make sure the benchmarks keep working."""
+
+    def test_benchmarks_run(self):
+        for name, func in BENCHMARKS.items():
+            self.assertGreaterEqual(func(1), 0, name)
+
+    def test_compare(self):
+        baseline = {'benchmarks': {
+            'same': {'median': 1.0},
+            'slower': {'median': 1.0},
+            'faster': {'median': 1.0},
+        }}
+        current = {'benchmarks': {
+            'same': {'median': 1.05},
+            'slower': {'median': 1.5},
+            'faster': {'median': 0.5},
+            'new': {'median': 1.0},
+        }}
+
+        class Out(object):
+            lines = []
+            write = lines.append
+
+        self.assertEqual(compare(baseline, current, out=Out()), ['slower'])
+        self.assertIn(' (faster)', ''.join(Out.lines))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
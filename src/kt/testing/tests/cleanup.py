@@ -10,21 +10,51 @@ Tests for kt.testing.cleanup.
 
 """
 
+import gc
+import sys
+import textwrap
+import threading
+import time
 import unittest
 
 import kt.testing.cleanup
 import kt.testing.tests
 
 
+if sys.version_info >= (3, 5):
+    # Not valid syntax for Python 2.
+    _coroutines = {}
+    exec(textwrap.dedent('''\
+        import asyncio
+
+        async def async_record(calls, name):
+            calls.append(name + ' start')
+            await asyncio.sleep(0)
+            calls.append(name + ' end')
+
+        async def async_fail(message):
+            await asyncio.sleep(0)
+            raise ValueError(message)
+        '''), _coroutines)
+    async_record = _coroutines['async_record']
+    async_fail = _coroutines['async_fail']
+
+
 class CleanupHelpers(object):
 
     def setUp(self):
         super(CleanupHelpers, self).setUp()
+        registry = kt.testing.cleanup._registry
         self.old_cleanups = list(kt.testing.cleanup._cleanups)
+        self.old_state = registry._handles, registry._concurrent
         del kt.testing.cleanup._cleanups[:]
+        registry._handles = {}
+        registry._concurrent = 0
 
     def tearDown(self):
+        registry = kt.testing.cleanup._registry
         kt.testing.cleanup._cleanups[:] = self.old_cleanups
+        registry._handles, registry._concurrent = self.old_state
         super(CleanupHelpers, self).tearDown()
 
 
@@ -69,7 +99,7 @@ class CleanupTestCase(CleanupHelpers, unittest.TestCase):
         kt.testing.cleanup.cleanup()
         self.assertEqual(calls, [0, 1, 2, 3])
 
-    def test_cleanup_exceptions_abort(self):
+    def test_cleanup_exceptions_reported_together(self):
         self.assertEqual(kt.testing.cleanup._cleanups, [])
         calls = []
 
@@ -78,15 +108,287 @@ class CleanupTestCase(CleanupHelpers, unittest.TestCase):
 
         def bork(index):
             calls.append(index)
-            raise ValueError('ugly failure')
+            raise ValueError('ugly failure %d' % index)
 
         kt.testing.cleanup.register(clean, 0)
-        kt.testing.cleanup.register(bork, 1)
+        r1 = kt.testing.cleanup.register(bork, 1)
         kt.testing.cleanup.register(clean, 2)
+        r3 = kt.testing.cleanup.register(bork, 3)
+
+        with self.assertRaises(kt.testing.cleanup.CleanupError) as cm:
+            kt.testing.cleanup.cleanup()
+        # Every cleanup was run.
+        self.assertEqual(calls, [0, 1, 2, 3])
+        (e1, x1), (e3, x3) = cm.exception.errors
+        self.assertIs(e1, r1)
+        self.assertIs(e3, r3)
+        self.assertIs(e1.func, bork)
+        self.assertEqual(str(x1), 'ugly failure 1')
+        message = str(cm.exception)
+        self.assertIn('2 cleanup functions failed', message)
+        self.assertIn('ValueError: ugly failure 1', message)
+        self.assertIn('ValueError: ugly failure 3', message)
+
+    def test_unregister(self):
+        calls = []
+        r1 = kt.testing.cleanup.register(calls.append, 1)
+        r2 = kt.testing.cleanup.register(calls.append, 2)
+        self.assertTrue(r1.registered)
+
+        r1.unregister()
+        self.assertFalse(r1.registered)
+        self.assertTrue(r2.registered)
+        kt.testing.cleanup.cleanup()
+        self.assertEqual(calls, [2])
+
+        # Unregistering again is harmless.
+        r1.unregister()
+        self.assertEqual(kt.testing.cleanup._cleanups, [r2.entry])
+
+    def test_unregister_equal_registrations(self):
+        calls = []
+        r1 = kt.testing.cleanup.register(calls.append, 1)
+        r2 = kt.testing.cleanup.register(calls.append, 1)
+        self.assertEqual(r1.entry, r2.entry)
+
+        r2.unregister()
+        self.assertTrue(r1.registered)
+        self.assertFalse(r2.registered)
+
+    def test_cleanup_can_unregister_itself(self):
+        calls = []
+
+        def once():
+            calls.append('once')
+            registration.unregister()
+
+        registration = kt.testing.cleanup.register(once)
+        kt.testing.cleanup.register(calls.append, 'always')
+        kt.testing.cleanup.cleanup()
+        kt.testing.cleanup.cleanup()
+        self.assertEqual(calls, ['once', 'always', 'always'])
+
+    def test_priority(self):
+        calls = []
+
+        def record(**kwargs):
+            calls.append(kwargs)
+
+        kt.testing.cleanup.register(calls.append, 'a')
+        kt.testing.cleanup.add(calls.append, ('late',), priority=10)
+        kt.testing.cleanup.add(calls.append, ('early',), priority=-10)
+        kt.testing.cleanup.register(calls.append, 'b')
+        kt.testing.cleanup.add(calls.append, ('later',), priority=10)
+        kt.testing.cleanup.add(record, kwargs={'x': 'y'}, priority=-20)
+        # Entries added by zope.testing.cleanup are appended, and are
+        # treated as having priority 0.
+        kt.testing.cleanup._cleanups.append((calls.append, ('c',), {}))
+        kt.testing.cleanup.add(calls.append, ('d',))
+        kt.testing.cleanup.add(calls.append, ('e',), priority=10)
+
+        kt.testing.cleanup.cleanup()
+        self.assertEqual(
+            calls,
+            [{'x': 'y'}, 'early', 'a', 'b', 'late', 'later', 'c', 'd', 'e'])
+
+    def test_owner(self):
+        calls = []
+
+        class Owner(object):
+
+            def reset(self, value):
+                calls.append(value)
+
+        owner = Owner()
+        kt.testing.cleanup.add(owner.reset, (1,), owner=owner)
+        kt.testing.cleanup.add(calls.append, (2,), owner=owner)
+        kt.testing.cleanup.cleanup()
+        self.assertEqual(calls, [1, 2])
+
+        # The registrations don't keep the owner alive.
+        del owner
+        gc.collect()
+        self.assertEqual(kt.testing.cleanup._cleanups, [])
+
+    def test_scope(self):
+        calls = []
+        kt.testing.cleanup.register(calls.append, 'global')
+        scope = kt.testing.cleanup.scope()
+        scope.register(calls.append, 'scoped')
+        self.assertEqual(len(scope), 1)
+
+        kt.testing.cleanup.cleanup()
+        self.assertEqual(calls, ['global', 'scoped'])
+        del calls[:]
+
+        scope.close()
+        self.assertEqual(calls, ['scoped'])
+        self.assertEqual(len(scope), 0)
+        del calls[:]
+
+        kt.testing.cleanup.cleanup()
+        self.assertEqual(calls, ['global'])
+
+    def test_scope_context_manager(self):
+        calls = []
+        with kt.testing.cleanup.scope(priority=-1) as scope:
+            kt.testing.cleanup.register(calls.append, 'global')
+            scope.register(calls.append, 'scoped')
+            kt.testing.cleanup.cleanup()
+            self.assertEqual(calls, ['scoped', 'global'])
+        self.assertEqual(len(kt.testing.cleanup._cleanups), 1)
 
-        with self.assertRaises(ValueError):
+    def test_scope_errors_reported(self):
+        scope = kt.testing.cleanup.scope()
+        scope.register(int, 'not a number')
+        with self.assertRaises(kt.testing.cleanup.CleanupError) as cm:
             kt.testing.cleanup.cleanup()
-        self.assertEqual(calls, [0, 1])
+        # The scope's error is nested in the error reported globally.
+        (registration, exception), = cm.exception.errors
+        self.assertIsInstance(exception, kt.testing.cleanup.CleanupError)
+        self.assertIn("invalid literal for int() with base 10: 'not a",
+                      str(cm.exception))
+
+        with self.assertRaises(kt.testing.cleanup.CleanupError):
+            scope.close()
+        self.assertEqual(kt.testing.cleanup._cleanups, [])
+
+    def test_loop_independent_of_policy(self):
+        import asyncio
+        import kt.testing.clock
+
+        class TC(kt.testing.TestCase):
+            clock = kt.testing.compose(kt.testing.clock.Clock)
+
+            def test_it(self):
+                """Just a dummy."""
+
+        old_loop = kt.testing.cleanup._loop
+        kt.testing.cleanup._loop = None
+        self.addCleanup(setattr, kt.testing.cleanup, '_loop', old_loop)
+        tc = TC('test_it')
+        tc.setUp()
+        try:
+            loop = kt.testing.cleanup._event_loop()
+        finally:
+            tc.doCleanups()
+        self.addCleanup(loop.close)
+        self.assertNotIsInstance(loop, kt.testing.clock.VirtualTimeEventLoop)
+        self.assertIsInstance(loop, asyncio.AbstractEventLoop)
+
+    def test_zope_compatible_entries(self):
+        # zope.testing.cleanup.cleanUp unpacks and calls the entries
+        # directly.
+        calls = []
+        kt.testing.cleanup.register(calls.append, 1)
+        kt.testing.cleanup.scope().register(calls.append, 2)
+
+        class Owner(object):
+
+            def reset(self, value):
+                calls.append(value)
+
+        owner = Owner()
+        kt.testing.cleanup.add(owner.reset, (3,), owner=owner)
+        for func, args, kwargs in kt.testing.cleanup._cleanups:
+            func(*args, **kwargs)
+        self.assertEqual(calls, [1, 2, 3])
+
+
+class ConcurrentCleanupTestCase(CleanupHelpers, unittest.TestCase):
+
+    def setUp(self):
+        super(ConcurrentCleanupTestCase, self).setUp()
+        if kt.testing.cleanup._thread_pool() is None:
+            self.skipTest('concurrent.futures is not available')
+
+    def test_concurrent_cleanups_overlap(self):
+        barrier = threading.Barrier(3, timeout=10)
+        for i in range(3):
+            kt.testing.cleanup.add(barrier.wait, concurrent=True)
+        # Run serially, the first wait would time out.
+        kt.testing.cleanup.cleanup()
+        self.assertFalse(barrier.broken)
+
+    def test_serial_cleanups_keep_their_place(self):
+        calls = []
+
+        def slow(name):
+            time.sleep(0.05)
+            calls.append(name)
+
+        kt.testing.cleanup.register(calls.append, 'a')
+        kt.testing.cleanup.add(slow, ('x',), concurrent=True)
+        kt.testing.cleanup.add(calls.append, ('y',), concurrent=True)
+        kt.testing.cleanup.register(calls.append, 'b')
+        kt.testing.cleanup.add(slow, ('z',), concurrent=True)
+        kt.testing.cleanup.register(calls.append, 'c')
+
+        kt.testing.cleanup.cleanup()
+        self.assertEqual(calls[0], 'a')
+        self.assertEqual(sorted(calls[1:3]), ['x', 'y'])
+        self.assertEqual(calls[3:], ['b', 'z', 'c'])
+
+    def test_concurrent_failures_reported(self):
+        calls = []
+        kt.testing.cleanup.add(int, ('not a number',), concurrent=True)
+        kt.testing.cleanup.add(calls.append, (1,), concurrent=True)
+        kt.testing.cleanup.register(int, 'x')
+
+        with self.assertRaises(kt.testing.cleanup.CleanupError) as cm:
+            kt.testing.cleanup.cleanup()
+        self.assertEqual(calls, [1])
+        (r1, x1), (r2, x2) = cm.exception.errors
+        self.assertIsInstance(x1, ValueError)
+        self.assertTrue(r1.concurrent)
+        self.assertFalse(r2.concurrent)
+        self.assertIn("invalid literal for int() with base 10: 'not a",
+                      str(cm.exception))
+
+    def test_unregister_concurrent(self):
+        calls = []
+        registration = kt.testing.cleanup.add(
+            calls.append, (1,), concurrent=True)
+        registration.unregister()
+        self.assertEqual(kt.testing.cleanup._registry._concurrent, 0)
+        kt.testing.cleanup.cleanup()
+        self.assertEqual(calls, [])
+
+
+@unittest.skipIf(sys.version_info < (3, 5), 'coroutines not supported')
+class CoroutineCleanupTestCase(CleanupHelpers, unittest.TestCase):
+
+    def test_coroutines_run_together(self):
+        calls = []
+        kt.testing.cleanup.add(async_record, (calls, 'a'))
+        kt.testing.cleanup.add(async_record, (calls, 'b'))
+        kt.testing.cleanup.cleanup()
+        self.assertEqual(calls, ['a start', 'b start', 'a end', 'b end'])
+
+    def test_coroutines_run_serially(self):
+        calls = []
+        kt.testing.cleanup.add(async_record, (calls, 'a'), concurrent=False)
+        kt.testing.cleanup.add(async_record, (calls, 'b'), concurrent=False)
+        kt.testing.cleanup.cleanup()
+        self.assertEqual(calls, ['a start', 'a end', 'b start', 'b end'])
+
+    def test_coroutine_failures_reported(self):
+        calls = []
+        kt.testing.cleanup.add(async_fail, ('broken',))
+        kt.testing.cleanup.add(async_record, (calls, 'a'))
+        with self.assertRaises(kt.testing.cleanup.CleanupError) as cm:
+            kt.testing.cleanup.cleanup()
+        self.assertEqual(calls, ['a start', 'a end'])
+        (registration, exception), = cm.exception.errors
+        self.assertEqual(str(exception), 'broken')
+        self.assertIn('async_fail', str(cm.exception))
+
+    def test_zope_compatible_entries(self):
+        calls = []
+        kt.testing.cleanup.add(async_record, (calls, 'a'))
+        for func, args, kwargs in kt.testing.cleanup._cleanups:
+            func(*args, **kwargs)
+        self.assertEqual(calls, ['a start', 'a end'])
 
 
 class CleanupTestCaseTestCase(CleanupHelpers, kt.testing.tests.Core):
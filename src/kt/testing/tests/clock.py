@@ -0,0 +1,190 @@
+"""\
+Tests for kt.testing.clock.
+
+"""
+
+from __future__ import absolute_import
+
+import datetime
+import time
+import unittest
+
+import requests
+
+import kt.testing
+import kt.testing.clock
+import kt.testing.requests
+import kt.testing.tests
+
+try:
+    import asyncio
+except ImportError:  # pragma: no cover
+    asyncio = None
+
+from time import sleep as imported_sleep
+
+
+class TC(kt.testing.TestCase):
+
+    clock = kt.testing.compose(kt.testing.clock.Clock)
+
+    def test_it(self):
+        """Just a dummy."""
+
+
+class EpochTC(kt.testing.TestCase):
+
+    clock = kt.testing.compose(kt.testing.clock.Clock, start=0.0)
+
+    def test_it(self):
+        """Just a dummy."""
+
+
+class TargetsTC(kt.testing.TestCase):
+
+    clock = kt.testing.compose(kt.testing.clock.Clock, start=0.0,
+                               targets=[__name__ + '.imported_sleep'])
+
+    def test_it(self):
+        """Just a dummy."""
+
+
+class RequestsTC(kt.testing.TestCase):
+
+    clock = kt.testing.compose(kt.testing.clock.Clock, start=0.0)
+    requests = kt.testing.compose(kt.testing.requests.Requests, clock=clock)
+
+    def test_it(self):
+        """Just a dummy."""
+
+
+class TestClock(kt.testing.tests.Core, unittest.TestCase):
+
+    def set_up(self, cls):
+        tc, = self.loader.makeTest(cls)
+        tc.setUp()
+        self.addCleanup(tc.doCleanups)
+        return tc
+
+    def test_sleep_advances_without_waiting(self):
+        started = time.time()
+        clock = self.set_up(EpochTC).clock
+
+        self.assertEqual(time.time(), 0.0)
+        before = time.monotonic()
+        time.sleep(3600)
+        self.assertEqual(time.time(), 3600.0)
+        self.assertAlmostEqual(time.monotonic() - before, 3600)
+        self.assertEqual(clock.elapsed, 3600)
+        clock.advance(0.5)
+        self.assertEqual(clock.time(), 3600.5)
+        with self.assertRaises(ValueError):
+            time.sleep(-1)
+
+        clock.test.doCleanups()
+        self.assertLess(time.time() - started, 60)
+        self.assertGreater(time.time(), started)
+
+    def test_starts_at_real_time(self):
+        before = time.time()
+        self.set_up(TC)
+        now = time.time()
+        self.assertGreaterEqual(now, before)
+        self.assertLess(now - before, 60)
+
+    def test_datetime(self):
+        clock = self.set_up(EpochTC).clock
+        clock.advance(86400)
+        self.assertEqual(datetime.datetime.utcnow(),
+                         datetime.datetime(1970, 1, 2))
+        time.sleep(90)
+        self.assertEqual(datetime.datetime.utcnow(),
+                         datetime.datetime(1970, 1, 2, 0, 1, 30))
+        self.assertEqual(datetime.datetime.now(),
+                         datetime.datetime.fromtimestamp(86490.0))
+        self.assertEqual(clock.now(), datetime.datetime.fromtimestamp(86490.0))
+        # Instances created outside the virtual clock are still
+        # datetimes.
+        self.assertIsInstance(datetime.datetime(2020, 1, 1),
+                              datetime.datetime)
+        self.assertIsInstance(clock.now(), datetime.datetime)
+
+    def test_originals_restored(self):
+        originals = (time.time, time.sleep, datetime.datetime)
+        tc = self.set_up(TC)
+        self.assertNotEqual((time.time, time.sleep, datetime.datetime),
+                            originals)
+        tc.doCleanups()
+        self.assertEqual((time.time, time.sleep, datetime.datetime),
+                         originals)
+
+    def test_targets(self):
+        clock = self.set_up(TargetsTC).clock
+        imported_sleep(10)
+        self.assertEqual(clock.time(), 10.0)
+
+    def test_invalid_target(self):
+
+        class TC(kt.testing.TestCase):
+
+            clock = kt.testing.compose(kt.testing.clock.Clock,
+                                       targets=[__name__ + '.unittest'])
+
+            def test_it(self):
+                """Just a dummy."""
+
+        tc, = self.loader.makeTest(TC)
+        with self.assertRaises(TypeError) as cm:
+            tc.setUp()
+        self.addCleanup(tc.doCleanups)
+        self.assertIn('is not a clock function', str(cm.exception))
+
+    def test_shared_with_requests(self):
+        tc = self.set_up(RequestsTC)
+
+        tc.requests.add_response('get', 'http://www.example.com/',
+                                 latency=2.5)
+        requests.get('http://www.example.com/')
+        self.assertEqual(time.time(), 2.5)
+
+        tc.requests.add_response('get', 'http://www.example.com/',
+                                 latency=30.0)
+        with self.assertRaises(requests.Timeout):
+            requests.get('http://www.example.com/', timeout=(1, 5))
+        self.assertEqual(time.time(), 7.5)
+
+
+@unittest.skipIf(asyncio is None, 'asyncio is not available')
+class TestClockEventLoop(kt.testing.tests.Core, unittest.TestCase):
+
+    def test_asyncio_uses_clock(self):
+        tc, = self.loader.makeTest(EpochTC)
+        tc.setUp()
+        self.addCleanup(tc.doCleanups)
+
+        async_main = _coroutines['main']
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        self.assertIsInstance(loop, kt.testing.clock.VirtualTimeEventLoop)
+        self.assertAlmostEqual(loop.run_until_complete(async_main()), 3600.0)
+        self.assertAlmostEqual(tc.clock.elapsed, 3600.0)
+
+        tc.doCleanups()
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        self.assertNotIsInstance(loop,
+                                 kt.testing.clock.VirtualTimeEventLoop)
+
+
+# Coroutine functions are defined this way to remain valid Python 2
+# syntax.
+_coroutines = {}
+if asyncio is not None:
+    exec('''if True:
+    import asyncio
+    import time
+
+    async def main():
+        await asyncio.sleep(3600)
+        return time.time()
+    ''', _coroutines)
@@ -63,6 +63,19 @@ class FixtureWithoutTeardown(object):
                                              'teardownless cleanup')))
 
 
+class PooledFixture(FixtureUsingBaseClass):
+    """Test fixture component reused by successive tests."""
+
+    def __init__(self, testcase):
+        super(PooledFixture, self).__init__(testcase)
+        self.tests = [testcase]
+
+    def reset(self, testcase):
+        self.test = testcase
+        self.tests.append(testcase)
+        testcase.record.append((testcase, 'pooled reset'))
+
+
 class TestComposition(kt.testing.tests.Core):
 
     def test_simple_usage(self):
@@ -185,6 +198,29 @@ class TestComposition(kt.testing.tests.Core):
             'derived cleanup',
         ]
 
+    def test_inherited_fixture_components_built_once(self):
+
+        class TCOne(kt.testing.TestCase):
+            independent = kt.testing.compose(IndependentFixture)
+
+        class TCTwo(TCOne):
+            record = []
+
+            def test_this(self):
+                self.record.append((self, 'test_this'))
+
+        tt, = self.loader.makeTest(TCTwo)
+
+        self.run_one_case(tt)
+        tt_record = [msg for tc, msg in TCTwo.record]
+        assert tt_record == [
+            'independent init',
+            'independent setup',
+            'test_this',
+            'independent teardown',
+            'independent cleanup',
+        ]
+
     def test_case_can_use_fixture_api(self):
 
         class TC(kt.testing.TestCase):
@@ -321,3 +357,104 @@ class TestComposition(kt.testing.tests.Core):
             'test_this',
             'teardownless cleanup',
         ]
+
+    def test_pooled_components_reused(self):
+
+        class TC(kt.testing.TestCase):
+            pooled = kt.testing.compose(PooledFixture)
+            record = []
+
+            def test_one(self):
+                self.record.append((self, 'test_one'))
+
+            def test_two(self):
+                self.record.append((self, 'test_two'))
+
+        one, two = self.loader.makeTest(TC)
+        # Nothing is created until a test needs the component.
+        assert TC.record == []
+
+        self.run_one_case(one)
+        self.run_one_case(two)
+        assert [msg for tc, msg in TC.record] == [
+            'derived init',
+            'derived setup',
+            'test_one',
+            'derived teardown',
+            'derived cleanup',
+            'pooled reset',
+            'derived setup',
+            'test_two',
+            'derived teardown',
+            'derived cleanup',
+        ]
+        assert [tc for tc, msg in TC.record[:5]] == [one] * 5
+        assert [tc for tc, msg in TC.record[5:]] == [two] * 5
+
+        # The released component remains available to the test that
+        # used it last, until another test takes it.
+        fixture = two.pooled
+        assert fixture.tests == [one, two]
+        try:
+            one.pooled
+        except AttributeError:
+            pass
+        else:
+            raise AssertionError('expected AttributeError')
+
+        # Accessing the component before setup doesn't take it from
+        # the pool.
+        three = TC('test_one')
+        try:
+            three.pooled
+        except AttributeError as e:
+            assert 'only available' in str(e)
+        else:
+            raise AssertionError('expected AttributeError')
+        assert kt.testing._pools[TC.pooled.marker] == [fixture]
+        self.run_one_case(three)
+        assert three.pooled is fixture
+        assert fixture.tests == [one, two, three]
+        assert kt.testing._pools[TC.pooled.marker] == [fixture]
+
+    def test_pooled_components_separate_while_in_use(self):
+
+        class TC(kt.testing.TestCase):
+            pooled = kt.testing.compose(PooledFixture)
+            record = []
+
+            def test_this(self):
+                """Just a dummy."""
+
+        one = TC('test_this')
+        two = TC('test_this')
+        one.setUp()
+        two.setUp()
+        assert one.pooled is not two.pooled
+        assert one.pooled.test is one
+        assert two.pooled.test is two
+        one.doCleanups()
+        two.doCleanups()
+
+    def test_class_resource(self):
+        resources = {}
+        released = []
+
+        class TC(kt.testing.TestCase):
+
+            def test_this(self):
+                """Just a dummy."""
+
+        def create():
+            return object()
+
+        first = kt.testing._class_resource(
+            TC, resources, 'key', create, released.append)
+        second = kt.testing._class_resource(
+            TC, resources, 'key', create, released.append)
+        assert first is second
+        assert resources == {'key': first}
+        do_class_cleanups = getattr(TC, 'doClassCleanups', None)
+        if do_class_cleanups is not None:
+            do_class_cleanups()
+            assert released == ['key']
@@ -0,0 +1,185 @@
+"""\
+Tests for kt.testing.files.
+
+"""
+
+from __future__ import absolute_import
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import kt.testing
+import kt.testing.files
+import kt.testing.tests
+
+
+FILES = {
+    'README': u'Sample files.\n',
+    'data/one.csv': b'a,b\n1,2\n',
+    'data/two.csv': b'a,b\n3,4\n',
+    'data/nested/three.txt': u'three\n',
+}
+
+
+# Template directories passed to build().
+builds = []
+
+
+def build(path):
+    builds.append(path)
+    os.symlink('data/one.csv', os.path.join(path, 'link'))
+
+
+class TC(kt.testing.TestCase):
+
+    tree = kt.testing.compose(kt.testing.files.TemporaryTree,
+                              files=FILES, build=build)
+
+    def test_one(self):
+        """Just a dummy."""
+
+    def test_two(self):
+        """Just a dummy."""
+
+
+class PlainTC(kt.testing.TestCase):
+
+    tree = kt.testing.compose(kt.testing.files.TemporaryTree, files=FILES)
+
+    def test_it(self):
+        """Just a dummy."""
+
+
+class TestTemporaryTree(kt.testing.tests.Core, unittest.TestCase):
+
+    def setUp(self):
+        super(TestTemporaryTree, self).setUp()
+        # The test classes may have been run on their own already.
+        del builds[:]
+        self.addCleanup(builds.__delitem__, slice(None))
+        for cls in TC, PlainTC:
+            self.release_trees(cls)
+            self.addCleanup(self.release_trees, cls)
+
+    def release_trees(self, cls):
+        kt.testing.tests.release_class_resources(
+            cls, kt.testing.files._trees, kt.testing.files._close)
+
+    def set_up(self, tc):
+        tc.setUp()
+        self.addCleanup(tc.doCleanups)
+        return tc
+
+    def read(self, tc, name):
+        with open(tc.tree.join(name), 'rb') as f:
+            return f.read()
+
+    def check_pristine(self, tc):
+        self.assertEqual(tc.tree.changes(), [])
+        self.assertEqual(self.read(tc, 'README'), b'Sample files.\n')
+        self.assertEqual(self.read(tc, 'data/one.csv'), b'a,b\n1,2\n')
+        self.assertEqual(self.read(tc, 'data/nested/three.txt'), b'three\n')
+        self.assertEqual(os.readlink(tc.tree.join('link')), 'data/one.csv')
+        self.assertEqual(
+            sorted(os.listdir(tc.tree.path)), ['README', 'data', 'link'])
+
+    def test_changes_restored(self):
+        tc, other = self.loader.makeTest(TC)
+        self.set_up(tc)
+        self.check_pristine(tc)
+
+        with open(tc.tree.join('data/one.csv'), 'ab') as f:
+            f.write(b'5,6\n')
+        os.unlink(tc.tree.join('README'))
+        shutil.rmtree(tc.tree.join('data/nested'))
+        os.mkdir(tc.tree.join('new'))
+        with open(tc.tree.join('new/file'), 'w') as f:
+            f.write('new')
+        os.unlink(tc.tree.join('link'))
+        os.symlink('README', tc.tree.join('link'))
+        self.assertEqual(
+            tc.tree.changes(),
+            ['README', 'data/nested', 'data/nested/three.txt',
+             'data/one.csv', 'link', 'new', 'new/file'])
+        path = tc.tree.path
+        tc.doCleanups()
+
+        self.set_up(other)
+        self.assertEqual(other.tree.path, path)
+        self.check_pristine(other)
+        self.assertEqual(len(builds), 1)
+
+    def test_file_replaced_by_directory(self):
+        tc, other = self.loader.makeTest(TC)
+        self.set_up(tc)
+        os.unlink(tc.tree.join('README'))
+        os.mkdir(tc.tree.join('README'))
+        with open(tc.tree.join('README', 'inside'), 'w') as f:
+            f.write('surprise')
+        os.chmod(tc.tree.join('data'), 0o700)
+        tc.doCleanups()
+        self.check_pristine(tc)
+        self.assertEqual(os.stat(tc.tree.join('data')).st_mode & 0o777,
+                         os.stat(tc.tree._tree.template + '/data').st_mode
+                         & 0o777)
+
+    def test_same_size_rewrite_detected(self):
+        tc, = self.loader.makeTest(PlainTC)
+        self.set_up(tc)
+        path = tc.tree.join('data/two.csv')
+        st = os.stat(path)
+        with open(path, 'wb') as f:
+            f.write(b'a,b\n9,9\n')
+        os.utime(path, (st.st_atime, st.st_mtime))
+        self.assertEqual(tc.tree.changes(), ['data/two.csv'])
+        tc.doCleanups()
+        self.assertEqual(self.read(tc, 'data/two.csv'), b'a,b\n3,4\n')
+
+    def test_directory(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+
+        class TC(kt.testing.TestCase):
+
+            tree = kt.testing.compose(kt.testing.files.TemporaryTree,
+                                      files=FILES, dir=tmpdir)
+
+            def test_it(self):
+                """Just a dummy."""
+
+        self.addCleanup(self.release_trees, TC)
+        tc, = self.loader.makeTest(TC)
+        self.set_up(tc)
+        self.assertEqual(os.path.dirname(os.path.dirname(tc.tree.path)),
+                         tmpdir)
+
+    @unittest.skipIf(not hasattr(unittest.TestCase, 'doClassCleanups'),
+                     'class cleanups are not available')
+    def test_removed_with_class(self):
+        tc, = self.loader.makeTest(PlainTC)
+        self.set_up(tc)
+        path = tc.tree.path
+        tc.doCleanups()
+        PlainTC.doClassCleanups()
+        self.assertFalse(os.path.exists(path))
+
+    def test_build_failure(self):
+
+        def broken(path):
+            raise ValueError('no files for you')
+
+        class TC(kt.testing.TestCase):
+
+            tree = kt.testing.compose(kt.testing.files.TemporaryTree,
+                                      build=broken)
+
+            def test_it(self):
+                """Just a dummy."""
+
+        tc, = self.loader.makeTest(TC)
+        with self.assertRaises(ValueError):
+            self.set_up(tc)
+        self.assertEqual(
+            [key for key in kt.testing.files._trees if key[2] is broken], [])
@@ -0,0 +1,235 @@
+"""\
+Tests for kt.testing.httpx.
+
+"""
+
+import time
+import unittest
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover
+    httpx = None
+else:
+    import kt.testing.httpx
+
+import kt.testing
+import kt.testing.clock
+import kt.testing.tests
+
+
+# Coroutine functions are defined this way to remain valid Python 2
+# syntax; httpx is only available for Python 3.
+_coroutines = {}
+if httpx is not None:
+    exec('''if True:
+    import asyncio
+
+    import httpx
+
+    async def request(method, url, client={}, **kwargs):
+        async with httpx.AsyncClient(**client) as c:
+            return await c.request(method, url, **kwargs)
+
+    async def expect_errors(test, url, errors):
+        async with httpx.AsyncClient() as client:
+            for exc in errors:
+                with test.assertRaises(exc):
+                    await client.get(url)
+
+    async def timed(coro):
+        # Return the exception raised by `coro` (or None) and the time
+        # taken according to the event loop.
+        loop = asyncio.get_event_loop()
+        start = loop.time()
+        try:
+            await coro
+        except Exception as e:
+            return e, loop.time() - start
+        return None, loop.time() - start
+
+    async def gather_statuses(urls):
+        loop = asyncio.get_event_loop()
+        start = loop.time()
+        async with httpx.AsyncClient() as client:
+            responses = await asyncio.gather(
+                *[client.get(url) for url in urls])
+        return [r.status_code for r in responses], loop.time() - start
+
+    async def burst_then_paced(url, count, interval):
+        async with httpx.AsyncClient() as client:
+            responses = await asyncio.gather(
+                *[client.get(url) for i in range(count)])
+            first = sorted(r.status_code for r in responses)
+            await asyncio.sleep(1)
+            second = []
+            for i in range(count):
+                r = await client.get(url)
+                second.append(r.status_code)
+                await asyncio.sleep(interval)
+        return first, second
+
+    async def sleep_then_time(loop, seconds):
+        await asyncio.sleep(seconds)
+        return loop.time()
+    ''', _coroutines)
+
+request = _coroutines.get('request')
+expect_errors = _coroutines.get('expect_errors')
+timed = _coroutines.get('timed')
+gather_statuses = _coroutines.get('gather_statuses')
+burst_then_paced = _coroutines.get('burst_then_paced')
+sleep_then_time = _coroutines.get('sleep_then_time')
+
+
+@unittest.skipIf(httpx is None, 'httpx is not available')
+class TestHTTPX(kt.testing.tests.Core, unittest.TestCase):
+
+    def setUp(self):
+        super(TestHTTPX, self).setUp()
+
+        class TC(kt.testing.TestCase):
+            fixture = kt.testing.compose(kt.testing.httpx.HTTPX)
+
+            def testit(self):
+                """Just a dummy."""
+
+        self.tc, = self.loader.makeTest(TC)
+        self.tc.setUp()
+        self.addCleanup(self.tc.tearDown)
+        self.fixture = self.tc.fixture
+
+    def test_get(self):
+        self.fixture.add_response(
+            'get', 'http://www.keepertech.com/api', body='{"answer": 42}',
+            headers={'Content-Type': 'application/json'})
+
+        r = self.fixture.run(
+            request('GET', 'http://www.keepertech.com/api'))
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.json(), {'answer': 42})
+        self.assertEqual(r.headers['content-type'], 'application/json')
+        req, = self.fixture.requests
+        self.assertEqual(req.method, 'get')
+        self.assertEqual(req.url, 'http://www.keepertech.com/api')
+
+    def test_post_filtered(self):
+        self.fixture.add_response(
+            'post', 'http://www.keepertech.com/api', status=201,
+            filter=lambda *args, **kwargs: kwargs['data'] == b'payload')
+
+        r = self.fixture.run(request(
+            'POST', 'http://www.keepertech.com/api', content=b'payload'))
+        self.assertEqual(r.status_code, 201)
+        self.assertEqual(self.fixture.requests[0].body, b'payload')
+
+    def test_unexpected_request(self):
+        with self.assertRaises(AssertionError) as cm:
+            self.fixture.run(
+                request('GET', 'http://www.keepertech.com/nope'))
+        self.assertEqual(str(cm.exception),
+                         'unexpected request: GET'
+                         ' http://www.keepertech.com/nope')
+
+    def test_errors_use_httpx_exceptions(self):
+        url = 'http://www.keepertech.com/'
+        self.fixture.add_connect_timeout('get', url)
+        self.fixture.add_read_timeout('get', url)
+        self.fixture.add_unreachable_host('get', url)
+
+        self.fixture.run(expect_errors(
+            self, url,
+            (httpx.ConnectTimeout, httpx.ReadTimeout, httpx.ConnectError)))
+
+    def test_concurrent_latency_is_virtual(self):
+        count = 2000
+        for i in range(count):
+            self.fixture.add_response(
+                'get', 'http://a.example.com/', body=str(i), latency=2.0)
+        for i in range(10):
+            self.fixture.add_response(
+                'get', 'http://b.example.com/', latency=0.5)
+
+        urls = (['http://a.example.com/'] * count
+                + ['http://b.example.com/'] * 10)
+        started = time.time()
+        statuses, elapsed = self.fixture.run(gather_statuses(urls))
+        self.assertLess(time.time() - started, 30)
+        self.assertEqual(statuses, [200] * (count + 10))
+        self.assertGreaterEqual(elapsed, 2.0)
+        self.assertLess(elapsed, 2.1)
+        self.assertEqual(self.fixture.peak_in_flight['a.example.com'], count)
+        self.assertEqual(self.fixture.peak_in_flight['b.example.com'], 10)
+        self.assertEqual(self.fixture.in_flight['a.example.com'], 0)
+
+    def test_latency_exceeding_timeout(self):
+        self.fixture.add_response(
+            'get', 'http://www.keepertech.com/', latency=30)
+
+        error, elapsed = self.fixture.run(timed(request(
+            'GET', 'http://www.keepertech.com/', client={'timeout': 5})))
+        self.assertIsInstance(error, httpx.ReadTimeout)
+        # The timeout passes before the error is raised, as for Requests.
+        self.assertAlmostEqual(elapsed, 5.0)
+        self.assertEqual(self.fixture.in_flight['www.keepertech.com'], 0)
+
+    def test_rate_limited_using_loop_time(self):
+        url = 'http://api.example.com/items'
+        rule = self.fixture.add_rate_limit('get', url, 5)
+        for i in range(20):
+            self.fixture.add_response('get', url)
+
+        first, second = self.fixture.run(burst_then_paced(url, 10, 0.2))
+        self.assertEqual(first, [200] * 5 + [429] * 5)
+        self.assertEqual(second, [200] * 10)
+        self.assertEqual(rule.throttled, 5)
+        self.fixture.responses.clear()
+
+
+@unittest.skipIf(httpx is None, 'httpx is not available')
+class TestHTTPXClock(kt.testing.tests.Core, unittest.TestCase):
+
+    def setUp(self):
+        super(TestHTTPXClock, self).setUp()
+
+        class TC(kt.testing.TestCase):
+            clock = kt.testing.compose(kt.testing.clock.Clock, start=0.0)
+            fixture = kt.testing.compose(kt.testing.httpx.HTTPX, clock=clock)
+
+            def testit(self):
+                """Just a dummy."""
+
+        self.tc, = self.loader.makeTest(TC)
+        self.tc.setUp()
+        self.addCleanup(self.tc.doCleanups)
+
+    def test_latency_advances_shared_clock(self):
+        tc = self.tc
+        tc.fixture.add_response('get', 'http://a.example.com/', latency=3.0)
+
+        r = tc.fixture.run(request('GET', 'http://a.example.com/'))
+        self.assertEqual(r.status_code, 200)
+        self.assertAlmostEqual(tc.clock.elapsed, 3.0)
+        self.assertAlmostEqual(time.time(), 3.0)
+
+    def test_timeout_advances_shared_clock(self):
+        tc = self.tc
+        tc.fixture.add_response('get', 'http://a.example.com/', latency=30)
+
+        with self.assertRaises(httpx.ReadTimeout):
+            tc.fixture.run(request('GET', 'http://a.example.com/',
+                                   client={'timeout': 5}))
+        self.assertAlmostEqual(tc.clock.elapsed, 5.0)
+
+
+@unittest.skipIf(httpx is None, 'httpx is not available')
+class TestVirtualTimeEventLoop(unittest.TestCase):
+
+    def test_sleep_advances_clock(self):
+        loop = kt.testing.clock.VirtualTimeEventLoop()
+        self.addCleanup(loop.close)
+
+        started = time.time()
+        self.assertEqual(
+            loop.run_until_complete(sleep_then_time(loop, 3600)), 3600)
+        self.assertLess(time.time() - started, 5)
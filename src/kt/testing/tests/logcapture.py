@@ -0,0 +1,156 @@
+"""\
+Tests for kt.testing.logcapture.
+
+"""
+
+from __future__ import absolute_import
+
+import logging
+import unittest
+
+import kt.testing
+import kt.testing.logcapture
+import kt.testing.tests
+
+
+class TestLogCapture(kt.testing.tests.Core, unittest.TestCase):
+
+    def setUp(self):
+        super(TestLogCapture, self).setUp()
+        # Keep records that aren't captured off stderr.
+        handler = logging.NullHandler()
+        logging.getLogger().addHandler(handler)
+        self.addCleanup(logging.getLogger().removeHandler, handler)
+
+    def make_case(self, **kwargs):
+
+        class TC(kt.testing.TestCase):
+
+            logs = kt.testing.compose(kt.testing.logcapture.LogCapture,
+                                      **kwargs)
+
+            def test_quiet(self):
+                logging.getLogger('kt.sample').warning('quiet %s', 'test')
+
+            def test_failing(self):
+                logging.getLogger('kt.sample').error('before %d', 42)
+                self.fail('expected failure')
+
+            def test_error(self):
+                logging.getLogger('kt.sample').error('about to break')
+                raise ValueError('broken')
+
+        return TC
+
+    def setup_case(self, **kwargs):
+        tc = self.make_case(**kwargs)('test_quiet')
+        tc.setUp()
+        self.addCleanup(tc.doCleanups)
+        return tc.logs
+
+    def test_records_indexed(self):
+        logs = self.setup_case(name='kt')
+        logging.getLogger('kt').info('top')
+        logging.getLogger('kt.a').warning('a %s', 'warning')
+        logging.getLogger('kt.a.b').error('nested')
+        logging.getLogger('kt.ab').error('not a child of kt.a')
+        logging.getLogger('other').error('not captured')
+
+        self.assertEqual(
+            [r.getMessage() for r in logs.records],
+            ['a warning', 'nested', 'not a child of kt.a'])
+        self.assertEqual(logs.messages(logging.ERROR),
+                         ['nested', 'not a child of kt.a'])
+        self.assertEqual(logs.messages('warning'),
+                         ['a warning', 'nested', 'not a child of kt.a'])
+        self.assertEqual(logs.messages(name='kt.a'), ['a warning', 'nested'])
+        self.assertEqual(logs.messages('ERROR', name='kt.a'), ['nested'])
+        self.assertEqual(logs.messages(name='kt.missing'), [])
+        self.assertEqual(logs.output(name='kt.a.b'), 'ERROR:kt.a.b:nested\n')
+
+        logs.clear()
+        self.assertEqual(logs.records, [])
+
+    def test_level_lowered(self):
+        logger = logging.getLogger('kt.lowered')
+        logger.setLevel(logging.WARNING)
+        self.addCleanup(logger.setLevel, logging.NOTSET)
+        logs = self.setup_case(name='kt.lowered', level='DEBUG')
+        logger.debug('debugging')
+        self.assertEqual(logs.messages(), ['debugging'])
+        logs.test.doCleanups()
+        self.assertEqual(logger.level, logging.WARNING)
+
+    def test_capacity(self):
+        logs = self.setup_case(name='kt.capacity', capacity=3)
+        logger = logging.getLogger('kt.capacity')
+        logger.setLevel(logging.DEBUG)
+        self.addCleanup(logger.setLevel, logging.NOTSET)
+        for i in range(10):
+            logger.log(logging.ERROR if i % 2 else logging.INFO, '%d', i)
+        self.assertEqual(logs.messages(), ['7', '8', '9'])
+        self.assertEqual(logs.messages(logging.ERROR), ['7', '9'])
+        self.assertEqual(logs.dropped, 7)
+
+    def test_formatted_lazily(self):
+        logs = self.setup_case(name='kt.lazy', format='%(message)s')
+        formatted = []
+
+        class Payload(object):
+            def __str__(self):
+                formatted.append(self)
+                return 'payload'
+
+        logging.getLogger('kt.lazy').error('%s', Payload())
+        self.assertEqual(formatted, [])
+        self.assertEqual(logs.output(), 'payload\n')
+        self.assertEqual(len(formatted), 1)
+
+    def test_not_formatted_when_passing(self):
+        formatted = []
+
+        class Payload(object):
+            def __str__(self):
+                formatted.append(self)
+                return 'payload'
+
+        class TC(kt.testing.TestCase):
+
+            logs = kt.testing.compose(kt.testing.logcapture.LogCapture,
+                                      name='kt.passing')
+
+            def test_passing(self):
+                for i in range(5):
+                    logging.getLogger('kt.passing').error('%s', Payload())
+
+        result = self.run_one_case(TC('test_passing'))
+        self.assertTrue(result.wasSuccessful())
+        self.assertEqual(formatted, [])
+
+    def test_handler_removed(self):
+        logs = self.setup_case(name='kt.removed')
+        logs.test.doCleanups()
+        logging.getLogger('kt.removed').error('after the test')
+        self.assertEqual(logs.records, [])
+
+    def test_output_attached_to_failures(self):
+        cls = self.make_case(name='kt.sample')
+        result = self.run_one_case(cls('test_failing'))
+        (test, report), = result.failures
+        self.assertIn('expected failure', report)
+        self.assertIn('Captured logging:\nERROR:kt.sample:before 42\n',
+                      report)
+
+        result = self.run_one_case(cls('test_error'))
+        (test, report), = result.errors
+        self.assertIn('ValueError: broken', report)
+        self.assertIn('ERROR:kt.sample:about to break', report)
+
+        result = self.run_one_case(cls('test_quiet'))
+        self.assertTrue(result.wasSuccessful())
+
+    def test_output_not_attached(self):
+        cls = self.make_case(name='kt.sample', attach=False)
+        result = self.run_one_case(cls('test_failing'))
+        (test, report), = result.failures
+        self.assertNotIn('Captured logging', report)
@@ -0,0 +1,213 @@
+"""\
+Tests for kt.testing.memo.
+
+"""
+
+from __future__ import absolute_import
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import kt.testing
+import kt.testing.memo
+import kt.testing.tests
+
+
+class TestMemo(unittest.TestCase):
+
+    def setUp(self):
+        super(TestMemo, self).setUp()
+        self.calls = []
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+
+    def load(self, name, scale=1):
+        self.calls.append((name, scale))
+        return {'name': name, 'data': list(range(10 * scale))}
+
+    def test_cached_by_arguments(self):
+        memo = kt.testing.memo.Memo(self.load)
+        first = memo('a')
+        self.assertIs(memo('a'), first)
+        self.assertIsNot(memo('a', scale=2), first)
+        self.assertIs(memo('a', scale=2), memo('a', scale=2))
+        self.assertEqual(self.calls, [('a', 1), ('a', 2)])
+        self.assertEqual((memo.hits, memo.misses), (3, 2))
+
+        memo.clear()
+        self.assertEqual(len(memo), 0)
+        memo('a')
+        self.assertEqual(len(self.calls), 3)
+
+    def test_unhashable_arguments(self):
+        memo = kt.testing.memo.Memo(lambda items: sum(items))
+        self.assertEqual(memo([1, 2, 3]), 6)
+        self.assertEqual(memo([1, 2, 3]), 6)
+        self.assertEqual((memo.hits, memo.misses), (1, 1))
+
+    def test_keys_independent_of_order(self):
+        memo = kt.testing.memo.Memo(lambda options: len(options))
+        memo({'a': 1, 'b': [1, 2]})
+        memo(dict([('b', [1, 2]), ('a', 1)]))
+        memo(set(['x', 'y']))
+        memo(set(['y', 'x']))
+        self.assertEqual((memo.hits, memo.misses), (2, 2))
+        # Equal containers are the same key, but a list of items isn't
+        # a mapping.
+        memo(frozenset(['x', 'y']))
+        memo([('a', 1), ('b', [1, 2])])
+        self.assertEqual((memo.hits, memo.misses), (3, 3))
+
+        # Keys pickle the same way, so saved values are found.
+        make_key = kt.testing.memo._make_key
+        self.assertEqual(
+            make_key(({'a': 1, 'b': [1, 2]},), {}),
+            make_key((dict([('b', [1, 2]), ('a', 1)]),), {}))
+        self.assertEqual(
+            make_key((), {'mixed': {1: 'x', 'b': 'y'}}),
+            make_key((), {'mixed': dict([('b', 'y'), (1, 'x')])}))
+
+    def test_unpicklable_not_saved(self):
+        directory = os.path.join(self.tmpdir, 'cache')
+
+        def check(value):
+            return lambda: value
+
+        memo = kt.testing.memo.Memo(check, directory=directory)
+        memo(1)
+        self.assertIs(memo(1), memo(1))
+        self.assertFalse(os.path.exists(directory))
+
+        memo = kt.testing.memo.Memo(len, directory=directory)
+        unpicklable = lambda: None  # noqa: E731
+        self.assertEqual(memo([unpicklable]), 1)
+        self.assertEqual(memo((unpicklable,)), 1)
+        self.assertEqual(memo((unpicklable,)), 1)
+        self.assertEqual((memo.hits, memo.misses), (1, 2))
+        self.assertFalse(os.path.exists(directory))
+
+    def test_least_recently_used_evicted(self):
+        memo = kt.testing.memo.Memo(self.load, maxsize=2)
+        memo('a')
+        memo('b')
+        memo('a')
+        memo('c')
+        self.assertEqual(len(memo), 2)
+        del self.calls[:]
+        memo('a')
+        memo('b')
+        self.assertEqual(self.calls, [('b', 1)])
+
+    def test_evicted_by_size(self):
+        memo = kt.testing.memo.Memo(lambda n: 'x' * n, maxsize=None,
+                                    maxbytes=100, sizeof=len)
+        memo(40)
+        memo(50)
+        self.assertEqual(len(memo), 2)
+        memo(30)
+        # 40 was evicted to make room.
+        self.assertEqual(len(memo), 2)
+        self.assertEqual(memo.misses, 3)
+        memo(50)
+        self.assertEqual(memo.hits, 1)
+        # Values larger than the limit aren't cached at all.
+        memo(200)
+        self.assertEqual(len(memo), 2)
+
+    def test_size_defaults_to_pickle_length(self):
+        memo = kt.testing.memo.Memo(self.load, maxbytes=1)
+        memo('a')
+        self.assertEqual(len(memo), 0)
+
+    def test_saved_on_disk(self):
+        source = os.path.join(self.tmpdir, 'source.json')
+        with open(source, 'w') as f:
+            f.write('{}')
+        directory = os.path.join(self.tmpdir, 'cache')
+
+        def make():
+            return kt.testing.memo.Memo(
+                self.load, directory=directory,
+                sources=lambda name, scale=1: [source])
+
+        value = make()('a')
+        self.assertEqual(len(os.listdir(directory)), 1)
+
+        # A new memo (as in another process) loads the saved value.
+        memo = make()
+        self.assertEqual(memo('a'), value)
+        self.assertEqual(memo.loads, 1)
+        self.assertEqual(len(self.calls), 1)
+
+        # Changing the source invalidates the saved value.
+        with open(source, 'w') as f:
+            f.write('{"changed": true}')
+        st = os.stat(source)
+        os.utime(source, (st.st_atime, st.st_mtime + 10))
+        memo = make()
+        memo('a')
+        self.assertEqual(memo.loads, 0)
+        self.assertEqual(len(self.calls), 2)
+
+        # A different version doesn't use the saved values.
+        memo = kt.testing.memo.Memo(self.load, directory=directory,
+                                    version=2)
+        memo('a')
+        self.assertEqual(memo.loads, 0)
+        self.assertEqual(len(self.calls), 3)
+
+    def test_damaged_file_ignored(self):
+        directory = os.path.join(self.tmpdir, 'cache')
+        kt.testing.memo.Memo(self.load, directory=directory)('a')
+        name, = os.listdir(directory)
+        with open(os.path.join(directory, name), 'wb') as f:
+            f.write(b'not a pickle')
+        memo = kt.testing.memo.Memo(self.load, directory=directory)
+        self.assertEqual(memo('a')['name'], 'a')
+        self.assertEqual(len(self.calls), 2)
+
+    def test_decorator(self):
+
+        @kt.testing.memo.memoized(maxsize=1)
+        def load(name):
+            self.calls.append(name)
+            return name.upper()
+
+        self.assertIsInstance(load, kt.testing.memo.Memo)
+        self.assertEqual(load('a'), 'A')
+        self.assertEqual(load('a'), 'A')
+        self.assertEqual(self.calls, ['a'])
+
+
+class Schema(kt.testing.FixtureComponent):
+
+    def __init__(self, testcase, name):
+        super(Schema, self).__init__(testcase)
+        self.schema = _load_schema(name)
+
+
+@kt.testing.memo.memoized()
+def _load_schema(name):
+    return {'name': name}
+
+
+class TestMemoInComponents(kt.testing.tests.Core, unittest.TestCase):
+
+    def test_shared_across_classes(self):
+
+        class TCOne(kt.testing.TestCase):
+            schema = kt.testing.compose(Schema, 'one')
+
+            def test_it(self):
+                """Just a dummy."""
+
+        class TCTwo(kt.testing.TestCase):
+            schema = kt.testing.compose(Schema, 'one')
+
+            def test_it(self):
+                """Just a dummy."""
+
+        self.assertIs(TCOne('test_it').schema.schema,
+                      TCTwo('test_it').schema.schema)
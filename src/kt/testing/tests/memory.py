@@ -0,0 +1,140 @@
+"""\
+Tests for kt.testing.memory.
+
+"""
+
+from __future__ import absolute_import
+
+import unittest
+import warnings
+
+import kt.testing
+import kt.testing.memory
+import kt.testing.tests
+
+
+# Where leaking tests put things.
+leaked = []
+
+
+class Leaky(object):
+    pass
+
+
+class Allocations(object):
+    """Tests for classes composing a MemoryGrowth component."""
+
+    def test_leak(self):
+        leaked.extend(Leaky() for i in range(20000))
+
+    def test_tidy(self):
+        data = [Leaky() for i in range(20000)]
+        del data
+
+
+@unittest.skipIf(kt.testing.memory.tracemalloc is None,
+                 'tracemalloc is not available')
+class TestMemoryGrowth(kt.testing.tests.Core, unittest.TestCase):
+
+    def setUp(self):
+        super(TestMemoryGrowth, self).setUp()
+        self.addCleanup(leaked.__delitem__, slice(None))
+        self.tracing = kt.testing.memory.tracemalloc.is_tracing()
+
+    def run_test(self, tc):
+        self.run_one_case(tc)
+        self.assertEqual(kt.testing.memory.tracemalloc.is_tracing(),
+                         self.tracing)
+
+    def test_growth_fails(self):
+
+        class TC(Allocations, kt.testing.TestCase):
+            memory = kt.testing.compose(
+                kt.testing.memory.MemoryGrowth, threshold=100 * 1024)
+
+        tc, tidy = self.loader.makeTest(TC)
+        self.run_test(tc)
+        (failed, tb), = self.result.failures
+        self.assertIn('memory grew by ', tb)
+        self.assertIn('(threshold 100.0 KiB) in ', tb)
+        # The allocating line is reported.
+        self.assertIn(__file__.replace('.pyc', '.py'), tb)
+        self.assertIn('leaked.extend(Leaky() for i in range(20000))', tb)
+        self.assertGreater(tc.memory.growth, 100 * 1024)
+
+    def test_released_memory_passes(self):
+
+        class TC(Allocations, kt.testing.TestCase):
+            memory = kt.testing.compose(
+                kt.testing.memory.MemoryGrowth, threshold=100 * 1024)
+
+        leak, tc = self.loader.makeTest(TC)
+        self.run_test(tc)
+        self.assertEqual(self.result.failures, [])
+        self.assertEqual(self.result.errors, [])
+        self.assertLess(tc.memory.growth, 100 * 1024)
+
+    def test_growth_below_threshold(self):
+
+        class TC(Allocations, kt.testing.TestCase):
+            memory = kt.testing.compose(
+                kt.testing.memory.MemoryGrowth, threshold=100 * 1024 * 1024)
+
+        tc, tidy = self.loader.makeTest(TC)
+        self.run_test(tc)
+        self.assertEqual(self.result.failures, [])
+
+    def test_warning_instead_of_failure(self):
+
+        class TC(Allocations, kt.testing.TestCase):
+            memory = kt.testing.compose(
+                kt.testing.memory.MemoryGrowth, threshold=1024, fail=False)
+
+        tc, tidy = self.loader.makeTest(TC)
+        with warnings.catch_warnings(record=True) as w:
+            warnings.simplefilter('always')
+            self.run_test(tc)
+        self.assertEqual(self.result.failures, [])
+        warning, = [x for x in w
+                    if x.category is kt.testing.memory.MemoryGrowthWarning]
+        self.assertIn('memory grew by ', str(warning.message))
+
+    def test_object_counts_by_type(self):
+
+        class TC(Allocations, kt.testing.TestCase):
+            memory = kt.testing.compose(
+                kt.testing.memory.MemoryGrowth, threshold=1024, types=True)
+
+        tc, tidy = self.loader.makeTest(TC)
+        self.run_test(tc)
+        name = '%s.Leaky' % __name__
+        self.assertEqual(tc.memory.objects[name], 20000)
+        (failed, tb), = self.result.failures
+        self.assertIn('+20000 %s objects' % name, tb)
+
+    def test_sampling(self):
+
+        class TC(Allocations, kt.testing.TestCase):
+            memory = kt.testing.compose(
+                kt.testing.memory.MemoryGrowth, threshold=1024, sample=0.0)
+
+        tc, tidy = self.loader.makeTest(TC)
+        self.run_test(tc)
+        self.assertEqual(self.result.failures, [])
+        self.assertFalse(tc.memory.active)
+        self.assertIsNone(tc.memory.growth)
+
+        # Selection is stable for any given test.
+        class TC(Allocations, kt.testing.TestCase):
+            memory = kt.testing.compose(
+                kt.testing.memory.MemoryGrowth, sample=0.5)
+
+        selected = set()
+        for i in range(2):
+            for tc in self.loader.makeTest(TC):
+                tc.memory.setup()
+                tc.doCleanups()
+                if tc.memory.active:
+                    selected.add((i, tc._testMethodName))
+        self.assertEqual(set(name for i, name in selected if i == 0),
+                         set(name for i, name in selected if i == 1))
@@ -0,0 +1,191 @@
+"""\
+Tests for parameterized kt.testing tests.
+
+"""
+
+from __future__ import absolute_import
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import kt.testing
+import kt.testing.tests
+
+
+class Counting(kt.testing.FixtureComponent):
+
+    built = 0
+
+    def __init__(self, testcase):
+        super(Counting, self).__init__(testcase)
+        Counting.built += 1
+
+
+class TestParameters(kt.testing.tests.Core, unittest.TestCase):
+
+    def setUp(self):
+        super(TestParameters, self).setUp()
+        Counting.built = 0
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+
+    def run_cases(self, tc):
+        result = unittest.TestResult()
+        tc.run(result)
+        return result
+
+    def test_cases_reported_separately(self):
+        seen = []
+
+        class TC(kt.testing.TestCase):
+
+            counting = kt.testing.compose(Counting)
+
+            @kt.testing.parameters([(1, 2), (2, 3), (3, 5)])
+            def test_add_one(self, value, expected):
+                seen.append(value)
+                self.assertEqual(value + 1, expected)
+
+        tc, = self.loader.makeTest(TC)
+        self.assertEqual(tc.countTestCases(), 3)
+        self.assertEqual(Counting.built, 1)
+        result = self.run_cases(tc)
+
+        self.assertEqual(seen, [1, 2, 3])
+        self.assertEqual(result.testsRun, 3)
+        (failed, report), = result.failures
+        self.assertTrue(failed.id().endswith('TC.test_add_one[2]'))
+        self.assertTrue(str(failed).startswith('test_add_one[2] ('))
+        # One component for each case, and one for the original test.
+        self.assertEqual(Counting.built, 4)
+
+    def test_keyword_arguments_and_ids(self):
+        seen = []
+
+        def cases():
+            for name in ('a', 'b'):
+                yield {'name': name, 'upper': name.upper()}
+
+        class TC(kt.testing.TestCase):
+
+            @kt.testing.parameters(cases, ids=lambda case: case['name'])
+            def test_upper(self, name, upper):
+                seen.append(self.id().rsplit('.', 1)[-1])
+                self.assertEqual(name.upper(), upper)
+
+            @kt.testing.parameters(['x'])
+            def test_single(self, value):
+                seen.append(value)
+
+        tc = TC('test_upper')
+        self.assertEqual(tc.countTestCases(), 2)
+        result = self.run_cases(tc)
+        self.assertTrue(result.wasSuccessful())
+        self.assertEqual(seen, ['test_upper[a]', 'test_upper[b]'])
+
+        self.run_cases(TC('test_single'))
+        self.assertEqual(seen[-1], 'x')
+
+    def test_cases_from_files(self):
+        path = os.path.join(self.tmpdir, 'cases.json')
+        with open(path, 'w') as f:
+            json.dump([[1, 1], {'value': 2, 'expected': 4}], f)
+        with open(os.path.join(self.tmpdir, 'cases.jsonl'), 'w') as f:
+            f.write('[3, 9]\n\n{"value": 4, "expected": 16}\n')
+        with open(os.path.join(self.tmpdir, 'cases.csv'), 'w') as f:
+            f.write('value,expected\n5,25\n')
+        seen = []
+
+        class TC(kt.testing.TestCase):
+
+            @kt.testing.parameters(file=path)
+            def test_json(self, value, expected):
+                self.check(value, expected)
+
+            @kt.testing.parameters(
+                file=os.path.join(self.tmpdir, 'cases.jsonl'))
+            def test_jsonl(self, value, expected):
+                self.check(value, expected)
+
+            @kt.testing.parameters(file=os.path.join(self.tmpdir, 'cases.csv'))
+            def test_csv(self, value, expected):
+                self.check(int(value), int(expected))
+
+            def check(self, value, expected):
+                seen.append(value)
+                self.assertEqual(value * value, expected)
+
+        for name in ('test_json', 'test_jsonl', 'test_csv'):
+            result = self.run_cases(TC(name))
+            self.assertTrue(result.wasSuccessful(), result.failures)
+        self.assertEqual(seen, [1, 2, 3, 4, 5])
+        self.assertEqual(TC('test_jsonl').countTestCases(), 2)
+
+    def test_relative_file(self):
+
+        class TC(kt.testing.TestCase):
+
+            @kt.testing.parameters(file='no-such-cases.json')
+            def test_it(self, value):
+                pass
+
+        with self.assertRaises(IOError) as cm:
+            TC('test_it').countTestCases()
+        self.assertEqual(
+            cm.exception.filename,
+            os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         'no-such-cases.json'))
+
+    def test_skips_and_stop(self):
+
+        class TC(kt.testing.TestCase):
+
+            @kt.testing.parameters(range(5))
+            @unittest.skip('not today')
+            def test_skipped(self, value):
+                pass
+
+            @kt.testing.parameters(range(5))
+            def test_stop(self, value):
+                if value == 1:
+                    self._outcome.result.stop()
+
+        result = self.run_cases(TC('test_skipped'))
+        self.assertEqual(len(result.skipped), 5)
+        result = self.run_cases(TC('test_stop'))
+        self.assertEqual(result.testsRun, 2)
+
+    def test_iterator_cases_reused(self):
+        seen = []
+
+        class TC(kt.testing.TestCase):
+
+            @kt.testing.parameters(value for value in range(3))
+            def test_it(self, value):
+                seen.append(value)
+
+        tc, = self.loader.makeTest(TC)
+        self.assertEqual(tc.countTestCases(), 3)
+        self.assertEqual(self.run_cases(tc).testsRun, 3)
+        self.assertEqual(self.run_cases(tc).testsRun, 3)
+        self.assertEqual(seen, [0, 1, 2, 0, 1, 2])
+
+    def test_cases_or_file_required(self):
+        with self.assertRaises(TypeError):
+            kt.testing.parameters()
+        with self.assertRaises(TypeError):
+            kt.testing.parameters([1], file='cases.json')
+
+    def test_fixture_plan_cached(self):
+
+        class TC(kt.testing.TestCase):
+            counting = kt.testing.compose(Counting)
+
+            def test_it(self):
+                pass
+
+        self.assertIs(kt.testing._fixture_plan(TC),
+                      kt.testing._fixture_plan(TC))
@@ -0,0 +1,168 @@
+"""\
+Tests for kt.testing.patching.
+
+"""
+
+from __future__ import absolute_import
+
+import unittest
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+import kt.testing
+import kt.testing.patching
+import kt.testing.tests
+
+
+CONSTANT = 'original'
+
+
+class Base(object):
+
+    value = 'base'
+
+    def method(self):
+        return 'base method'
+
+    @staticmethod
+    def static():
+        return 'static'
+
+
+class Derived(Base):
+    pass
+
+
+HERE = __name__
+
+
+class TestPatches(kt.testing.tests.Core, unittest.TestCase):
+
+    def make_case(self, targets, **kwargs):
+
+        class TC(kt.testing.TestCase):
+
+            patches = kt.testing.compose(
+                kt.testing.patching.Patches, targets, **kwargs)
+
+            def test_it(self):
+                pass
+
+        return TC
+
+    def test_patch_and_restore(self):
+        cls = self.make_case({
+            HERE + '.CONSTANT': 'patched',
+            HERE + '.Base.value': 'patched value',
+            HERE + '.Base.static': staticmethod(lambda: 'patched static'),
+            HERE + '.Derived.method': lambda self: 'patched method',
+        })
+        tc = cls('test_it')
+        tc.setUp()
+        self.assertEqual(CONSTANT, 'patched')
+        self.assertEqual(Base.value, 'patched value')
+        self.assertEqual(Base.static(), 'patched static')
+        self.assertEqual(Derived().method(), 'patched method')
+        self.assertEqual(Base().method(), 'base method')
+        self.assertEqual(tc.patches[HERE + '.CONSTANT'], 'patched')
+        tc.tearDown()
+        tc.doCleanups()
+
+        self.assertEqual(CONSTANT, 'original')
+        self.assertEqual(Base.value, 'base')
+        self.assertEqual(Base.static(), 'static')
+        self.assertIsInstance(vars(Base)['static'], staticmethod)
+        # The inherited method is exposed again.
+        self.assertNotIn('method', vars(Derived))
+        self.assertEqual(Derived().method(), 'base method')
+
+    def test_mocks_created_per_test(self):
+        cls = self.make_case({HERE + '.Base.method':
+                              kt.testing.patching.MOCK})
+        mocks = []
+        for i in range(2):
+            tc = cls('test_it')
+            tc.setUp()
+            Base.method('arg')
+            tc.patches[HERE + '.Base.method'].assert_called_once_with('arg')
+            mocks.append(tc.patches[HERE + '.Base.method'])
+            tc.doCleanups()
+        self.assertIsNot(mocks[0], mocks[1])
+        self.assertIsInstance(mocks[0], mock.MagicMock)
+
+    def test_create(self):
+        target = HERE + '.Base.created'
+        tc = self.make_case({target: 42}, create=True)('test_it')
+        tc.setUp()
+        self.assertEqual(Base.created, 42)
+        tc.doCleanups()
+        self.assertFalse(hasattr(Base, 'created'))
+
+    def test_missing_attribute(self):
+        cls = self.make_case({
+            HERE + '.CONSTANT': 'patched',
+            HERE + '.Base.missing': 42,
+        })
+        tc = cls('test_it')
+        with self.assertRaises(AttributeError):
+            tc.setUp()
+        # Patches already applied were undone.
+        self.assertEqual(CONSTANT, 'original')
+        tc.doCleanups()
+
+    def test_invalid_target(self):
+        tc = self.make_case({'nodots': 42})('test_it')
+        with self.assertRaises(TypeError):
+            tc.setUp()
+        tc.doCleanups()
+
+    def test_import_submodule(self):
+        tc = self.make_case({'kt.testing.tests.patching.CONSTANT': 'x'})(
+            'test_it')
+        tc.setUp()
+        self.assertEqual(CONSTANT, 'x')
+        tc.doCleanups()
+
+    def test_targets_parsed_once_per_class(self):
+        cls = self.make_case({HERE + '.CONSTANT': 'patched',
+                              HERE + '.Base.value': 'patched'})
+        parse = kt.testing.patching._parse
+        with mock.patch('kt.testing.patching._parse',
+                        side_effect=parse) as m:
+            for i in range(3):
+                tc = cls('test_it')
+                tc.setUp()
+                tc.doCleanups()
+            self.assertEqual(m.call_count, 2)
+            # Another class resolves its own targets.
+            tc = self.make_case({HERE + '.CONSTANT': 'patched'})('test_it')
+            tc.setUp()
+            tc.doCleanups()
+            self.assertEqual(m.call_count, 3)
+
+    def test_replaced_owner_patched(self):
+        global Base
+        cls = self.make_case({HERE + '.Base.value': 'patched'})
+        tc = cls('test_it')
+        tc.setUp()
+        tc.doCleanups()
+
+        # Another patch (or a reload) replaces an object on the path.
+        original = Base
+
+        class Replacement(object):
+            value = 'replacement'
+
+        Base = Replacement
+        try:
+            tc = cls('test_it')
+            tc.setUp()
+            self.assertEqual(Replacement.value, 'patched')
+            self.assertEqual(original.value, 'base')
+            tc.doCleanups()
+            self.assertEqual(Replacement.value, 'replacement')
+        finally:
+            Base = original
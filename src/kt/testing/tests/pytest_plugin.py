@@ -0,0 +1,219 @@
+"""\
+Tests for kt.testing.pytest_plugin.
+
+"""
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+try:
+    import pytest
+except ImportError:  # pragma: no cover
+    pytest = None
+
+try:
+    import xdist
+except ImportError:  # pragma: no cover
+    xdist = None
+
+import kt.testing
+import kt.testing.pytest_plugin
+
+
+SAMPLE = '''\
+import os
+
+import kt.testing
+import kt.testing.cleanup
+
+
+def record(what):
+    with open(os.environ['KT_RECORD'], 'a') as f:
+        f.write('%s %s\\n' % (os.environ.get('PYTEST_XDIST_WORKER', '-'),
+                              what))
+
+
+kt.testing.cleanup.register(record, 'cleanup')
+
+
+class Shared(kt.testing.FixtureComponent):
+
+    scope = 'class'
+
+    def setup(self):
+        record('setup %s' % self.test.__class__.__name__)
+
+
+class Plain(kt.testing.FixtureComponent):
+    pass
+
+
+class TestShared(kt.testing.TestCase):
+
+    shared = kt.testing.compose(Shared)
+
+    def test_0(self):
+        pass
+
+    def test_1(self):
+        pass
+
+    def test_2(self):
+        pass
+
+    def test_3(self):
+        pass
+
+    def test_4(self):
+        pass
+
+    def test_5(self):
+        pass
+
+    def test_6(self):
+        pass
+
+    def test_7(self):
+        pass
+
+
+class TestPlain(kt.testing.TestCase):
+
+    plain = kt.testing.compose(Plain)
+
+    def test_0(self):
+        pass
+
+    def test_1(self):
+        pass
+
+    def test_2(self):
+        pass
+
+    def test_3(self):
+        pass
+
+    def test_4(self):
+        pass
+
+    def test_5(self):
+        pass
+
+    def test_6(self):
+        pass
+
+    def test_7(self):
+        pass
+'''
+
+PARAMETERS = '''\
+import kt.testing
+
+
+class TestCases(kt.testing.TestCase):
+
+    @kt.testing.parameters([1, 2, 3, 4], ids=lambda case: 'case%d' % case)
+    def test_odd(self, value):
+        self.assertEqual(value % 2, 1)
+'''
+
+
+@unittest.skipIf(pytest is None, 'pytest is not available')
+class TestPlugin(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        with open(os.path.join(self.tmpdir, 'test_sample.py'), 'w') as f:
+            f.write(SAMPLE)
+        self.record = os.path.join(self.tmpdir, 'record.txt')
+
+    def run_pytest(self, *args, **kwargs):
+        returncode = kwargs.pop('returncode', 0)
+        env = dict(os.environ)
+        env['KT_RECORD'] = self.record
+        env['PYTHONPATH'] = os.pathsep.join(
+            [os.path.dirname(os.path.dirname(os.path.dirname(
+                os.path.abspath(kt.testing.__file__))))]
+            + [p for p in [env.get('PYTHONPATH')] if p])
+        proc = subprocess.Popen(
+            [sys.executable, '-m', 'pytest', '-p', 'kt.testing.pytest_plugin',
+             '-p', 'no:cacheprovider', '-q', '--strict-markers']
+            + list(args),
+            cwd=self.tmpdir, env=env,
+            stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        output = proc.communicate()[0].decode('utf-8')
+        self.assertEqual(proc.returncode, returncode, output)
+        if not os.path.exists(self.record):
+            return output, []
+        with open(self.record) as f:
+            return output, [line.split(' ', 1) for line in f.read().split('\n')
+                            if line]
+
+    def test_keywords_select_by_component(self):
+        output, lines = self.run_pytest('-k', 'Shared')
+        self.assertIn('8 passed', output)
+
+    def test_session_cleanup(self):
+        output, lines = self.run_pytest()
+        self.assertIn('16 passed', output)
+        whats = [what for worker, what in lines]
+        # Each test cleans up twice, and the session twice more.
+        self.assertEqual(whats.count('cleanup'), 16 * 2 + 2)
+        self.assertEqual(whats[0], 'cleanup')
+        self.assertEqual(whats[-1], 'cleanup')
+
+    @unittest.skipIf(xdist is None, 'pytest-xdist is not available')
+    def test_class_scoped_components_grouped(self):
+        output, lines = self.run_pytest(
+            '-n', '3', '-v', '-o', 'kt_testing_xdist_grouping=true')
+        self.assertIn('16 passed', output)
+        self.assertIn('grouping tests by fixture component scope', output)
+        workers = set(worker for worker, what in lines
+                      if what == 'setup TestShared')
+        self.assertEqual(len(workers), 1)
+        # Each worker session cleans up at start and finish.
+        all_workers = set(worker for worker, what in lines)
+        self.assertEqual(
+            len([1 for worker, what in lines if what == 'cleanup']),
+            16 * 2 + 2 * len(all_workers))
+
+    @unittest.skipIf(xdist is None, 'pytest-xdist is not available')
+    def test_distribution_unchanged_by_default(self):
+        output, lines = self.run_pytest('-n', '3', '-v')
+        self.assertIn('16 passed', output)
+        self.assertNotIn('grouping tests', output)
+
+    def test_cases_reported_separately(self):
+        with open(os.path.join(self.tmpdir, 'test_parameters.py'), 'w') as f:
+            f.write(PARAMETERS)
+        output, lines = self.run_pytest(
+            '-vv', 'test_parameters.py', returncode=1)
+        self.assertIn('2 failed, 2 passed', output)
+        for case, outcome in [('case1', 'PASSED'), ('case2', 'FAILED'),
+                              ('case3', 'PASSED'), ('case4', 'FAILED')]:
+            self.assertIn('test_parameters.py::TestCases::test_odd[%s] %s'
+                          % (case, outcome), output)
+
+        # Cases can be selected by id.
+        output, lines = self.run_pytest(
+            'test_parameters.py::TestCases::test_odd[case3]')
+        self.assertIn('1 passed', output)
+
+    def test_component_scope(self):
+
+        class ClassScoped(object):
+            scope = 'class'
+
+        class ModuleScoped(object):
+            scope = 'module'
+
+        scope = kt.testing.pytest_plugin.component_scope
+        self.assertIsNone(scope([]))
+        self.assertIsNone(scope([object]))
+        self.assertEqual(scope([object, ClassScoped]), 'class')
+        self.assertEqual(scope([ClassScoped, ModuleScoped]), 'module')
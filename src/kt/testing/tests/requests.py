@@ -8,6 +8,9 @@ from __future__ import absolute_import
 import errno
 import os
 import socket
+import subprocess
+import sys
+import time
 import unittest
 
 import requests
@@ -15,6 +18,8 @@ import requests.api
 import urllib3.exceptions
 
 import kt.testing
+import kt.testing.cleanup
+import kt.testing.clock
 import kt.testing.requests
 import kt.testing.tests
 
@@ -32,6 +37,51 @@ class EmptyTC(kt.testing.TestCase):
         """Just a dummy."""
 
 
+HEALTH = kt.testing.requests.ResponseTemplate(
+    body='{"healthy": true}', content_type='application/json')
+
+
+class ClockTC(kt.testing.TestCase):
+    """Empty test case with a virtual clock used by the fixture."""
+
+    clock = kt.testing.compose(kt.testing.clock.Clock, start=0.0)
+    fixture = kt.testing.compose(kt.testing.requests.Requests, clock=clock)
+
+    def testit(self):
+        """Just a dummy."""
+
+
+# Number of times baseline() has been called.
+compiled = []
+
+
+def baseline(fixture):
+    compiled.append(fixture)
+    fixture.add_response('post', 'http://auth.example.com/token',
+                         body='token')
+    fixture.add_response('get', 'http://api.example.com/config', body='{}')
+    fixture.add_response('get', 'http://api.example.com/health',
+                         template='health')
+
+
+class BaselineTC(kt.testing.TestCase):
+
+    fixture = kt.testing.compose(
+        kt.testing.requests.Requests, baseline=baseline,
+        templates={'health': HEALTH})
+
+    def test_auth(self):
+        r = requests.post('http://auth.example.com/token')
+        self.assertEqual(r.text, 'token')
+
+    def test_config_twice(self):
+        self.fixture.add_response(
+            'get', 'http://api.example.com/config', body='mine')
+        r1 = requests.get('http://api.example.com/config')
+        r2 = requests.get('http://api.example.com/config')
+        self.assertEqual((r1.text, r2.text), ('{}', 'mine'))
+
+
 class TestRequestsMethods(kt.testing.tests.Core, unittest.TestCase):
 
     api = requests
@@ -539,6 +589,105 @@ class TestRequestsDerivedSessionMethods(TestRequestsMethods):
         super(TestRequestsDerivedSessionMethods, self).setUp()
 
 
+class InstalledHelpers(object):
+
+    def setUp(self):
+        kt.testing.requests.install()
+        self.addCleanup(kt.testing.requests.uninstall)
+        super(InstalledHelpers, self).setUp()
+
+
+class TestInstalledRequestsMethods(InstalledHelpers, TestRequestsMethods):
+    """Fixtures work the same way when requests is intercepted once."""
+
+
+class TestInstalledRequestsSessionMethods(InstalledHelpers,
+                                          TestRequestsSessionMethods):
+    """Fixtures work the same way when requests is intercepted once."""
+
+
+class TestInstalledRequestsDerivedSessionMethods(
+        InstalledHelpers, TestRequestsDerivedSessionMethods):
+    """Fixtures work the same way when requests is intercepted once."""
+
+
+class TestInstall(InstalledHelpers, kt.testing.tests.Core,
+                  unittest.TestCase):
+
+    def setUp(self):
+        self.original = requests.sessions.Session.__dict__['request']
+        super(TestInstall, self).setUp()
+
+    def test_patched_once(self):
+        installed = requests.sessions.Session.__dict__['request']
+        self.assertIsNot(installed, self.original)
+
+        tc, = self.loader.makeTest(EmptyTC)
+        tc.setUp()
+        # Setting up a fixture doesn't patch anything.
+        self.assertIs(requests.sessions.Session.__dict__['request'],
+                      installed)
+        self.assertIs(kt.testing.requests._active, tc.fixture)
+        tc.fixture.add_response('get', 'http://www.keepertech.com/')
+        requests.get('http://www.keepertech.com/')
+        tc.tearDown()
+        tc.doCleanups()
+        self.assertIsNone(kt.testing.requests._active)
+
+        kt.testing.requests.uninstall()
+        self.assertIs(requests.sessions.Session.__dict__['request'],
+                      self.original)
+
+    def test_request_without_fixture(self):
+        with self.assertRaises(AssertionError) as cm:
+            requests.get('http://www.keepertech.com/')
+        self.assertEqual(
+            str(cm.exception),
+            'request without an active fixture:'
+            ' GET http://www.keepertech.com/')
+
+    def test_nested_fixtures(self):
+        outer, = self.loader.makeTest(EmptyTC)
+        inner, = self.loader.makeTest(EmptyTC)
+        outer.setUp()
+        inner.setUp()
+        inner.fixture.add_response('get', 'http://www.keepertech.com/')
+        requests.get('http://www.keepertech.com/')
+        inner.doCleanups()
+        # Setting up the inner test ran the global cleanups, so the
+        # outer fixture isn't active any more.
+        self.assertIsNone(kt.testing.requests._active)
+        outer.doCleanups()
+        self.assertEqual(len(inner.fixture.requests), 1)
+        self.assertEqual(len(outer.fixture.requests), 0)
+
+    def test_deactivated_by_global_cleanup(self):
+        tc, = self.loader.makeTest(EmptyTC)
+        tc.setUp()
+        self.addCleanup(tc.doCleanups)
+        self.assertIs(kt.testing.requests._active, tc.fixture)
+        # As if the test was interrupted before its cleanups ran.
+        kt.testing.cleanup.cleanup()
+        self.assertIsNone(kt.testing.requests._active)
+        with self.assertRaises(AssertionError):
+            requests.get('http://www.keepertech.com/')
+
+    def test_uninstall_removes_global_cleanup(self):
+        registered = len(kt.testing.cleanup._registry)
+        kt.testing.requests.uninstall()
+        self.assertEqual(len(kt.testing.cleanup._registry), registered - 1)
+
+    def test_install_twice(self):
+        installed = requests.sessions.Session.__dict__['request']
+        kt.testing.requests.install()
+        self.assertIs(requests.sessions.Session.__dict__['request'],
+                      installed)
+        kt.testing.requests.uninstall()
+        kt.testing.requests.uninstall()
+        self.assertIs(requests.sessions.Session.__dict__['request'],
+                      self.original)
+
+
 class TestWithoutInvokingRequests(kt.testing.tests.Core, unittest.TestCase):
 
     # These tests don't cause any of the mocked APIs in requests to be
@@ -600,3 +749,552 @@ class TestWithoutInvokingRequests(kt.testing.tests.Core, unittest.TestCase):
             ("RequestInfo('get', 'http://localhost/path',"
              " <kt.testing.requests.Response 200>, (), {})"
              ))
+
+
+class TestFaultInjection(kt.testing.tests.Core, unittest.TestCase):
+
+    def setUp(self):
+        super(TestFaultInjection, self).setUp()
+        self.tc, = self.loader.makeTest(EmptyTC)
+        self.tc.setUp()
+        self.addCleanup(self.tc.tearDown)
+        self.fixture = self.tc.fixture
+
+    def add_responses(self, count, url='http://www.keepertech.com/api'):
+        for i in range(count):
+            self.fixture.add_response('get', url, body=str(i))
+
+    def outcomes(self, count, url='http://www.keepertech.com/api',
+                 **kwargs):
+        outcomes = []
+        for i in range(count):
+            try:
+                r = requests.get(url, **kwargs)
+            except requests.exceptions.Timeout:
+                outcomes.append('timeout')
+            else:
+                outcomes.append(r.status_code)
+        return outcomes
+
+    def test_fault_rates_reproducible(self):
+        timeouts = self.fixture.add_fault(
+            'get', 'http://www.keepertech.com', 0.05,
+            exception=kt.testing.requests.read_timeout)
+        unavailable = self.fixture.add_fault(
+            'get', 'http://www.keepertech.com', 0.01, status=503)
+        self.add_responses(1000)
+
+        outcomes = self.outcomes(1000)
+
+        # Served responses are consumed normally; faults are not.
+        self.assertEqual(outcomes.count(200), len(self.fixture.requests)
+                         - timeouts.injected - unavailable.injected)
+        self.assertEqual(timeouts.calls, 1000)
+        self.assertEqual(timeouts.injected, outcomes.count('timeout'))
+        self.assertEqual(unavailable.calls, 1000 - timeouts.injected)
+        self.assertEqual(unavailable.injected, outcomes.count(503))
+        self.assertTrue(30 < timeouts.injected < 70)
+        self.assertTrue(2 < unavailable.injected < 20)
+        # Drain what's left so teardown is happy.
+        self.fixture.responses.clear()
+
+        # The same seed produces the same sequence in another test.
+        tc, = self.loader.makeTest(EmptyTC)
+        tc.setUp()
+        try:
+            tc.fixture.add_fault(
+                'get', 'http://www.keepertech.com', 0.05,
+                exception=kt.testing.requests.read_timeout)
+            tc.fixture.add_fault(
+                'get', 'http://www.keepertech.com', 0.01, status=503)
+            self.fixture = tc.fixture
+            self.add_responses(1000)
+            self.assertEqual(self.outcomes(1000), outcomes)
+            tc.fixture.responses.clear()
+        finally:
+            tc.tearDown()
+
+    def test_fault_rule_matching(self):
+        rule = self.fixture.add_fault(
+            None, 'http://www.keepertech.com/api', 1.0, status=503)
+        self.fixture.add_response('get', 'http://www.keepertech.com/')
+        self.fixture.add_response('get', 'http://www.keepertech.com/apis')
+
+        r = requests.get('http://www.keepertech.com/api/v1')
+        self.assertEqual(r.status_code, 503)
+        r = requests.post('http://www.keepertech.com/api')
+        self.assertEqual(r.status_code, 503)
+        r = requests.get('http://www.keepertech.com/')
+        self.assertEqual(r.status_code, 200)
+        r = requests.get('http://www.keepertech.com/apis')
+        self.assertEqual(r.status_code, 200)
+
+        self.assertEqual(rule.calls, 2)
+        self.assertEqual(rule.injected, 2)
+        self.assertEqual(
+            repr(rule),
+            '<FaultRule * http://www.keepertech.com/api p=1.0'
+            ' calls=2 injected=2>')
+
+    def test_fault_filter(self):
+        rule = self.fixture.add_fault(
+            'post', 'http://www.keepertech.com/', 1.0,
+            exception=socket.gaierror('unknown name'),
+            filter=lambda *args, **kwargs: kwargs.get('data') == 'bad')
+        self.fixture.add_response('post', 'http://www.keepertech.com/')
+
+        for i in range(2):
+            with self.assertRaises(socket.gaierror):
+                requests.post('http://www.keepertech.com/', data='bad')
+        r = requests.post('http://www.keepertech.com/', data='good')
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(rule.calls, 2)
+        self.assertEqual(rule.injected, 2)
+
+    def test_latency(self):
+        rule = self.fixture.add_fault(
+            'get', 'http://www.keepertech.com', 1.0, latency=2.0)
+        self.add_responses(3)
+
+        r = requests.get('http://www.keepertech.com/api')
+        self.assertEqual(r.elapsed.total_seconds(), 2.0)
+        r = requests.get('http://www.keepertech.com/api', timeout=5)
+        self.assertEqual(r.elapsed.total_seconds(), 2.0)
+        with self.assertRaises(requests.exceptions.Timeout) as cm:
+            requests.get('http://www.keepertech.com/api', timeout=(10, 1.5))
+        self.assertIsInstance(cm.exception.args[0],
+                              urllib3.exceptions.ReadTimeoutError)
+        self.assertEqual(rule.injected, 3)
+
+    def test_latency_with_urllib3_timeout(self):
+        self.add_responses(1)
+        timeout = urllib3.Timeout(connect=1, read=2)
+        r = requests.get('http://www.keepertech.com/api', timeout=timeout)
+        self.assertEqual(r.status_code, 200)
+
+        self.fixture.add_fault(
+            'get', 'http://www.keepertech.com', 1.0, latency=3.0)
+        self.add_responses(2)
+        r = requests.get('http://www.keepertech.com/api',
+                         timeout=urllib3.Timeout(total=5))
+        self.assertEqual(r.elapsed.total_seconds(), 3.0)
+        with self.assertRaises(requests.exceptions.Timeout):
+            requests.get('http://www.keepertech.com/api', timeout=timeout)
+
+    def test_invalid_faults(self):
+        url = 'http://www.keepertech.com/'
+        with self.assertRaises(ValueError):
+            self.fixture.add_fault('get', url, 1.5, status=503)
+        with self.assertRaises(ValueError):
+            self.fixture.add_fault('get', url, 0.5)
+        with self.assertRaises(ValueError):
+            self.fixture.add_fault('get', url, 0.5, status=503, latency=1)
+        with self.assertRaises(ValueError):
+            self.fixture.add_fault('get', url, 0.5, status=204, body='oops')
+        self.assertEqual(self.fixture.faults, [])
+
+
+class TestRateLimits(kt.testing.tests.Core, unittest.TestCase):
+
+    def setUp(self):
+        super(TestRateLimits, self).setUp()
+        self.tc, = self.loader.makeTest(ClockTC)
+        self.tc.setUp()
+        self.addCleanup(self.tc.doCleanups)
+        self.addCleanup(self.tc.tearDown)
+        self.fixture = self.tc.fixture
+        self.clock = self.tc.clock
+
+    def get(self, count, url='http://api.example.com/items'):
+        statuses = []
+        for i in range(count):
+            self.fixture.add_response('get', url)
+            r = requests.get(url)
+            statuses.append(r.status_code)
+            if r.status_code != 200:
+                # Throttled requests don't consume responses.
+                self.fixture.responses.clear()
+        return statuses
+
+    def test_burst_then_throttled(self):
+        rule = self.fixture.add_rate_limit(
+            None, 'http://api.example.com', 10)
+        self.assertEqual(rule.burst, 10)
+        self.assertEqual(self.get(12), [200] * 10 + [429] * 2)
+        self.assertEqual((rule.calls, rule.allowed, rule.throttled),
+                         (12, 10, 2))
+        r = self.fixture.requests[-1].response
+        self.assertEqual(r.headers['Retry-After'], '1')
+        self.assertEqual(
+            repr(rule), '<RateLimitRule * http://api.example.com'
+                        ' rate=10 calls=12 throttled=2>')
+
+        # Tokens are refilled as the clock advances.
+        self.clock.advance(0.25)
+        self.assertEqual(self.get(3), [200, 200, 429])
+        self.clock.advance(10)
+        self.assertEqual(self.get(11), [200] * 10 + [429])
+
+    def test_paced_client_not_throttled(self):
+        rule = self.fixture.add_rate_limit(
+            'get', 'http://api.example.com/items', 2, burst=1, status=503,
+            headers={'X-Reason': 'busy'})
+        for i in range(20):
+            self.assertEqual(self.get(1), [200])
+            time.sleep(0.5)
+        self.assertEqual(rule.throttled, 0)
+        self.assertEqual(self.get(2), [200, 503])
+        r = self.fixture.requests[-1].response
+        self.assertEqual(r.headers['X-Reason'], 'busy')
+        # Other methods and URLs aren't limited.
+        self.fixture.add_response('post', 'http://api.example.com/items')
+        self.fixture.add_response('get', 'http://api.example.com/other')
+        requests.post('http://api.example.com/items')
+        requests.get('http://api.example.com/other')
+        self.assertEqual(rule.calls, 22)
+
+    def test_retry_after(self):
+        rule = self.fixture.add_rate_limit(
+            'get', 'http://api.example.com', 0.1, burst=1)
+        self.assertEqual(self.get(2), [200, 429])
+        self.assertEqual(
+            self.fixture.requests[-1].response.headers['Retry-After'], '10')
+        self.clock.advance(9)
+        self.assertEqual(self.get(1), [429])
+        self.assertEqual(
+            self.fixture.requests[-1].response.headers['Retry-After'], '1')
+        self.clock.advance(1)
+        self.assertEqual(self.get(1), [200])
+        self.assertEqual(rule.throttled, 2)
+
+    def test_throttled_before_faults(self):
+        self.fixture.add_rate_limit('get', 'http://api.example.com', 1)
+        fault = self.fixture.add_fault(
+            'get', 'http://api.example.com', 1.0, status=500)
+        self.assertEqual(self.get(2), [500, 429])
+        self.assertEqual(fault.calls, 1)
+
+    def test_invalid_rate_limits(self):
+        with self.assertRaises(ValueError):
+            self.fixture.add_rate_limit('get', 'http://api.example.com', 0)
+        with self.assertRaises(ValueError):
+            self.fixture.add_rate_limit(
+                'get', 'http://api.example.com', 1, burst=0)
+
+
+class TestBodyFactories(kt.testing.tests.Core, unittest.TestCase):
+
+    def setUp(self):
+        super(TestBodyFactories, self).setUp()
+        self.tc, = self.loader.makeTest(EmptyTC)
+        self.tc.setUp()
+        self.addCleanup(self.tc.tearDown)
+        self.fixture = self.tc.fixture
+
+    def test_factory_called_on_use(self):
+        calls = []
+
+        def factory(request):
+            calls.append(request)
+            return '{"echo": %s}' % request.body
+
+        self.fixture.add_response(
+            'post', 'http://www.keepertech.com/', body=factory,
+            headers={'Content-Type': 'application/json'})
+        self.fixture.add_response(
+            'post', 'http://www.keepertech.com/', body=factory,
+            filter=lambda *args, **kwargs: False)
+        self.assertEqual(calls, [])
+
+        r = requests.post('http://www.keepertech.com/', data='42')
+        self.assertEqual(r.json(), {'echo': 42})
+        self.assertEqual(r.headers['content-type'], 'application/json')
+        self.assertEqual(r.headers['content-length'], '12')
+
+        # The filtered response was never rendered.
+        req, = calls
+        self.assertEqual(req.method, 'post')
+        self.assertEqual(req.url, 'http://www.keepertech.com/')
+        self.assertIsNone(req.response)
+        self.assertEqual(req.body, '42')
+        self.fixture.responses.clear()
+
+    def test_headers_copied_when_added(self):
+        headers = {'X-Version': '1'}
+        self.fixture.add_response('get', 'http://www.keepertech.com/',
+                                  headers=headers)
+        headers['X-Version'] = '2'
+        r = requests.get('http://www.keepertech.com/')
+        self.assertEqual(r.headers['x-version'], '1')
+
+    def test_factory_not_allowed_for_empty_status(self):
+        with self.assertRaises(ValueError):
+            self.fixture.add_response(
+                'get', 'http://www.keepertech.com/', status=204,
+                body=lambda request: '')
+
+    def test_memoized_body(self):
+        calls = []
+
+        def render(request):
+            calls.append(request.url)
+            return 'rendered %s' % request.url
+
+        body = kt.testing.requests.MemoizedBody(render)
+        keyed = kt.testing.requests.MemoizedBody(
+            render, key=lambda request: request.url)
+
+        for url in ('http://www.keepertech.com/a',
+                    'http://www.keepertech.com/b'):
+            self.fixture.add_response('get', url, body=body)
+            self.fixture.add_response('get', url, body=keyed)
+            self.fixture.add_response('get', url, body=keyed)
+
+        texts = [requests.get(url).text
+                 for url in ('http://www.keepertech.com/a',
+                             'http://www.keepertech.com/a',
+                             'http://www.keepertech.com/a',
+                             'http://www.keepertech.com/b',
+                             'http://www.keepertech.com/b',
+                             'http://www.keepertech.com/b')]
+        self.assertEqual(texts, [
+            'rendered http://www.keepertech.com/a',
+            'rendered http://www.keepertech.com/a',
+            'rendered http://www.keepertech.com/a',
+            'rendered http://www.keepertech.com/a',
+            'rendered http://www.keepertech.com/b',
+            'rendered http://www.keepertech.com/b',
+        ])
+        self.assertEqual(calls, ['http://www.keepertech.com/a',
+                                 'http://www.keepertech.com/a',
+                                 'http://www.keepertech.com/b'])
+
+        keyed.clear()
+        self.assertEqual(keyed.cache, {})
+        self.assertEqual(len(body.cache), 1)
+
+
+class TestResponseTemplates(kt.testing.tests.Core, unittest.TestCase):
+
+    def test_template_attributes(self):
+        self.assertEqual(HEALTH.status, 200)
+        self.assertEqual(HEALTH.text, '{"healthy": true}')
+        self.assertEqual(HEALTH.content, b'{"healthy": true}')
+        self.assertEqual(HEALTH.headers['content-type'], 'application/json')
+        self.assertEqual(HEALTH.headers['content-length'], '17')
+        self.assertEqual(repr(HEALTH),
+                         '<kt.testing.requests.ResponseTemplate 200>')
+
+        with self.assertRaises(AttributeError):
+            HEALTH.status = 500
+        # Changing a copy of the headers doesn't change the template.
+        HEALTH.headers['content-type'] = 'text/plain'
+        self.assertEqual(HEALTH.headers['content-type'], 'application/json')
+
+    def test_template_hashable(self):
+        same = kt.testing.requests.ResponseTemplate(
+            200, '{"healthy": true}',
+            headers={'content-type': 'application/json'})
+        other = kt.testing.requests.ResponseTemplate(204)
+        self.assertEqual(same, HEALTH)
+        self.assertEqual(hash(same), hash(HEALTH))
+        self.assertNotEqual(other, HEALTH)
+        self.assertEqual(len({HEALTH, same, other}), 2)
+
+    def test_template_empty_body_required(self):
+        with self.assertRaises(ValueError):
+            kt.testing.requests.ResponseTemplate(204, 'not empty')
+
+    def test_templates_by_name_and_value(self):
+
+        class TC(kt.testing.TestCase):
+
+            fixture = kt.testing.compose(
+                kt.testing.requests.Requests,
+                templates={'health': HEALTH})
+
+            def setUp(inst):
+                super(TC, inst).setUp()
+                inst.fixture.add_response(
+                    'get', 'http://www.keepertech.com/health',
+                    template='health')
+                inst.fixture.add_response(
+                    'get', 'http://www.keepertech.com/health',
+                    template=HEALTH)
+
+            def testit(inst):
+                r1 = requests.get('http://www.keepertech.com/health')
+                r2 = requests.get('http://www.keepertech.com/health')
+                inst.responses = r1, r2
+                r2.headers['X-Changed'] = 'yes'
+
+        tc, = self.loader.makeTest(TC)
+        result = self.run_one_case(tc)
+        self.assertEqual(result.errors + result.failures, [])
+
+        r1, r2 = tc.responses
+        self.assertIsNot(r1, r2)
+        self.assertIs(r1.template, HEALTH)
+        self.assertEqual(r1.status_code, 200)
+        self.assertEqual(r1.json(), {'healthy': True})
+        self.assertEqual(r1.content, b'{"healthy": true}')
+        self.assertEqual(list(r1.iter_content(8)),
+                         ['{"health', 'y": true', '}'])
+        self.assertNotIn('X-Changed', r1.headers)
+        self.assertNotIn('X-Changed', HEALTH.headers)
+
+    def test_template_excludes_other_arguments(self):
+        tc, = self.loader.makeTest(EmptyTC)
+        tc.setUp()
+        try:
+            with self.assertRaises(ValueError):
+                tc.fixture.add_response(
+                    'get', 'http://www.keepertech.com/', status=201,
+                    template=HEALTH)
+            with self.assertRaises(KeyError):
+                tc.fixture.add_response(
+                    'get', 'http://www.keepertech.com/', template='health')
+        finally:
+            tc.tearDown()
+
+
+class TestBaseline(kt.testing.tests.Core, unittest.TestCase):
+
+    def setUp(self):
+        super(TestBaseline, self).setUp()
+        # Baselines may have been compiled by running the test class on
+        # its own.
+        kt.testing.requests._baselines.pop(BaselineTC, None)
+        del compiled[:]
+        self.addCleanup(compiled.__delitem__, slice(None))
+
+    def test_shared_by_tests(self):
+        auth, config = self.loader.makeTest(BaselineTC)
+        again, unused = self.loader.makeTest(BaselineTC)
+        for tc in auth, again, config:
+            result = self.run_one_case(tc)
+            self.assertEqual(result.errors + result.failures, [])
+        self.assertEqual(len(compiled), 1)
+
+    def test_added_responses_must_be_consumed(self):
+        tc, config = self.loader.makeTest(BaselineTC)
+        tc.setUp()
+        self.addCleanup(tc.doCleanups)
+        tc.fixture.add_response('get', 'http://api.example.com/x')
+        with self.assertRaises(AssertionError) as cm:
+            tc.fixture.teardown()
+        self.assertEqual(str(cm.exception),
+                         'configured responses not consumed')
+        tc.fixture.responses.clear()
+
+    def test_baseline_not_modified(self):
+        tc, config = self.loader.makeTest(BaselineTC)
+        tc.setUp()
+        self.addCleanup(tc.doCleanups)
+        responses = tc.fixture.responses
+        baseline = dict(responses.baseline)
+        key = 'GET', 'http://api.example.com/config'
+
+        self.assertEqual(len(responses), 3)
+        self.assertIn(key, responses)
+        del responses[key]
+        self.assertNotIn(key, responses)
+        self.assertEqual(len(responses), 2)
+        responses['GET', 'http://api.example.com/new'] = []
+        self.assertEqual(sorted(url for method, url in responses),
+                         ['http://api.example.com/health',
+                          'http://api.example.com/new',
+                          'http://auth.example.com/token'])
+        responses['GET', 'http://api.example.com/health'].pop()
+        responses.clear()
+        self.assertEqual(len(responses), 0)
+        self.assertEqual(responses.baseline, baseline)
+        self.assertEqual(len(baseline[key]), 1)
+
+    def test_faults_not_allowed(self):
+
+        def baseline(fixture):
+            fixture.add_fault('get', 'http://api.example.com/', 0.5,
+                              status=503)
+
+        class TC(kt.testing.TestCase):
+
+            fixture = kt.testing.compose(
+                kt.testing.requests.Requests, baseline=baseline)
+
+            def testit(self):
+                """Just a dummy."""
+
+        tc, = self.loader.makeTest(TC)
+        with self.assertRaises(ValueError):
+            tc.setUp()
+        tc.doCleanups()
+
+
+@unittest.skipIf(sys.version_info < (3, 7), '-X importtime not available')
+class TestImportCost(unittest.TestCase):
+    """Importing the harness shouldn't import what it fakes out.
+
+    Test processes are often short-lived, so anything imported but not
+    used by a test run is wasted.
+
+    """
+
+    DEFERRED = 'requests', 'urllib3', 'json', 'unittest.mock', 'mock'
+
+    def imported_by(self, module):
+        """Return cumulative import times for `module` and what it imports."""
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.pathsep.join(
+            [os.path.dirname(os.path.dirname(os.path.dirname(
+                os.path.abspath(kt.testing.__file__))))]
+            + [p for p in [env.get('PYTHONPATH')] if p])
+        proc = subprocess.Popen(
+            [sys.executable, '-X', 'importtime', '-c', 'import ' + module],
+            env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        stdout, stderr = proc.communicate()
+        stderr = stderr.decode('utf-8')
+        self.assertEqual(proc.returncode, 0, stderr)
+        # Nested imports are reported before the top-level import that
+        # caused them, so anything imported during site initialization
+        # is discarded when the next top-level import is seen.
+        timings = {}
+        for line in stderr.splitlines():
+            if not line.startswith('import time:'):
+                continue
+            self_us, cumulative, name = line[12:].split('|')
+            if not cumulative.strip().isdigit():
+                continue
+            timings[name.strip()] = int(cumulative)
+            if not name[1:].startswith(' '):
+                # Top-level import.
+                if name.strip() == module:
+                    break
+                timings = {}
+        return timings
+
+    def check_deferred(self, module):
+        timings = self.imported_by(module)
+        self.assertIn(module, timings)
+        eager = sorted(name for name in timings
+                       if name.split('.')[0] in self.DEFERRED
+                       or name in self.DEFERRED)
+        self.assertEqual(
+            eager, [], '%s imported in %d us'
+            % (module, timings[module]))
+
+    def test_import_kt_testing(self):
+        self.check_deferred('kt.testing')
+
+    def test_import_kt_testing_requests(self):
+        self.check_deferred('kt.testing.requests')
+
+    def test_exceptions_still_available(self):
+        # Deferred imports happen when the exceptions are constructed.
+        url = 'http://www.keepertech.com/'
+        self.assertIsInstance(kt.testing.requests.connect_timeout(url),
+                              requests.exceptions.Timeout)
+        self.assertIsInstance(kt.testing.requests.read_timeout(url),
+                              requests.exceptions.Timeout)
+        self.assertIsInstance(kt.testing.requests.unreachable_host(url),
+                              requests.exceptions.ConnectionError)
@@ -0,0 +1,643 @@
+"""\
+Tests for kt.testing.runner.
+
+"""
+
+import os
+import shutil
+import signal
+import sys
+import tempfile
+import textwrap
+import time
+import unittest
+
+import kt.testing.runner
+
+
+SAMPLE = '''\
+import os
+import unittest
+
+import kt.testing
+import kt.testing.cleanup
+
+
+class Recorder(kt.testing.FixtureComponent):
+
+    def teardown(self):
+        if getattr(self.test, 'break_teardown', False):
+            raise AssertionError('teardown complaint')
+
+
+class Base(kt.testing.TestCase):
+
+    recorder = kt.testing.compose(Recorder)
+    class_setups = []
+
+    @classmethod
+    def setUpClass(cls):
+        super(Base, cls).setUpClass()
+        cls.class_setups.append(os.getpid())
+
+
+class TestOne(Base):
+
+    def test_pass(self):
+        pass
+
+    def test_fail(self):
+        """Fails on purpose."""
+        self.fail('expected failure')
+
+    def test_error(self):
+        raise ValueError('broken')
+
+    def test_teardown(self):
+        self.break_teardown = True
+
+
+class TestTwo(Base):
+
+    def test_skip(self):
+        self.skipTest('not today')
+
+    @unittest.expectedFailure
+    def test_expected(self):
+        self.fail('known')
+
+    def test_subtests(self):
+        for i in range(3):
+            with self.subTest(i=i):
+                self.assertNotEqual(i, 1)
+
+    def test_pid(self):
+        assert os.getpid() == self.class_setups[-1]
+
+
+class TestThree(Base):
+
+    def test_a(self):
+        pass
+
+    def test_b(self):
+        pass
+'''
+
+
+class SampleHelpers(object):
+
+    def setUp(self):
+        super(SampleHelpers, self).setUp()
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        with open(os.path.join(self.tmpdir, 'kt_runner_sample.py'), 'w') as f:
+            f.write(SAMPLE)
+        sys.path.insert(0, self.tmpdir)
+        self.addCleanup(sys.path.remove, self.tmpdir)
+        self.addCleanup(sys.modules.pop, 'kt_runner_sample', None)
+        self.suite = unittest.TestLoader().loadTestsFromName(
+            'kt_runner_sample')
+
+
+class TestRunner(SampleHelpers, unittest.TestCase):
+
+    def run_suite(self, jobs):
+        suite = kt.testing.runner.ParallelSuite(self.suite, jobs=jobs)
+        self.assertEqual(suite.countTestCases(), 10)
+        result = unittest.TestResult()
+        suite.run(result)
+        return result
+
+    def check_result(self, result):
+        self.assertEqual(result.testsRun, 10)
+
+        failures = dict((t.id().rsplit('.', 1)[-1], tb)
+                        for t, tb in result.failures)
+        errors = dict((t.id().rsplit('.', 1)[-1], tb)
+                      for t, tb in result.errors)
+        self.assertEqual(sorted(errors), ['test_error'])
+        self.assertIn('ValueError: broken', errors['test_error'])
+        self.assertIn('raised in worker process:', errors['test_error'])
+        # Teardown-time failures from fixture components are kept.
+        self.assertEqual(sorted(failures),
+                         ['test_fail', 'test_subtests (i=1)',
+                          'test_teardown'])
+        self.assertIn('teardown complaint', failures['test_teardown'])
+        self.assertIn('expected failure', failures['test_fail'])
+
+        (skipped, reason), = result.skipped
+        self.assertEqual(reason, 'not today')
+        self.assertEqual(len(result.expectedFailures), 1)
+        self.assertEqual(result.unexpectedSuccesses, [])
+
+    def test_parallel(self):
+        self.check_result(self.run_suite(jobs=3))
+
+    def test_single_process(self):
+        self.check_result(self.run_suite(jobs=1))
+
+    def test_local_tests(self):
+
+        class Local(unittest.TestCase):
+
+            def test_it(self):
+                self.ran = True
+
+        test = Local('test_it')
+        suite = kt.testing.runner.ParallelSuite([test], jobs=2)
+        result = unittest.TestResult()
+        suite.run(result)
+        self.assertEqual(result.testsRun, 1)
+        self.assertTrue(test.ran)
+
+    def test_tests_not_created_by_name_run_locally(self):
+        path = os.path.join(self.tmpdir, 'kt_runner_broken.py')
+        with open(path, 'w') as f:
+            f.write('import kt_runner_no_such_module\n')
+        self.addCleanup(sys.modules.pop, 'kt_runner_broken', None)
+        ran = []
+        suite = unittest.TestLoader().discover(
+            self.tmpdir, pattern='kt_runner_*.py')
+        suite.addTest(unittest.FunctionTestCase(lambda: ran.append(1)))
+
+        for jobs in 1, 2:
+            result = unittest.TestResult()
+            parallel = kt.testing.runner.ParallelSuite(suite, jobs=jobs)
+            self.assertEqual(len(parallel.local), 2)
+            parallel.run(result)
+            self.assertEqual(result.testsRun, 12)
+            errors = [tb for test, tb in result.errors
+                      if 'kt_runner_broken' in test.id()]
+            self.assertEqual(len(errors), 1)
+            self.assertIn('kt_runner_no_such_module', errors[0])
+        self.assertEqual(ran, [1, 1])
+
+    def test_group_and_partition(self):
+        tests = list(kt.testing.runner.iter_tests(self.suite))
+        batches, local = kt.testing.runner.group_by_class(tests)
+        self.assertEqual(local, [])
+        self.assertEqual(
+            [(module, name, len(methods))
+             for module, name, methods in batches],
+            [('kt_runner_sample', 'TestOne', 4),
+             ('kt_runner_sample', 'TestThree', 2),
+             ('kt_runner_sample', 'TestTwo', 4)])
+
+        p1, p2 = kt.testing.runner.partition(
+            batches, 2, weight=lambda b: len(b[2]))
+        self.assertEqual([b[1] for b in p1], ['TestOne', 'TestThree'])
+        self.assertEqual([b[1] for b in p2], ['TestTwo'])
+
+    def test_main(self):
+        path = os.path.join(self.tmpdir, 'kt_runner_passing.py')
+        with open(path, 'w') as f:
+            f.write(textwrap.dedent('''\
+                import unittest
+
+                class TestPassing(unittest.TestCase):
+
+                    def test_it(self):
+                        pass
+                '''))
+        self.addCleanup(sys.modules.pop, 'kt_runner_passing', None)
+
+        stderr = sys.stderr
+        sys.stderr = open(os.devnull, 'w')
+        try:
+            rc = kt.testing.runner.main(
+                ['-j', '2', '-s', self.tmpdir, '-p', 'kt_runner_*.py'])
+            self.assertEqual(rc, 1)
+            rc = kt.testing.runner.main(['-j', '2', 'kt_runner_passing'])
+            self.assertEqual(rc, 0)
+        finally:
+            sys.stderr.close()
+            sys.stderr = stderr
+
+    def test_worker_crash(self):
+        path = os.path.join(self.tmpdir, 'kt_runner_crash.py')
+        with open(path, 'w') as f:
+            f.write(textwrap.dedent('''\
+                import os
+                import unittest
+
+                class TestCrash(unittest.TestCase):
+
+                    def test_it(self):
+                        os._exit(3)
+
+                class TestFine(unittest.TestCase):
+
+                    def test_it(self):
+                        pass
+                '''))
+        self.addCleanup(sys.modules.pop, 'kt_runner_crash', None)
+        suite = unittest.TestLoader().loadTestsFromName('kt_runner_crash')
+        result = unittest.TestResult()
+        kt.testing.runner.ParallelSuite(suite, jobs=2).run(result)
+
+        (holder, tb), = result.errors
+        self.assertEqual(holder.id(), 'worker 0')
+        self.assertIn('worker exited with code 3', tb)
+        self.assertEqual(result.failures, [])
+
+
+class TestSharding(SampleHelpers, unittest.TestCase):
+
+    def test_history_recorded(self):
+        path = os.path.join(self.tmpdir, 'timings.json')
+        history = kt.testing.runner.TimingHistory(path)
+        self.assertEqual(history.tests, {})
+        suite = kt.testing.runner.ParallelSuite(
+            self.suite, jobs=2, history=history)
+        suite.run(unittest.TestResult())
+
+        self.assertEqual(
+            sorted(history.classes),
+            ['kt_runner_sample.TestOne', 'kt_runner_sample.TestThree',
+             'kt_runner_sample.TestTwo'])
+        self.assertEqual(len(history.tests), 10)
+        self.assertIn('kt_runner_sample.TestOne.test_pass', history.tests)
+        history.save()
+
+        loaded = kt.testing.runner.TimingHistory(path)
+        self.assertEqual(loaded.tests, history.tests)
+        self.assertEqual(loaded.classes, history.classes)
+
+    def test_estimate(self):
+        history = kt.testing.runner.TimingHistory()
+        batch = 'mod', 'TestX', ['test_a', 'test_b', 'test_c']
+        # No history at all: one second per test.
+        self.assertEqual(history.estimate(batch), 3.0)
+
+        history.record_test('mod.TestX.test_a', 4.0)
+        history.record_test('other.TestY.test_z', 2.0)
+        # Unknown tests use the mean of the known tests.
+        self.assertEqual(history.estimate(batch), 4.0 + 3.0 + 3.0)
+
+        history.record_class('mod.TestX', 42.0)
+        self.assertEqual(history.estimate(batch), 42.0)
+
+    def shard_ids(self, count, history=None):
+        shards = []
+        for index in range(count):
+            suite = kt.testing.runner.ParallelSuite(
+                self.suite, jobs=1, history=history, shard=(count, index))
+            shards.append(sorted(
+                '%s.%s' % (name, method)
+                for module, name, methods in suite.batches
+                for method in methods))
+        return shards
+
+    def test_shards_without_history(self):
+        shards = self.shard_ids(2)
+        self.assertEqual(shards, self.shard_ids(2))
+        self.assertEqual(sorted(shards[0] + shards[1]), sorted(
+            t.id()[len('kt_runner_sample.'):]
+            for t in kt.testing.runner.iter_tests(self.suite)))
+        # Classes stay together: 4 + 2 tests, and 4 tests.
+        self.assertEqual(sorted(len(s) for s in shards), [4, 6])
+
+    def test_shards_balanced_by_history(self):
+        history = kt.testing.runner.TimingHistory()
+        history.record_class('kt_runner_sample.TestOne', 10.0)
+        history.record_class('kt_runner_sample.TestTwo', 6.0)
+        history.record_class('kt_runner_sample.TestThree', 5.0)
+        one, two = self.shard_ids(2, history)
+        self.assertEqual({n.split('.')[0] for n in one}, {'TestOne'})
+        self.assertEqual({n.split('.')[0] for n in two},
+                         {'TestTwo', 'TestThree'})
+
+    def test_shard_runs_subset(self):
+        suite = kt.testing.runner.ParallelSuite(
+            self.suite, jobs=2, shard=(2, 1))
+        result = unittest.TestResult()
+        suite.run(result)
+        self.assertEqual(result.testsRun, suite.countTestCases())
+        self.assertEqual(result.testsRun, 4)
+
+    def test_invalid_shard(self):
+        with self.assertRaises(ValueError):
+            kt.testing.runner.ParallelSuite(self.suite, shard=(2, 2))
+
+    def test_main_with_timings(self):
+        path = os.path.join(self.tmpdir, 'timings.json')
+        stderr = sys.stderr
+        sys.stderr = open(os.devnull, 'w')
+        try:
+            kt.testing.runner.main(
+                ['-j', '2', '--timings', path, 'kt_runner_sample'])
+        finally:
+            sys.stderr.close()
+            sys.stderr = stderr
+        history = kt.testing.runner.TimingHistory(path)
+        self.assertEqual(len(history.tests), 10)
+
+    def test_shards_share_timings(self):
+        path = os.path.join(self.tmpdir, 'timings.json')
+        history = kt.testing.runner.TimingHistory(path)
+        history.record_class('kt_runner_sample.TestOne', 10.0)
+        history.record_class('kt_runner_sample.TestTwo', 6.0)
+        history.record_class('kt_runner_sample.TestThree', 5.0)
+        history.save()
+        with open(path) as f:
+            shared = f.read()
+
+        saved = []
+        stderr = sys.stderr
+        sys.stderr = open(os.devnull, 'w')
+        try:
+            for index in range(2):
+                saved.append(os.path.join(self.tmpdir, 'shard%d.json'
+                                          % index))
+                kt.testing.runner.main(
+                    ['-j', '1', '--timings', path, '--shard-count', '2',
+                     '--shard-index', str(index), '--save-timings',
+                     saved[-1], 'kt_runner_sample'])
+                # Every shard computes its part from the same history.
+                with open(path) as f:
+                    self.assertEqual(f.read(), shared)
+            with self.assertRaises(SystemExit):
+                kt.testing.runner.main(['--merge-timings'] + saved)
+        finally:
+            sys.stderr.close()
+            sys.stderr = stderr
+
+        one = kt.testing.runner.TimingHistory(saved[0])
+        two = kt.testing.runner.TimingHistory(saved[1])
+        self.assertEqual(sorted(one.classes), ['kt_runner_sample.TestOne'])
+        self.assertEqual(len(one.tests) + len(two.tests), 10)
+
+        rc = kt.testing.runner.main(
+            ['--timings', path, '--merge-timings'] + saved)
+        self.assertEqual(rc, 0)
+        merged = kt.testing.runner.TimingHistory(path)
+        self.assertEqual(len(merged.tests), 10)
+        self.assertEqual(merged.classes['kt_runner_sample.TestOne'],
+                         one.classes['kt_runner_sample.TestOne'])
+
+
+HELPER = '''\
+import kt.testing
+
+import kt_runner_deep
+
+
+def compute(value):
+    return kt_runner_deep.double(value)
+
+
+class Component(kt.testing.FixtureComponent):
+    pass
+'''
+
+DEPENDENT = '''\
+import unittest
+
+import kt.testing
+
+import kt_runner_helper
+import kt_runner_unused
+
+
+class TestUsesHelper(unittest.TestCase):
+
+    def test_it(self):
+        self.assertEqual(kt_runner_helper.compute(2), 4)
+
+
+class TestComposes(kt.testing.TestCase):
+
+    component = kt.testing.compose(kt_runner_helper.Component)
+
+    def test_it(self):
+        pass
+
+
+class TestIndependent(unittest.TestCase):
+
+    def test_it(self):
+        pass
+
+
+class TestImportsLazily(unittest.TestCase):
+
+    def test_it(self):
+        import kt_runner_lazy
+        self.assertTrue(kt_runner_lazy.VALUE)
+'''
+
+ALPHA = '''\
+import unittest
+
+
+class TestAlpha(unittest.TestCase):
+
+    def test_it(self):
+        pass
+'''
+
+BETA = '''\
+import unittest
+
+import kt_runner_beta_helper
+
+
+class TestBeta(unittest.TestCase):
+
+    def test_it(self):
+        self.assertTrue(kt_runner_beta_helper.VALUE)
+'''
+
+
+DEEP = '''\
+from kt_runner_settings import FACTOR
+
+
+def double(value):
+    return value * FACTOR
+'''
+
+
+class TestChangedOnly(SampleHelpers, unittest.TestCase):
+
+    def setUp(self):
+        super(TestChangedOnly, self).setUp()
+        self.path = os.path.join(self.tmpdir, 'dependencies.json')
+
+    def write(self, name, text):
+        with open(os.path.join(self.tmpdir, name + '.py'), 'w') as f:
+            f.write(text)
+        self.addCleanup(sys.modules.pop, name, None)
+
+    def run_suite(self, suite, changed_only=True, jobs=2):
+        dependencies = kt.testing.runner.DependencyMap(
+            self.path, root=self.tmpdir)
+        suite = kt.testing.runner.ParallelSuite(
+            suite, jobs=jobs, dependencies=dependencies,
+            changed_only=changed_only)
+        result = unittest.TestResult()
+        suite.run(result)
+        dependencies.save()
+        return suite, result
+
+    def selected(self, suite):
+        return [name for module, name, methods in suite.batches]
+
+    def test_passing_classes_recorded(self):
+        suite, result = self.run_suite(self.suite, changed_only=False)
+        self.assertEqual(result.testsRun, 10)
+
+        # Classes with failures aren't recorded.
+        dependencies = kt.testing.runner.DependencyMap(
+            self.path, root=self.tmpdir)
+        self.assertEqual(list(dependencies.classes),
+                         ['kt_runner_sample.TestThree'])
+        recorded = dependencies.classes['kt_runner_sample.TestThree']
+        self.assertEqual(list(recorded['files']), ['kt_runner_sample.py'])
+        self.assertEqual(recorded['tests'], ['test_a', 'test_b'])
+
+        suite, result = self.run_suite(self.suite)
+        self.assertEqual(self.selected(suite), ['TestOne', 'TestTwo'])
+        self.assertEqual(result.testsRun, 8)
+
+        # Changing the module selects the class again.
+        with open(os.path.join(self.tmpdir, 'kt_runner_sample.py'), 'a') as f:
+            f.write('# changed\n')
+        suite, result = self.run_suite(self.suite)
+        self.assertEqual(self.selected(suite),
+                         ['TestOne', 'TestThree', 'TestTwo'])
+
+    def test_selected_by_files_used(self):
+        self.write('kt_runner_settings', 'FACTOR = 2\n')
+        self.write('kt_runner_deep', DEEP)
+        self.write('kt_runner_helper', HELPER)
+        self.write('kt_runner_unused', '')
+        self.write('kt_runner_lazy', 'VALUE = 1\n')
+        self.write('kt_runner_dependent', DEPENDENT)
+        tests = unittest.TestLoader().loadTestsFromName('kt_runner_dependent')
+
+        # A single process is recorded the same way as workers.
+        self.run_suite(tests, changed_only=False, jobs=1)
+        suite, result = self.run_suite(tests)
+        self.assertEqual(self.selected(suite), [])
+        self.assertEqual(result.testsRun, 0)
+
+        # Modules imported while a class runs are recorded for it, even
+        # if they were loaded already (as in the workers now).
+        for value in 2, 3:
+            self.write('kt_runner_lazy', 'VALUE = %d\n' % value)
+            suite, result = self.run_suite(tests)
+            self.assertEqual(self.selected(suite), ['TestImportsLazily'])
+        suite, result = self.run_suite(tests)
+        self.assertEqual(self.selected(suite), [])
+
+        # Modules imported by the module defining a class are recorded,
+        # even if they're not used.
+        self.write('kt_runner_unused', 'VALUE = 1\n')
+        suite, result = self.run_suite(tests)
+        self.assertEqual(self.selected(suite),
+                         ['TestComposes', 'TestImportsLazily',
+                          'TestIndependent', 'TestUsesHelper'])
+
+        # Modules not loaded aren't recorded.
+        self.write('kt_runner_other', 'VALUE = 1\n')
+        suite, result = self.run_suite(tests)
+        self.assertEqual(self.selected(suite), [])
+
+    def test_unrelated_class_skipped(self):
+        self.write('kt_runner_beta_helper', 'VALUE = 1\n')
+        self.write('kt_runner_alpha', ALPHA)
+        self.write('kt_runner_beta', BETA)
+        tests = unittest.TestLoader().loadTestsFromNames(
+            ['kt_runner_alpha', 'kt_runner_beta'])
+
+        # Both classes run in one process, so both modules are loaded
+        # when each of them runs.
+        self.run_suite(tests, changed_only=False, jobs=1)
+        self.write('kt_runner_beta_helper', 'VALUE = 2\n')
+        suite, result = self.run_suite(tests, jobs=1)
+        self.assertEqual(self.selected(suite), ['TestBeta'])
+        self.assertEqual(result.testsRun, 1)
+
+    def test_dotted_imports_recorded(self):
+        os.mkdir(os.path.join(self.tmpdir, 'kt_runner_package'))
+        self.write('kt_runner_package/__init__', '')
+        self.write('kt_runner_package/module', 'VALUE = 1\n')
+        for name in 'kt_runner_package', 'kt_runner_package.module':
+            self.addCleanup(sys.modules.pop, name, None)
+        self.write('kt_runner_alpha', 'import kt_runner_package.module\n'
+                   + ALPHA)
+        tests = unittest.TestLoader().loadTestsFromName('kt_runner_alpha')
+        self.run_suite(tests, changed_only=False, jobs=1)
+        self.write('kt_runner_package/module', 'VALUE = 2\n')
+        suite, result = self.run_suite(tests, jobs=1)
+        self.assertEqual(self.selected(suite), ['TestAlpha'])
+
+    def test_new_fixture_factory_selected(self):
+        self.write('kt_runner_settings', 'FACTOR = 2\n')
+        self.write('kt_runner_deep', DEEP)
+        self.write('kt_runner_helper', HELPER)
+        self.write('kt_runner_unused', '')
+        self.write('kt_runner_dependent', DEPENDENT)
+        suite = unittest.TestLoader().loadTestsFromName('kt_runner_dependent')
+        self.run_suite(suite, changed_only=False)
+
+        dependencies = kt.testing.runner.DependencyMap(
+            self.path, root=self.tmpdir)
+        batch = 'kt_runner_dependent', 'TestComposes', ['test_it']
+        self.assertFalse(dependencies.affected(batch))
+        # Forget the file, as if the factory was composed since.
+        del dependencies.classes['kt_runner_dependent.TestComposes'][
+            'files']['kt_runner_helper.py']
+        self.assertTrue(dependencies.affected(batch))
+        # Tests not recorded are always run.
+        self.assertTrue(dependencies.affected(
+            ('kt_runner_dependent', 'TestIndependent', ['test_new'])))
+
+    def test_changed_only_requires_dependencies(self):
+        with self.assertRaises(ValueError):
+            kt.testing.runner.ParallelSuite(self.suite, changed_only=True)
+
+    def test_main(self):
+        stderr = sys.stderr
+        sys.stderr = open(os.devnull, 'w')
+        try:
+            cwd = os.getcwd()
+            os.chdir(self.tmpdir)
+            try:
+                kt.testing.runner.main(
+                    ['-j', '2', '--dependencies', self.path,
+                     '--changed-only', 'kt_runner_sample'])
+            finally:
+                os.chdir(cwd)
+            with self.assertRaises(SystemExit):
+                kt.testing.runner.main(['--changed-only', 'kt_runner_sample'])
+        finally:
+            sys.stderr.close()
+            sys.stderr = stderr
+        dependencies = kt.testing.runner.DependencyMap(self.path)
+        self.assertEqual(list(dependencies.classes),
+                         ['kt_runner_sample.TestThree'])
+
+
+def busy():
+    return sum(range(1000))
+
+
+@unittest.skipIf(not hasattr(signal, 'setitimer'), 'sampling not available')
+class TestSampler(unittest.TestCase):
+
+    def test_running_code_sampled(self):
+        previous = signal.getsignal(signal.SIGPROF)
+        sampler = kt.testing.runner._Sampler()
+        sampler.start()
+        try:
+            deadline = time.time() + 10
+            while not sampler.files and time.time() < deadline:
+                busy()
+        finally:
+            sampler.stop()
+        self.assertIn(busy.__code__.co_filename, sampler.take())
+        self.assertEqual(sampler.take(), set())
+        self.assertEqual(signal.getsignal(signal.SIGPROF), previous)
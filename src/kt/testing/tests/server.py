@@ -0,0 +1,155 @@
+"""\
+Tests for kt.testing.server.
+
+"""
+
+from __future__ import absolute_import
+
+import socket
+import unittest
+
+from six.moves import http_client
+from six.moves import urllib
+
+import kt.testing
+import kt.testing.server
+import kt.testing.tests
+
+
+class TestLocalServer(kt.testing.tests.Core, unittest.TestCase):
+
+    def run_class(self, cls):
+        result = unittest.TestResult()
+        self.loader.loadTestsFromTestCase(cls).run(result)
+        _do_class_cleanups(cls)
+        return result
+
+    def test_urllib(self):
+
+        class TC(kt.testing.TestCase):
+
+            server = kt.testing.compose(kt.testing.server.LocalServer)
+
+            def test_get(self):
+                self.server.add_response(
+                    'get', self.server.url('/foo'), body='{"answer": 42}',
+                    headers={'Content-Type': 'application/json'})
+                f = urllib.request.urlopen(self.server.url('/foo'))
+                self.assertEqual(f.getcode(), 200)
+                self.assertEqual(f.read(), b'{"answer": 42}')
+                self.assertEqual(f.headers['Content-Type'],
+                                 'application/json')
+                req, = self.server.requests
+                self.assertEqual(req.method, 'get')
+                self.assertEqual(req.url, self.server.url('/foo'))
+
+            def test_post(self):
+                self.server.add_response(
+                    'post', self.server.url('/bar'), status=201,
+                    filter=lambda *a, **kw: kw['data'] == b'payload')
+                f = urllib.request.urlopen(self.server.url('/bar'),
+                                           data=b'payload')
+                self.assertEqual(f.getcode(), 201)
+                req, = self.server.requests
+                self.assertEqual(req.body, b'payload')
+
+        result = self.run_class(TC)
+        self.assertEqual(result.errors + result.failures, [])
+        self.assertEqual(result.testsRun, 2)
+        self.assertEqual(kt.testing.server._servers, {})
+
+    def test_server_shared_by_class_connections_reused(self):
+        ports = []
+
+        class TC(kt.testing.TestCase):
+
+            server = kt.testing.compose(kt.testing.server.LocalServer)
+
+            def test_one(self):
+                ports.append(self.server.port)
+                self.server.add_response('get', self.server.url('/a'))
+                self.server.add_response('get', self.server.url('/b'))
+                conn = http_client.HTTPConnection(
+                    '127.0.0.1', self.server.port)
+                try:
+                    for path in ('/a', '/b'):
+                        conn.request('GET', path)
+                        response = conn.getresponse()
+                        response.read()
+                        self.assertEqual(response.status, 200)
+                finally:
+                    conn.close()
+                self.assertEqual(self.server.connections, 1)
+
+            def test_two(self):
+                ports.append(self.server.port)
+                self.assertEqual(self.server.connections, 0)
+                self.assertEqual(self.server.requests, [])
+
+        result = self.run_class(TC)
+        self.assertEqual(result.errors + result.failures, [])
+        self.assertEqual(ports[0], ports[1])
+
+    def test_unexpected_request_fails_test(self):
+
+        class TC(kt.testing.TestCase):
+
+            server = kt.testing.compose(kt.testing.server.LocalServer)
+
+            def test_it(self):
+                conn = http_client.HTTPConnection(
+                    '127.0.0.1', self.server.port)
+                conn.request('GET', '/nope')
+                response = conn.getresponse()
+                self.body = response.read()
+                self.status = response.status
+                conn.close()
+
+        tc, = self.loader.makeTest(TC)
+        result = self.run_one_case(tc)
+        _do_class_cleanups(TC)
+        self.assertEqual(tc.status, 500)
+        self.assertIn(b'unexpected request: GET http://127.0.0.1', tc.body)
+        (t, tb), = result.failures + result.errors
+        self.assertIn('unexpected request: GET http://127.0.0.1:', tb)
+
+    def test_errors_drop_connection(self):
+
+        class TC(kt.testing.TestCase):
+
+            server = kt.testing.compose(kt.testing.server.LocalServer)
+
+            def test_it(self):
+                self.server.add_unreachable_host(
+                    'get', self.server.url('/gone'))
+                with self.assertRaises(
+                        (http_client.HTTPException, socket.error)):
+                    urllib.request.urlopen(self.server.url('/gone'))
+
+        result = self.run_class(TC)
+        self.assertEqual(result.errors + result.failures, [])
+
+    def test_latency_causes_socket_timeout(self):
+
+        class TC(kt.testing.TestCase):
+
+            server = kt.testing.compose(kt.testing.server.LocalServer)
+
+            def test_it(self):
+                self.server.add_fault(
+                    'get', self.server.base_url, 1.0, latency=0.5)
+                self.server.add_response('get', self.server.url('/slow'))
+                with self.assertRaises(socket.timeout):
+                    urllib.request.urlopen(self.server.url('/slow'),
+                                           timeout=0.1)
+
+        result = self.run_class(TC)
+        self.assertEqual(result.errors + result.failures, [])
+
+
+def _do_class_cleanups(cls):
+    # Class cleanups are new in Python 3.8; before that, servers are
+    # stopped when the process exits.
+    do_class_cleanups = getattr(cls, 'doClassCleanups', None)
+    if do_class_cleanups is not None:
+        do_class_cleanups()
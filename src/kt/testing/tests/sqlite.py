@@ -0,0 +1,135 @@
+"""\
+Tests for kt.testing.sqlite.
+
+"""
+
+from __future__ import absolute_import
+
+import sqlite3
+import unittest
+
+import kt.testing
+import kt.testing.sqlite
+import kt.testing.tests
+
+
+SCHEMA = '''
+    CREATE TABLE item (id INTEGER PRIMARY KEY, name TEXT NOT NULL);
+    INSERT INTO item (name) VALUES ('first');
+'''
+
+# Connections passed to build().
+builds = []
+
+
+def build(connection):
+    builds.append(connection)
+    connection.execute("INSERT INTO item (name) VALUES ('second')")
+
+
+class TC(kt.testing.TestCase):
+
+    db = kt.testing.compose(kt.testing.sqlite.SQLite,
+                            script=SCHEMA, build=build)
+
+    def test_one(self):
+        """Just a dummy."""
+
+    def test_two(self):
+        """Just a dummy."""
+
+
+class OtherTC(TC):
+    """Same database as TC, but a template of its own."""
+
+
+class AutocommitTC(kt.testing.TestCase):
+
+    db = kt.testing.compose(kt.testing.sqlite.SQLite, script=SCHEMA,
+                            connect={'isolation_level': None})
+
+    def test_it(self):
+        """Just a dummy."""
+
+
+class TestSQLite(kt.testing.tests.Core, unittest.TestCase):
+
+    def setUp(self):
+        super(TestSQLite, self).setUp()
+        # The test classes may have been run on their own already.
+        del builds[:]
+        self.addCleanup(builds.__delitem__, slice(None))
+        for cls in TC, OtherTC, AutocommitTC:
+            self.release_templates(cls)
+            self.addCleanup(self.release_templates, cls)
+
+    def release_templates(self, cls):
+        kt.testing.tests.release_class_resources(
+            cls, kt.testing.sqlite._templates, kt.testing.sqlite._close)
+
+    def set_up(self, tc):
+        tc.setUp()
+        self.addCleanup(tc.doCleanups)
+        return tc
+
+    def names(self, tc):
+        return [name for name, in tc.db.execute(
+            'SELECT name FROM item ORDER BY id')]
+
+    def test_built_once_per_class(self):
+        one, two = self.loader.makeTest(TC)
+        self.set_up(one)
+        self.assertEqual(self.names(one), ['first', 'second'])
+        one.db.execute("INSERT INTO item (name) VALUES ('changed')")
+        one.db.connection.commit()
+        one.doCleanups()
+
+        self.set_up(two)
+        self.assertEqual(self.names(two), ['first', 'second'])
+        self.assertEqual(len(builds), 1)
+
+        # Another class gets a template of its own.
+        other, another = self.loader.makeTest(OtherTC)
+        self.set_up(other)
+        self.assertEqual(len(builds), 2)
+
+    def test_connection_closed(self):
+        tc, other = self.loader.makeTest(TC)
+        self.set_up(tc)
+        connection = tc.db.connection
+        tc.doCleanups()
+        with self.assertRaises(sqlite3.ProgrammingError):
+            connection.execute('SELECT 1')
+
+    @unittest.skipIf(not hasattr(unittest.TestCase, 'doClassCleanups'),
+                     'class cleanups are not available')
+    def test_template_closed_with_class(self):
+        tc, other = self.loader.makeTest(TC)
+        self.set_up(tc)
+        template = tc.db.template
+        tc.doCleanups()
+        TC.doClassCleanups()
+        with self.assertRaises(sqlite3.ProgrammingError):
+            template.execute('SELECT 1')
+
+    def test_connect_arguments(self):
+        tc, = self.loader.makeTest(AutocommitTC)
+        self.set_up(tc)
+        self.assertIsNone(tc.db.connection.isolation_level)
+
+    def test_build_failure(self):
+
+        def broken(connection):
+            raise ValueError('no schema for you')
+
+        class TC(kt.testing.TestCase):
+
+            db = kt.testing.compose(kt.testing.sqlite.SQLite, build=broken)
+
+            def test_it(self):
+                """Just a dummy."""
+
+        tc, = self.loader.makeTest(TC)
+        with self.assertRaises(ValueError):
+            self.set_up(tc)
+        self.assertNotIn((TC, None, broken), kt.testing.sqlite._templates)